@@ -127,6 +127,7 @@ router.post('/ReaderApp/:cachekey', function(req, res) {
       timer.ms_to_complete = timer.elapsed();
       delete res.locals.timing.elapsed;  // no need to pass this around
 
+      res.set('X-Render-Ms', timer.ms_to_complete);  // lets Django tell rendering time from transfer time
       res.end(resphtml);
     } catch (render_e){
       logger.error(render_e);
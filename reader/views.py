@@ -6,14 +6,16 @@ from random import choice
 import json
 import urllib.request, urllib.parse, urllib.error
 from bson.json_util import dumps
-import socket
 import bleach
 from collections import OrderedDict
+from functools import partial
 import pytz
 from html import unescape
 import redis
 import os
 import re
+import threading
+import time
 import uuid
 
 from rest_framework.decorators import api_view, permission_classes
@@ -42,19 +44,21 @@ from sefaria.model.schema import SheetLibraryNode
 from sefaria.model.following import general_follow_recommendations
 from sefaria.model.trend import user_stats_data, site_stats_data
 from sefaria.client.wrapper import format_object_for_client, format_note_object_for_client, get_notes, get_links
-from sefaria.client.util import jsonResponse
+from sefaria.client.util import jsonResponse, jsonStreamingResponse
 from sefaria.history import text_history, get_maximal_collapsed_activity, top_contributors, text_at_revision, record_version_deletion, record_index_deletion
 from sefaria.sheets import get_sheets_for_ref, get_sheet_for_panel, annotate_user_links, trending_topics
 from sefaria.utils.util import text_preview, short_to_long_lang_code, epoch_time
 from sefaria.utils.hebrew import hebrew_term, is_hebrew
 from sefaria.utils.calendars import get_all_calendar_items, get_todays_calendar_items, get_keyed_calendar_items, get_parasha, get_todays_parasha
 from sefaria.settings import STATIC_URL, USE_VARNISH, USE_NODE, NODE_HOST, DOMAIN_LANGUAGES, MULTISERVER_ENABLED, SEARCH_ADMIN, MULTISERVER_REDIS_SERVER, \
-    MULTISERVER_REDIS_PORT, MULTISERVER_REDIS_DB, DISABLE_AUTOCOMPLETER, ENABLE_LINKER
+    MULTISERVER_REDIS_PORT, MULTISERVER_REDIS_DB, DISABLE_AUTOCOMPLETER, ENABLE_LINKER, ENABLE_WORD_FORM_INDEX, \
+    ENABLE_JSON_STREAMING, LIBRARY_LAZY_INIT
 from sefaria.site.site_settings import SITE_SETTINGS
 from sefaria.system.multiserver.coordinator import server_coordinator
 from sefaria.system.decorators import catch_error_as_json, sanitize_get_params, json_response_decorator
 from sefaria.system.exceptions import InputError, PartialRefInputError, BookNameError, NoVersionFoundError, DictionaryEntryNotFoundError
 from sefaria.system.cache import django_cache
+from sefaria.system import texts_api_cache, node_renderer, startup
 from sefaria.system.database import db
 from sefaria.helper.search import get_query_obj
 from sefaria.helper.crm.crm_mediator import CrmMediator
@@ -68,7 +72,7 @@ from sefaria.helper.file import get_resized_file
 from sefaria.image_generator import make_img_http_response
 import sefaria.tracker as tracker
 
-from sefaria.settings import NODE_TIMEOUT, DEBUG, GLOBAL_INTERRUPTING_MESSAGE
+from sefaria.settings import DEBUG, GLOBAL_INTERRUPTING_MESSAGE
 from sefaria.model.category import TocCollectionNode
 from sefaria.model.abstract import SluggedAbstractMongoRecord
 from sefaria.utils.calendars import parashat_hashavua_and_haftara
@@ -91,30 +95,30 @@ logger = structlog.get_logger(__name__)
 # Initialized cache library objects that depend on sefaria.model being completely loaded.
 logger.info("Initializing library objects.")
 logger.info("Initializing TOC Tree")
-library.get_toc_tree()
+with startup.stage("toc tree"):
+    library.get_toc_tree()
 
 logger.info("Initializing Shared Cache")
-library.init_shared_cache()
+with startup.stage("shared cache"):
+    library.init_shared_cache()
 
+deferrable_structures = []
 if not DISABLE_AUTOCOMPLETER:
-    logger.info("Initializing Full Auto Completer")
-    library.build_full_auto_completer()
-
-    logger.info("Initializing Ref Auto Completer")
-    library.build_ref_auto_completer()
-
-    logger.info("Initializing Lexicon Auto Completers")
-    library.build_lexicon_auto_completers()
-
-    logger.info("Initializing Cross Lexicon Auto Completer")
-    library.build_cross_lexicon_auto_completer()
-
-    logger.info("Initializing Topic Auto Completer")
-    library.build_topic_auto_completer()
-
+    deferrable_structures += ["full_auto_completer", "ref_auto_completer", "lexicon_auto_completers", "cross_lexicon_auto_completer", "topic_auto_completer"]
+if ENABLE_WORD_FORM_INDEX:
+    deferrable_structures += ["word_form_index"]
 if ENABLE_LINKER:
-    logger.info("Initializing Linker")
-    library.build_ref_resolver()
+    deferrable_structures += ["ref_resolver"]
+
+if LIBRARY_LAZY_INIT == "on_demand":
+    logger.info("Deferring initialization until first use", structures=deferrable_structures)
+elif LIBRARY_LAZY_INIT == "background":
+    logger.info("Initializing in the background", structures=deferrable_structures)
+    threading.Thread(target=library.ensure_built, args=deferrable_structures, name="library_init", daemon=True).start()
+else:
+    logger.info("Initializing", structures=deferrable_structures)
+    library.ensure_built(*deferrable_structures)
+startup.log_summary()
 
 if server_coordinator:
     server_coordinator.connect()
@@ -138,40 +142,34 @@ def render_template(request, template_name='base.html', app_props=None, template
     """
     app_props = app_props if app_props else {}
     template_context = template_context if template_context else {}
+    start = time.monotonic()
     props = base_props(request)
     props.update(app_props)
     propsJSON = json.dumps(props, ensure_ascii=False)
     template_context["propsJSON"] = propsJSON
     if app_props: # We are rendering the ReaderApp in Node, otherwise its jsut a Django template view with ReaderApp set to headerMode
-        html = render_react_component("ReaderApp", propsJSON)
+        node_renderer.record_props_time((time.monotonic() - start) * 1000)
+        html = render_react_component("ReaderApp", propsJSON, cacheable=not request.user.is_authenticated)
         template_context["html"] = html
     return render(request, template_name=template_name, context=template_context, content_type=content_type, status=status, using=using)
 
 
-def render_react_component(component, props):
+def render_react_component(component, props, cacheable=False):
     """
     Asks the Node Server to render `component` with `props`.
     `props` may either be JSON (to save reencoding) or a dictionary.
+    If `cacheable`, the HTML may be served from a short lived cache of pages rendered with the same props.
     Returns HTML.
     """
     if not USE_NODE:
         return render_to_string("elements/loading.html", context={"SITE_SETTINGS": SITE_SETTINGS})
 
     propsJSON = json.dumps(props, ensure_ascii=False) if isinstance(props, dict) else props
-    cache_key = "todo" # zlib.compress(propsJSON)
-    url = NODE_HOST + "/" + component + "/" + cache_key
-
-    encoded_args = urllib.parse.urlencode({
-        "propsJSON": propsJSON,
-    }).encode("utf-8")
     try:
-        req = urllib.request.Request(url)
-        response = urllib.request.urlopen(req, encoded_args, NODE_TIMEOUT)
-        html = response.read().decode("utf-8")
-        return html
+        return node_renderer.render(component, propsJSON, cacheable=cacheable)
     except Exception as e:
         # Catch timeouts, however they may come.
-        if isinstance(e, socket.timeout) or (hasattr(e, "reason") and isinstance(e.reason, socket.timeout)):
+        if node_renderer.is_timeout(e):
             props = json.loads(props) if isinstance(props, str) else props
             logger.warning("Node timeout: {} / {} / {} / {}\n".format(
                     props.get("initialPath"),
@@ -196,7 +194,7 @@ def base_props(request):
         library.init_shared_cache(rebuild=True)
 
     if request.user.is_authenticated:
-        profile = UserProfile(user_obj=request.user)
+        profile = getattr(request, "user_profile", None) or UserProfile(user_obj=request.user)
         interrupting_message_dict = GLOBAL_INTERRUPTING_MESSAGE or {"name": profile.interrupting_message()}
         user_data = {
             "_uid": request.user.id,
@@ -1408,12 +1406,12 @@ def texts_api(request, tref):
         fallbackOnDefaultVersion = bool(int(request.GET.get("fallbackOnDefaultVersion", False)))
 
         def _get_text(oref, versionEn=versionEn, versionHe=versionHe, commentary=commentary, context=context, pad=pad,
-                      alts=alts, wrapLinks=wrapLinks, layer_name=layer_name, wrapNamedEntities=wrapNamedEntities):
+                      alts=alts, wrapLinks=wrapLinks, layer_name=layer_name, wrapNamedEntities=wrapNamedEntities, stream=False):
             text_family_kwargs = dict(version=versionEn, lang="en", version2=versionHe, lang2="he",
                                       commentary=commentary, context=context, pad=pad, alts=alts,
                                       wrapLinks=wrapLinks, stripItags=stripItags, wrapNamedEntities=wrapNamedEntities,
                                       translationLanguagePreference=translationLanguagePreference,
-                                      fallbackOnDefaultVersion=fallbackOnDefaultVersion)
+                                      fallbackOnDefaultVersion=fallbackOnDefaultVersion, stream=stream)
             try:
                 text = TextFamily(oref, **text_family_kwargs).contents()
             except AttributeError as e:
@@ -1449,9 +1447,42 @@ def texts_api(request, tref):
 
             return text
 
-        if not multiple or abs(multiple) == 1:
+        # payloads that include sheets, layers or named entities change with more than their text, and aren't cached
+        cacheable = not int(request.GET.get("sheets", 0)) and not layer_name and not wrapNamedEntities
+        cache_params = dict(versionEn=versionEn, versionHe=versionHe, commentary=commentary, context=context, pad=pad,
+                            alts=alts, wrapLinks=wrapLinks, stripItags=stripItags,
+                            translationLanguagePreference=translationLanguagePreference,
+                            fallbackOnDefaultVersion=fallbackOnDefaultVersion)
+
+        def _get_text_cached(oref):
+            cache_key = texts_api_cache.get_cache_key(oref, cache_params) if cacheable else None
+            if cache_key:
+                text = texts_api_cache.get_payload(cache_key)
+                if text is not None:
+                    return text
             text = _get_text(oref, versionEn=versionEn, versionHe=versionHe, commentary=commentary, context=context, pad=pad,
                              alts=alts, wrapLinks=wrapLinks, layer_name=layer_name)
+            if cache_key and "error" not in text:
+                texts_api_cache.set_payload(cache_key, text)
+            return text
+
+        def _prefetch_adjacent(text):
+            if not cacheable:
+                return
+            for direction in ("next", "prev"):
+                if text.get(direction):
+                    adjacent = Ref(text[direction])
+                    texts_api_cache.prefetch(adjacent, cache_params, partial(_get_text, adjacent))
+
+        # unpadded refs to more than one section, up to whole books, are streamed a section at a time
+        if ENABLE_JSON_STREAMING and not pad and not multiple \
+                and (oref.is_spanning() or not (oref.is_section_level() or oref.is_segment_level())):
+            text = _get_text(oref, stream=True)
+            return jsonStreamingResponse(text, cb)
+
+        if not multiple or abs(multiple) == 1:
+            text = _get_text_cached(oref)
+            _prefetch_adjacent(text)
             return jsonResponse(text, cb)
         else:
             # Return list of many sections
@@ -1463,8 +1494,7 @@ def texts_api(request, tref):
             texts = []
 
             while current < target_count:
-                text = _get_text(oref, versionEn=versionEn, versionHe=versionHe, commentary=commentary, context=context, pad=pad,
-                             alts=alts, wrapLinks=wrapLinks, layer_name=layer_name)
+                text = _get_text_cached(oref)
                 texts += [text]
                 if not text[direction]:
                     break
@@ -1659,6 +1689,8 @@ def index_api(request, title, raw=False):
         if request.GET.get("with_related_topics", False):
             i["relatedTopics"] = get_topics_for_book(title, annotate=True)
 
+        if with_content_counts:
+            return jsonStreamingResponse(i, callback=request.GET.get("callback", None))
         return jsonResponse(i, callback=request.GET.get("callback", None))
 
     if request.method == "POST":
@@ -1760,7 +1792,7 @@ def counts_api(request, title):
     title = title.replace("_", " ")
 
     if request.method == "GET":
-        return jsonResponse(StateNode(title).contents(), callback=request.GET.get("callback", None))
+        return jsonStreamingResponse(StateNode(title).contents(), callback=request.GET.get("callback", None))
 
     elif request.method == "POST":
         if not request.user.is_staff:
@@ -1819,21 +1851,20 @@ def shape_api(request, title):
         }
 
     def _collapse_book_leaf_shapes(leaf_shapes):
-        """Groups leaf node shapes for a single book into one object so that resulting list corresponds 1:1 to books"""
-        if type(leaf_shapes) != list:
-            return leaf_shapes
-
-        results = []
+        """
+        Groups leaf node shapes for a single book into one object so that resulting shapes correspond 1:1 to books.
+        Yields each book's shape as soon as the shapes of its leaf nodes have all been read from `leaf_shapes`.
+        """
         prev_shape = None
         complex_book_in_progress = None
 
         for shape in leaf_shapes:
             if prev_shape and prev_shape["book"] != shape["book"]:
                 if complex_book_in_progress:
-                    results.append(complex_book_in_progress)
+                    yield complex_book_in_progress
                     complex_book_in_progress = None
                 else:
-                    results.append(prev_shape)
+                    yield prev_shape
             elif prev_shape:
                 complex_book_in_progress = complex_book_in_progress or {
                     "isComplex": True,
@@ -1847,9 +1878,7 @@ def shape_api(request, title):
                 complex_book_in_progress["length"] += shape["length"]
             prev_shape = shape
 
-        results.append(complex_book_in_progress or prev_shape)
-
-        return results
+        yield complex_book_in_progress or prev_shape
 
     title = title.replace("_", " ")
 
@@ -1880,9 +1909,11 @@ def shape_api(request, title):
                     return jsonResponse(res, callback=request.GET.get("callback", None))
                 indexes = library.get_indexes_in_category_path(cat_list, include_dependant=include_dependents, full_records=True)
 
-            res = [_simple_shape(jan) for index in indexes for jan in index.nodes.get_leaf_nodes()]
+            # shapes of whole categories are computed as they are streamed
+            res = (_simple_shape(jan) for index in indexes for jan in index.nodes.get_leaf_nodes())
+            return jsonStreamingResponse(_collapse_book_leaf_shapes(res), callback=request.GET.get("callback", None))
 
-        res = _collapse_book_leaf_shapes(res)
+        res = list(_collapse_book_leaf_shapes(res))
         return jsonResponse(res, callback=request.GET.get("callback", None))
 
 
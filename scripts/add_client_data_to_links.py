@@ -0,0 +1,30 @@
+"""
+Backfills the `refClientData` field that links are presented from.
+Once this has run, USE_LINK_CLIENT_DATA can be turned on.
+"""
+import django
+django.setup()
+from pymongo import UpdateOne
+from tqdm import tqdm
+from sefaria.model import *
+from sefaria.model.link import ref_client_data
+from sefaria.system.database import db
+from sefaria.system.exceptions import InputError
+
+BATCH_SIZE = 1000
+
+links = db.links.find({}, {"refs": 1})
+num_links = db.links.count_documents({})
+updates = []
+for l in tqdm(links, total=num_links):
+    try:
+        data = [ref_client_data(tref) for tref in l.get("refs", [])]
+    except (InputError, AttributeError) as e:
+        print("Failed to compute client data for link {}: {}".format(l.get("refs"), e))
+        continue
+    updates += [UpdateOne({"_id": l["_id"]}, {"$set": {"refClientData": data}})]
+    if len(updates) >= BATCH_SIZE:
+        db.links.bulk_write(updates)
+        updates = []
+if updates:
+    db.links.bulk_write(updates)
@@ -0,0 +1,45 @@
+"""
+Backfills the `refSpans` field used for range queries on links, sheets and webpages.
+Once this has run, USE_REF_SPAN_QUERIES can be turned on.
+"""
+import django
+django.setup()
+from pymongo import UpdateOne
+from tqdm import tqdm
+from sefaria.model import *
+from sefaria.system.database import db
+
+BATCH_SIZE = 1000
+
+
+def write_in_batches(collection, updates):
+    for i in range(0, len(updates), BATCH_SIZE):
+        collection.bulk_write(updates[i:i + BATCH_SIZE])
+
+
+# LINKS
+
+links = db.links.find({}, {"refs": 1})
+num_links = db.links.count_documents({})
+updates = []
+for l in tqdm(links, total=num_links):
+    updates += [UpdateOne({"_id": l["_id"]}, {"$set": {"refSpans": Ref.spans_for_refs(l.get("refs", []))}})]
+write_in_batches(db.links, updates)
+
+# SHEETS
+
+sheets = db.sheets.find({}, {"includedRefs": 1})
+num_sheets = db.sheets.count_documents({})
+updates = []
+for s in tqdm(sheets, total=num_sheets):
+    updates += [UpdateOne({"_id": s["_id"]}, {"$set": {"refSpans": Ref.spans_for_refs(s.get("includedRefs", []))}})]
+write_in_batches(db.sheets, updates)
+
+# WEBPAGES
+
+webpages = db.webpages.find({}, {"refs": 1})
+num_webpages = db.webpages.count_documents({})
+updates = []
+for w in tqdm(webpages, total=num_webpages):
+    updates += [UpdateOne({"_id": w["_id"]}, {"$set": {"refSpans": Ref.spans_for_refs(w.get("refs", []))}})]
+write_in_batches(db.webpages, updates)
@@ -0,0 +1,57 @@
+"""
+Measures how long each available JSON serializer takes to encode typical api payloads: a Talmud page with its links,
+a topic page and the table of contents. The standard library's serializer, "json", is the baseline.
+
+Usage: python scripts/benchmark_json_serializers.py [--runs 20] [--serializers json orjson]
+"""
+import argparse
+import statistics
+import timeit
+
+import django
+django.setup()
+from sefaria.model import *
+from sefaria.client.util import get_json_serializer, _json_serializers
+from sefaria.helper.topic import get_topic
+
+
+def talmud_page_payload():
+    return TextFamily(Ref("Berakhot 2a"), commentary=True, alts=True, wrapLinks=True).contents()
+
+
+def topic_page_payload():
+    return get_topic(True, "shabbat", with_html=True, with_links=True, annotate_links=True, with_refs=True,
+                     group_related=True, annotate_time_period=True, with_indexes=True)
+
+
+def toc_payload():
+    return library.get_toc()
+
+
+payloads = {
+    "talmud page": talmud_page_payload,
+    "topic page": topic_page_payload,
+    "toc": toc_payload,
+}
+
+
+def benchmark(runs, serializer_names):
+    for payload_name, build in payloads.items():
+        data = build()
+        print("\n{}".format(payload_name))
+        baseline = None
+        for name in serializer_names:
+            dumps = get_json_serializer(name)
+            times = timeit.repeat(lambda: dumps(data), number=1, repeat=runs)
+            median = statistics.median(times)
+            baseline = baseline or median
+            print("  {:<8} {:>8.2f} ms median  {:>8.2f} ms min  {:>6.2f}x  {:>10,} bytes".format(
+                name, median * 1000, min(times) * 1000, baseline / median, len(dumps(data))))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--serializers", nargs="+", default=sorted(_json_serializers, key=lambda n: n != "json"))
+    args = parser.parse_args()
+    benchmark(args.runs, args.serializers)
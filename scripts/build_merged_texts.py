@@ -0,0 +1,27 @@
+"""
+Builds the `merged_texts` collection, which stores the merge of all versions of each section of each text in each
+language. Once this has run, USE_MERGED_TEXTS can be turned on. Run it again after writing to the texts collection
+other than through Version.save(), which the stored merges can't tell apart from the content they were merged from.
+"""
+import django
+django.setup()
+import pymongo
+from tqdm import tqdm
+from sefaria.model import *
+from sefaria.model.text import build_merged_text
+from sefaria.system.database import db
+
+# merges were once stored a whole text per document, under a different unique index
+db.merged_texts.drop()
+db.merged_texts.create_index([("title", pymongo.ASCENDING), ("language", pymongo.ASCENDING), ("node", pymongo.ASCENDING), ("section", pymongo.ASCENDING)], unique=True)
+
+pairs = db.texts.aggregate([
+    {"$group": {"_id": {"title": "$title", "language": "$language"}, "count": {"$sum": 1}}},
+    {"$match": {"count": {"$gt": 1}}},
+])
+pairs = [p["_id"] for p in pairs]
+for p in tqdm(pairs):
+    try:
+        build_merged_text(p["title"], p["language"])
+    except Exception as e:
+        print("Failed to build merged text for {} ({}): {}".format(p["title"], p["language"], e))
@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+"""
+Writes a snapshot of all word forms, to be loaded at startup when ENABLE_WORD_FORM_INDEX is set.
+Usage: python scripts/build_word_form_index_snapshot.py <output filepath>
+The default output filepath is WORD_FORM_INDEX_SNAPSHOT_FILEPATH.
+"""
+import sys
+import django
+django.setup()
+from sefaria.model.lexicon import WordFormIndex
+from sefaria.settings import WORD_FORM_INDEX_SNAPSHOT_FILEPATH
+
+filepath = sys.argv[1] if len(sys.argv) > 1 else WORD_FORM_INDEX_SNAPSHOT_FILEPATH
+assert filepath, "No output filepath given"
+
+index = WordFormIndex.build()
+index.save(filepath)
+print("Saved {} word forms to {}".format(len(index), filepath))
@@ -0,0 +1,118 @@
+"""
+Reports how much of each gunicorn worker's memory is unique to it, and how much it shares with the master and other
+workers, from /proc/<pid>/smaps_rollup (Linux 4.14+).  Run it in the web container once workers have served some
+requests, with and without `preloadApp`, to see what preloading saves.
+
+Usage: python scripts/measure_worker_memory.py [--master-pid PID] [--save before.json] [--compare before.json]
+"""
+import argparse
+import json
+import os
+
+
+def read_smaps_rollup(pid):
+    """
+    :return dict: sizes in kB, by field name, e.g. "Rss", "Pss", "Private_Dirty"
+    """
+    fields = {}
+    with open("/proc/{}/smaps_rollup".format(pid)) as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1])
+    return fields
+
+
+def read_cmdline(pid):
+    with open("/proc/{}/cmdline".format(pid), "rb") as f:
+        return f.read().replace(b"\0", b" ").decode("utf-8", "replace").strip()
+
+
+def read_ppid(pid):
+    with open("/proc/{}/stat".format(pid)) as f:
+        # the command name, in parentheses, may contain spaces
+        return int(f.read().rsplit(")", 1)[1].split()[1])
+
+
+def find_gunicorn_master():
+    pids = [int(p) for p in os.listdir("/proc") if p.isdigit()]
+    gunicorns = []
+    for pid in pids:
+        try:
+            if "gunicorn" in read_cmdline(pid):
+                gunicorns += [pid]
+        except (IOError, OSError):
+            continue
+    masters = [pid for pid in gunicorns if read_ppid(pid) not in gunicorns]
+    if not masters:
+        raise SystemExit("No gunicorn master process found. Pass --master-pid.")
+    return masters[0]
+
+
+def find_workers(master_pid):
+    workers = []
+    for p in os.listdir("/proc"):
+        if not p.isdigit():
+            continue
+        try:
+            if read_ppid(int(p)) == master_pid:
+                workers += [int(p)]
+        except (IOError, OSError):
+            continue
+    return sorted(workers)
+
+
+def measure(pid):
+    fields = read_smaps_rollup(pid)
+    return {
+        "rss_mb": fields.get("Rss", 0) / 1024,
+        "pss_mb": fields.get("Pss", 0) / 1024,
+        "unique_mb": (fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0)) / 1024,
+        "shared_mb": (fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0)) / 1024,
+    }
+
+
+def report(master_pid):
+    processes = {"master": measure(master_pid)}
+    for pid in find_workers(master_pid):
+        processes["worker {}".format(pid)] = measure(pid)
+    workers = [m for name, m in processes.items() if name != "master"]
+    totals = {key: sum(m[key] for m in processes.values()) for key in ["rss_mb", "pss_mb", "unique_mb"]}
+    return {
+        "processes": processes,
+        "mean_worker_unique_mb": sum(m["unique_mb"] for m in workers) / len(workers) if workers else None,
+        "mean_worker_shared_mb": sum(m["shared_mb"] for m in workers) / len(workers) if workers else None,
+        # Pss divides shared pages among the processes sharing them, so its sum is the memory actually used
+        "total_pss_mb": totals["pss_mb"],
+        "total_rss_mb": totals["rss_mb"],
+    }
+
+
+def print_report(r, compare_to=None):
+    print("{:<16} {:>10} {:>10} {:>10} {:>10}".format("process", "rss MB", "pss MB", "unique MB", "shared MB"))
+    for name, m in r["processes"].items():
+        print("{:<16} {:>10.1f} {:>10.1f} {:>10.1f} {:>10.1f}".format(name, m["rss_mb"], m["pss_mb"], m["unique_mb"], m["shared_mb"]))
+    print()
+    for key in ["mean_worker_unique_mb", "mean_worker_shared_mb", "total_pss_mb", "total_rss_mb"]:
+        line = "{:<24} {:>10.1f}".format(key, r[key] or 0)
+        if compare_to and compare_to.get(key) is not None:
+            line += "   (was {:.1f}, {:+.1f})".format(compare_to[key], (r[key] or 0) - compare_to[key])
+        print(line)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--master-pid", type=int, default=None)
+    parser.add_argument("--save", help="write the report to this JSON file, to compare against later")
+    parser.add_argument("--compare", help="JSON file written by an earlier run with --save")
+    args = parser.parse_args()
+
+    r = report(args.master_pid or find_gunicorn_master())
+    compare_to = None
+    if args.compare:
+        with open(args.compare) as f:
+            compare_to = json.load(f)
+    print_report(r, compare_to)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(r, f, indent=2)
@@ -1,18 +1,75 @@
 
+import itertools
 import json
 from datetime import datetime
 
-from django.http import HttpResponse
+from django.http import HttpResponse, StreamingHttpResponse
 from django.core.mail import EmailMultiAlternatives
 from webpack_loader import utils as webpack_utils
 
 from sefaria import settings as sls
 # from sefaria.model.user_profile import UserProfile
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
-def jsonResponse(data, callback=None, status=200):
-    if callback:
-        return jsonpResponse(data, callback, status)
+import structlog
+logger = structlog.get_logger(__name__)
+
+
+def _stdlib_dumps(data):
+    return json.dumps(data, ensure_ascii=False).encode("utf-8")
+
+
+def _orjson_dumps(data):
+    try:
+        return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+    except TypeError:
+        # orjson refuses some data that the standard library encodes, e.g. integers beyond 64 bits
+        return _stdlib_dumps(data)
+
+
+_json_serializers = {"json": _stdlib_dumps}
+if orjson is not None:
+    _json_serializers["orjson"] = _orjson_dumps
+
+
+def register_json_serializer(name, dumps):
+    """
+    Makes a serializer available to JSON_SERIALIZER.
+    :param dumps: function that takes JSON serializable data and returns it encoded as UTF-8 JSON bytes
+    """
+    _json_serializers[name] = dumps
+
+
+def get_json_serializer(name=None):
+    """
+    :param name: name of a registered serializer. Defaults to JSON_SERIALIZER
+    :return: the serializer, or the standard library's if it isn't available
+    """
+    name = name or sls.JSON_SERIALIZER
+    if name not in _json_serializers:
+        logger.warning("JSON serializer '{}' is not available. Falling back to 'json'.".format(name))
+        name = "json"
+    return _json_serializers[name]
+
+
+_json_dumps = None
+
+
+def json_dumps(data):
+    """
+    :return bytes: `data` encoded as JSON by the serializer set in JSON_SERIALIZER
+    """
+    global _json_dumps
+    if _json_dumps is None:
+        _json_dumps = get_json_serializer()
+    return _json_dumps(data)
+
+
+def _prepare_json_data(data):
     #these next few lines are a quick hack.  this needs thought.
     try: # Duck typing on AbstractMongoRecord's contents method
         data = data.contents()
@@ -22,21 +79,104 @@ def jsonResponse(data, callback=None, status=200):
     if data is None:
         data = {"error": 'No data available'}
 
-    if "_id" in data:
-        data["_id"] = str(data["_id"])
-
     if isinstance(data, dict):
+        if "_id" in data:
+            data["_id"] = str(data["_id"])
         for key in list(data.keys()):
             if isinstance(data[key], datetime):
                 data[key] = data[key].isoformat()
 
-    return HttpResponse(json.dumps(data, ensure_ascii=False), content_type="application/json; charset=utf-8", charset="utf-8", status=status)
+    return data
+
+
+def jsonResponse(data, callback=None, status=200):
+    if callback:
+        return jsonpResponse(data, callback, status)
+    data = _prepare_json_data(data)
+
+    return HttpResponse(json_dumps(data), content_type="application/json; charset=utf-8", charset="utf-8", status=status)
 
 
 def jsonpResponse(data, callback, status=200):
     if "_id" in data:
         data["_id"] = str(data["_id"])
-    return HttpResponse("%s(%s)" % (callback, json.dumps(data, ensure_ascii=False)), content_type="application/javascript; charset=utf-8", charset="utf-8", status=status)
+    return HttpResponse(b"%s(%s)" % (callback.encode("utf-8"), json_dumps(data)), content_type="application/javascript; charset=utf-8", charset="utf-8", status=status)
+
+
+def _is_lazy_sequence(obj):
+    return not isinstance(obj, (str, bytes, dict, list, tuple)) and hasattr(obj, "__next__")
+
+
+def _materialize(obj):
+    """
+    :return: `obj` with any generators or iterators within it read into lists
+    """
+    if isinstance(obj, dict):
+        return {k: _materialize(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)) or _is_lazy_sequence(obj):
+        return [_materialize(v) for v in obj]
+    return obj
+
+
+def _has_lazy_sequence(obj):
+    if isinstance(obj, dict):
+        return any(_has_lazy_sequence(v) for v in obj.values())
+    if isinstance(obj, (list, tuple)):
+        return any(_has_lazy_sequence(v) for v in obj)
+    return _is_lazy_sequence(obj)
+
+
+def iter_json(obj):
+    """
+    Encodes `obj` as JSON bytes one piece at a time, with the serializer set in JSON_SERIALIZER. Generators and
+    iterators within `obj` are encoded as lists, and are only read as their items are reached, so the whole structure
+    never needs to be held in memory at once. Parts of `obj` without them are encoded in one piece.
+    """
+    if not _has_lazy_sequence(obj):
+        yield json_dumps(obj)
+    elif isinstance(obj, dict):
+        yield b"{"
+        for i, (key, value) in enumerate(obj.items()):
+            yield (b", " if i else b"") + json_dumps(key if isinstance(key, str) else json.dumps(key)) + b": "
+            yield from iter_json(value)
+        yield b"}"
+    else:
+        yield b"["
+        for i, item in enumerate(obj):
+            if i:
+                yield b", "
+            yield from iter_json(item)
+        yield b"]"
+
+
+def _buffered(pieces, chunk_size):
+    buffer, size = [], 0
+    for piece in pieces:
+        buffer.append(piece)
+        size += len(piece)
+        if size >= chunk_size:
+            yield b"".join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield b"".join(buffer)
+
+
+def jsonStreamingResponse(data, callback=None, status=200):
+    """
+    Like :func:`jsonResponse`, but sends the JSON in chunks as it is encoded, reading any generators within `data`
+    along the way. Falls back to :func:`jsonResponse` unless ENABLE_JSON_STREAMING is set.
+    Note that errors raised while the response is streamed can't change its status.
+    """
+    if not sls.ENABLE_JSON_STREAMING:
+        return jsonResponse(_materialize(data), callback, status)
+    data = _prepare_json_data(data)
+    if callback:
+        pieces = itertools.chain(["{}(".format(callback).encode("utf-8")], iter_json(data), [b")"])
+        content_type = "application/javascript; charset=utf-8"
+    else:
+        pieces = iter_json(data)
+        content_type = "application/json; charset=utf-8"
+    return StreamingHttpResponse(_buffered(pieces, sls.JSON_STREAMING_CHUNK_SIZE), content_type=content_type, charset="utf-8", status=status)
 
 
 def send_email(subject, message_html, from_email, to_email):
@@ -9,7 +9,25 @@ from sefaria.datatype.jagged_array import JaggedTextArray
 from sefaria.system.exceptions import InputError, NoVersionFoundError
 from sefaria.model.user_profile import user_link, public_user_data
 from sefaria.sheets import get_sheets_for_ref
+from sefaria.model.link import ref_client_data, ref_position_data, save_ref_client_data
 from sefaria.utils.hebrew import hebrew_term
+from sefaria.settings import USE_LINK_CLIENT_DATA
+
+
+def _link_client_data(link, pos, anchor=False):
+    """
+    :return dict: :func:`ref_client_data` for the ref of `link` at `pos`, from the copy stored with the link if there
+    is one.  Otherwise, for an `anchor`, only the :func:`ref_position_data` that is read of it is computed.
+    """
+    stored = getattr(link, "refClientData", None) if USE_LINK_CLIENT_DATA else None
+    if stored:
+        return stored[pos]
+    if getattr(link, "_client_data", None) is None:
+        link._client_data = [None, None]
+    data = link._client_data[pos]
+    if data is None or (not anchor and "indexTitle" not in data):
+        data = link._client_data[pos] = ref_position_data(link.refs[pos]) if anchor else ref_client_data(link.refs[pos])
+    return data
 
 
 def format_link_object_for_client(link, with_text, ref, pos=None):
@@ -23,26 +41,25 @@ def format_link_object_for_client(link, with_text, ref, pos=None):
 
     # The text we're asked to get links to
     anchorTref = link.refs[pos]
-    anchorRef  = Ref(anchorTref)
     anchorTrefExpanded = getattr(link, "expandedRefs{}".format(pos))
 
     # The link we found to anchorRef
     linkPos   = (pos + 1) % 2
     linkTref  = link.refs[linkPos]
-    linkRef   = Ref(linkTref)
     langs     = getattr(link, "availableLangs", [[],[]])
     linkLangs = langs[linkPos]
+    anchor, source = _link_client_data(link, pos, anchor=True), _link_client_data(link, linkPos)
 
     com["_id"]               = str(link._id)
-    com['index_title']       = linkRef.index.title
-    com["category"]          = linkRef.primary_category #usually the index's categories[0] or "Commentary".
+    com['index_title']       = source["indexTitle"]
+    com["category"]          = source["category"] #usually the index's categories[0] or "Commentary".
     com["type"]              = link.type
     com["ref"]               = linkTref
     com["anchorRef"]         = anchorTref
     com["anchorRefExpanded"] = anchorTrefExpanded
     com["sourceRef"]         = linkTref
-    com["sourceHeRef"]       = linkRef.he_normal()
-    com["anchorVerse"]       = anchorRef.sections[-1] if len(anchorRef.sections) else 0
+    com["sourceHeRef"]       = source["heRef"]
+    com["anchorVerse"]       = anchor["verse"]
     com["sourceHasEn"]       = "en" in linkLangs
     # com["anchorText"]        = getattr(link, "anchorText", "") # not currently used
     if getattr(link, "inline_reference", None):
@@ -54,25 +71,14 @@ def format_link_object_for_client(link, with_text, ref, pos=None):
         com["sourceVersion"] = {"title": link.versions[linkPos]["title"], "language": link.versions[linkPos].get("language", None)}
         com["displayedText"] = link.displayedText[linkPos]  # we only want source displayedText
 
-    compDate = getattr(linkRef.index, "compDate", None)
-    if compDate:
-        try:
-            com["compDate"] = int(compDate)
-        except ValueError:
-            com["compDate"] = 3000  # default comp date to in the future
-        try:
-            com["errorMargin"] = int(getattr(linkRef.index, "errorMargin", 0))
-        except ValueError:
-            com["errorMargin"] = 0
+    if "compDate" in source:
+        com["compDate"]      = source["compDate"]
+        com["errorMargin"]   = source["errorMargin"]
 
-    # Pad out the sections list, so that comparison between comment numbers are apples-to-apples
-    lsections = linkRef.sections[:] + [0] * (linkRef.index_node.depth - len(linkRef.sections))
-    # Build a decimal comment number based on the last two digits of the section array
-    com["commentaryNum"] = lsections[-1] if len(lsections) == 1 \
-            else float('{0}.{1:04d}'.format(*lsections[-2:])) if len(lsections) > 1 else 0
+    com["commentaryNum"] = source.get("commentaryNum", 0)
 
     if with_text:
-        text             = TextFamily(linkRef, context=0, commentary=False)
+        text             = TextFamily(Ref(linkTref), context=0, commentary=False)
         com["text"]      = text.text if isinstance(text.text, str) else JaggedTextArray(text.text).flatten_to_array()
         com["he"]        = text.he if isinstance(text.he, str) else JaggedTextArray(text.he).flatten_to_array()
 
@@ -80,17 +86,17 @@ def format_link_object_for_client(link, with_text, ref, pos=None):
     # this is now simpler, and there is explicit data on the index record for it.
     if com["type"] == "commentary":
         com["collectiveTitle"] = {
-            'en': getattr(linkRef.index, 'collective_title', linkRef.index.title),
-            'he': hebrew_term(getattr(linkRef.index, 'collective_title', linkRef.index.get_title("he")))
+            'en': source.get('collectiveTitle', source["indexTitle"]),
+            'he': hebrew_term(source.get('collectiveTitle', source["heIndexTitle"]))
         }
     else:
-        com["collectiveTitle"] = {'en': linkRef.index.title, 'he': linkRef.index.get_title("he")}
+        com["collectiveTitle"] = {'en': source["indexTitle"], 'he': source["heIndexTitle"]}
 
     if com["type"] != "commentary" and com["category"] == "Commentary":
             com["category"] = "Quoting Commentary"
 
-    if linkRef.index_node.primary_title("he"):
-        com["heTitle"] = linkRef.index_node.primary_title("he")
+    if source["heTitle"]:
+        com["heTitle"] = source["heTitle"]
 
     return com
 
@@ -177,6 +183,8 @@ def get_links(tref, with_text=True, with_sheet_links=False):
 
     # for storing all the section level texts that need to be looked up
     texts = {}
+    # for storing the client data of links that were saved without it
+    missing_client_data = {}
 
     linkset = LinkSet(oref)
     # For all links that mention ref (in any position)
@@ -189,16 +197,17 @@ def get_links(tref, with_text=True, with_sheet_links=False):
         else:
             pos = 0 if any(nRef == tref[:lenRef] for tref in link.expandedRefs0) else 1
         try:
+            if USE_LINK_CLIENT_DATA and not getattr(link, "refClientData", None):
+                missing_client_data[link._id] = [_link_client_data(link, i) for i in (0, 1)]
+
             # Skip any anchor refs that aren't segment level.  Unrolling the call to is_segment_level() here, just to save the N function calls.
-            anchor_ref = Ref(link.refs[pos])
-            node_depth = getattr(anchor_ref.index_node, "depth", None)
-            if node_depth is None or len(anchor_ref.sections) != node_depth:
+            anchor = _link_client_data(link, pos, anchor=True)
+            if anchor["nodeDepth"] is None or anchor["depth"] != anchor["nodeDepth"]:
                 continue
 
             # Skip any related refs that are super section level
-            source_ref = Ref(link.refs[0 if pos == 1 else 1])
-            node_depth = getattr(source_ref.index_node, "depth", None)
-            if node_depth is None or len(source_ref.sections) + 1 < node_depth:
+            source = _link_client_data(link, 0 if pos == 1 else 1)
+            if source["nodeDepth"] is None or source["depth"] + 1 < source["nodeDepth"]:
                 continue
 
             com = format_link_object_for_client(link, False, nRef, pos)
@@ -295,6 +304,8 @@ def get_links(tref, with_text=True, with_sheet_links=False):
             logger.warning("Trying to get non existent text for ref '{}'. Link refs were: {}".format(top_nref, link.refs))
             continue
 
+    save_ref_client_data(missing_client_data)
+
     # Hard-coding automatic display of links to an underlying text. bound_texts = ("Rashba on ",)
     # E.g., when requesting "Steinsaltz on X" also include links to "X" as though they were connected directly to Steinsaltz.
     bound_texts = ("Steinsaltz on ",)
@@ -105,6 +105,32 @@ CACHES = {
 }
 """
 
+"""TO KEEP HOT SHARED VALUES IN EACH PROCESS, IN FRONT OF A CACHE STORED IN MONGO"""
+"""
+CACHES = {
+    "shared": {
+        "BACKEND": "sefaria.system.caches.TwoTierCache",
+        "OPTIONS": {
+            "SHARED_ALIAS": "shared_mongo",
+            "LOCAL_MAX_SIZE": 1000,  # values kept in each process
+            "LOCAL_TIMEOUT": 60,  # seconds before a process reads a value from the shared tier again
+        },
+    },
+    "shared_mongo": {
+        "BACKEND": "sefaria.system.caches.SimpleMongoDBCache",
+        "OPTIONS": {
+            "COLLECTION": "shared_cache",
+            "COMPRESS_MIN_SIZE": 16 * 1024,  # pickled size in bytes above which values are compressed. None to never compress
+            "COMPRESSION": "zlib",  # or "zstd", which requires the zstandard package
+        },
+        "TIMEOUT": None,
+    },
+    "default": {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+"""
+
 SITE_PACKAGE = "sites.sefaria"
 
 
@@ -167,6 +193,12 @@ SEARCH_INDEX_NAME_SHEET = 'sheet'
 USE_NODE = False
 NODE_HOST = "http://localhost:4040"
 NODE_TIMEOUT = 10
+NODE_POOL_SIZE = 10  # keep-alive connections to NODE_HOST kept open by each process
+# Rendered HTML of pages for logged out users is reused for SSR_CACHE_TIMEOUT seconds,
+# and for up to SSR_CACHE_STALE_TIMEOUT seconds when Node fails to render the page again.
+SSR_CACHE_SIZE = 500
+SSR_CACHE_TIMEOUT = 60
+SSR_CACHE_STALE_TIMEOUT = 60 * 60
 
 SEFARIA_DATA_PATH = '/path/to/your/Sefaria-Data' # used for Data
 SEFARIA_EXPORT_PATH = '/path/to/your/Sefaria-Data/export' # used for exporting texts
@@ -211,6 +243,56 @@ DISABLE_AUTOCOMPLETER = False
 # Turns on loading of machine learning models to run linker
 ENABLE_LINKER = False
 
+# Loads all word forms into memory so that dictionary lookups don't query the database.
+# Optionally loaded from a snapshot file written by scripts/build_word_form_index_snapshot.py
+ENABLE_WORD_FORM_INDEX = False
+WORD_FORM_INDEX_SNAPSHOT_FILEPATH = None
+
+# Builds the autocompleters, word form index and linker models after startup, so that workers serve requests sooner.
+# "on_demand" builds each when it's first used, "background" builds them in a thread. None builds them at startup.
+LIBRARY_LAZY_INIT = None
+
+# Counts Mongo commands, shared cache and Ref cache lookups, and TextChunk loads in each request.
+# Staff see a request's counts in its X-Sefaria-Instrumentation header, and totals for each view are served at /metrics
+# in the Prometheus text format, to staff or to requests with the header "Authorization: Bearer <METRICS_TOKEN>".
+# Each process adds its totals to those of every process, in the request_metrics collection, every
+# REQUEST_INSTRUMENTATION_FLUSH_INTERVAL seconds.
+ENABLE_REQUEST_INSTRUMENTATION = True
+REQUEST_INSTRUMENTATION_FLUSH_INTERVAL = 10
+METRICS_TOKEN = None
+
+# Presents links from the titles, categories and dates stored with each link when it is saved,
+# rather than parsing both of its refs on every request. Run scripts/add_client_data_to_links.py before turning on.
+USE_LINK_CLIENT_DATA = False
+
+# Chooses text versions from an in memory catalog of version metadata and content locations,
+# rather than scanning the texts collection on every request.
+ENABLE_VERSION_CATALOG = False
+
+# Reads texts that merge several versions from a stored merge, kept up to date as versions are saved,
+# rather than merging the versions on every request. Run scripts/build_merged_texts.py before turning on.
+USE_MERGED_TEXTS = False
+
+# Caches the section payloads of the texts api in the shared cache, in front of Varnish.
+# Payloads are invalidated when their text, links, versions or index change.
+ENABLE_TEXTS_API_CACHE = False
+TEXTS_API_CACHE_TIMEOUT = 60 * 60 * 24
+# After serving a section, computes the payloads of the next and previous sections in background threads,
+# so that they are cached by the time the reader scrolls to them. Requires ENABLE_TEXTS_API_CACHE.
+TEXTS_API_PREFETCH = False
+TEXTS_API_PREFETCH_WORKERS = 2
+TEXTS_API_PREFETCH_MAX_PENDING = 16  # prefetches beyond this number are dropped
+TEXTS_API_PREFETCH_MAX_DELAY = 5  # seconds a prefetch can wait for a worker before it is dropped
+
+# Streams large api responses (ranges of many sections, shapes of categories, counts and content counts)
+# as their JSON is encoded, rather than building the whole response in memory first.
+ENABLE_JSON_STREAMING = False
+JSON_STREAMING_CHUNK_SIZE = 64 * 1024  # bytes
+
+# Serializer for api responses: "json" (the standard library) or "orjson", which is several times faster.
+# Compare them on typical payloads with scripts/benchmark_json_serializers.py.
+JSON_SERIALIZER = "json"
+
 # Caching with Cloudflare
 CLOUDFLARE_ZONE = ""
 CLOUDFLARE_EMAIL = ""
@@ -223,6 +305,11 @@ MULTISERVER_REDIS_PORT = 6379
 MULTISERVER_REDIS_DB = 0
 MULTISERVER_REDIS_EVENT_CHANNEL = "msync"   # Message queue on Redis
 MULTISERVER_REDIS_CONFIRM_CHANNEL = "mconfirm"   # Message queue on Redis
+MULTISERVER_REDIS_EVENT_STREAM = "msync_stream"   # Redis stream that orders events and keeps a backlog of them
+MULTISERVER_REDIS_LISTENERS_KEY = "msync_listeners"   # Servers that have synced recently, by the time they last did
+MULTISERVER_EVENT_BACKLOG = 1000   # events kept for servers that reconnect after losing their connection to Redis
+MULTISERVER_LISTENER_THREAD = True   # process events in a thread in each worker, rather than every few requests
+MULTISERVER_REDIS_CACHE_CHANNEL = "msync_cache"   # invalidations of the local tiers of two tier caches
 
 # OAUTH these fields dont need to be filled in. they are only required for oauth2client to __init__ successfully
 GOOGLE_OAUTH2_CLIENT_ID = ""
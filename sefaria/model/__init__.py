@@ -46,5 +46,7 @@ from .manuscript import Manuscript, ManuscriptSet, ManuscriptPage, ManuscriptPag
 from .linker.ref_part import RawRef
 from .linker.ref_resolver import RefResolver
 from . import dependencies
+from sefaria.system import startup
 
-library._build_index_maps()
+with startup.stage("index maps"):
+    library._build_index_maps()
@@ -48,6 +48,8 @@ class AutoCompleter(object):
     An AutoCompleter object provides completion services - it is the object in this module designed to be used by the Library.
     It instantiates objects that provide string completion according to different algorithms.
     """
+    PAD = 1000000  # padding for object type ordering.  Allows for internal ordering within type.
+
     def __init__(self, lang, lib, include_titles=True, include_categories=False,
                  include_parasha=False, include_lexicons=False, include_users=False, include_collections=False,
                  include_topics=False, min_topics=10, *args, **kwargs):
@@ -72,7 +74,7 @@ class AutoCompleter(object):
         self.max_autocorrect_length = 20   # Max # of chars of input string, beyond which no autocorrect search is done
         # self.prefer_longest = True  # True for titles, False for dictionary entries.  AC w/ combo of two may be tricky.
 
-        PAD = 1000000 # padding for object type ordering.  Allows for internal ordering within type.
+        PAD = self.PAD
 
         # Titles in library
         if include_titles:
@@ -168,6 +170,30 @@ class AutoCompleter(object):
             self.spell_checker.train_phrases(forms)
             self.ngram_matcher.train_phrases(forms, normal_forms)
 
+    def add_titles(self, title_node_dict, new_titles=None):
+        """
+        Adds the titles of an index that was added to the library, or changed
+        :param title_node_dict: dict of titles to the nodes they name
+        :param new_titles: those titles that weren't in the library before, to train spelling correction on.  Defaults to all of them.
+        """
+        tnd_items = [(t, d) for t, d in list(title_node_dict.items()) if not isinstance(d, SheetLibraryNode)]
+        if not tnd_items:
+            return
+        normal_titles = [self.normalizer(t) for t, d in tnd_items]
+        self.title_trie.add_titles_from_title_node_dict(tnd_items, normal_titles, 1 * self.PAD)
+        titles = [t for t, d in tnd_items if new_titles is None or t in new_titles]
+        normal_titles = [self.normalizer(t) for t in titles]
+        self.spell_checker.train_phrases(normal_titles)
+        self.ngram_matcher.train_phrases(titles, normal_titles)
+
+    def remove_titles(self, titles):
+        """
+        Removes the titles of an index that was removed from the library.
+        The spell checker and n-gram matcher keep them until the auto completer is rebuilt, but they are no longer completed.
+        :param titles: list of titles
+        """
+        self.title_trie.remove_ref_titles(titles)
+
     def set_other_lang_ac(self, ac):
         self.other_lang_ac = ac
 
@@ -480,6 +506,19 @@ class TitleTrie(datrie.Trie):
                 "order": order
             }
 
+    def remove_ref_titles(self, titles):
+        for title in titles:
+            norm_title = self.normalizer(title)
+            try:
+                items = self[norm_title]
+            except KeyError:
+                continue
+            items = [item for item in items if not (item["type"] == "ref" and item["title"] == title)]
+            if items:
+                super(TitleTrie, self).__setitem__(norm_title, items)
+            else:
+                del self[norm_title]
+
     def add_titles_from_set(self, recordset, all_names_method, primary_name_method, keyattr, base_order, sub_order_fn=None):
         """
 
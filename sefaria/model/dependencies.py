@@ -2,19 +2,26 @@
 dependencies.py -- list cross model dependencies and subscribe listeners to changes.
 """
 
-from . import abstract, link, note, history, schema, text, layer, version_state, timeperiod, garden, notification, collection, library, category, ref_data, user_profile, manuscript, topic
+from . import abstract, link, note, history, schema, text, layer, version_state, timeperiod, garden, notification, collection, library, category, ref_data, user_profile, manuscript, topic, lexicon
 
 from .abstract import subscribe, cascade, cascade_to_list, cascade_delete, cascade_delete_to_list
 import sefaria.system.cache as scache
+from sefaria.system import texts_api_cache
 
 # Index Save / Create
 subscribe(text.process_index_change_in_core_cache,                      text.Index, "save")
 subscribe(version_state.create_version_state_on_index_creation,         text.Index, "save")
 subscribe(text.process_index_change_in_toc,                             text.Index, "save")
+subscribe(text.process_index_change_in_version_catalog,                 text.Index, "save")
+subscribe(text.process_index_change_in_navigation_tables,               text.Index, "save")
+subscribe(link.process_index_change_in_link_client_data,                 text.Index, "save")
 
 
 # Index Name Change
 subscribe(text.process_index_title_change_in_core_cache,                text.Index, "attributeChange", "title")
+subscribe(text.process_index_change_in_version_catalog,                 text.Index, "attributeChange", "title")
+subscribe(text.process_index_change_in_navigation_tables,               text.Index, "attributeChange", "title")
+subscribe(text.process_index_title_change_in_merged_texts,              text.Index, "attributeChange", "title")
 subscribe(text.process_index_title_change_in_versions,                  text.Index, "attributeChange", "title")
 subscribe(version_state.process_index_title_change_in_version_state,    text.Index, "attributeChange", "title")
 subscribe(link.process_index_title_change_in_links,                     text.Index, "attributeChange", "title")
@@ -34,6 +41,9 @@ subscribe(manuscript.process_index_title_change_in_manuscript_links,    text.Ind
 
 # Index Delete (start with cache clearing)
 subscribe(text.process_index_delete_in_core_cache,                      text.Index, "delete")
+subscribe(text.process_index_change_in_version_catalog,                 text.Index, "delete")
+subscribe(text.process_index_change_in_navigation_tables,               text.Index, "delete")
+subscribe(text.process_index_delete_in_merged_texts,                    text.Index, "delete")
 subscribe(version_state.process_index_delete_in_version_state,          text.Index, "delete")
 subscribe(link.process_index_delete_in_links,                           text.Index, "delete")
 subscribe(topic.process_index_delete_in_topic_links,                    text.Index, "delete")
@@ -66,6 +76,17 @@ subscribe(cascade(notification.GlobalNotificationSet, "content.version"), text.V
 
 subscribe(cascade_delete(notification.GlobalNotificationSet, "content.version", "versionTitle"),   text.Version, "delete")
 
+# Version Catalog
+subscribe(text.process_version_change_in_version_catalog,               text.Version, "save")
+subscribe(text.process_version_change_in_version_catalog,               text.Version, "delete")
+
+# Merged Texts
+subscribe(text.process_version_change_in_merged_texts,                  text.Version, "save")
+subscribe(text.process_version_delete_in_merged_texts,                  text.Version, "delete")
+
+
+# Version State
+subscribe(text.process_version_state_change_in_navigation_tables,       version_state.VersionState, "save")
 
 # Note Delete
 subscribe(layer.process_note_deletion_in_layer,                         note.Note, "delete")
@@ -108,6 +129,11 @@ subscribe(collection.process_collection_delete_in_sheets,                  colle
 subscribe(cascade_delete(notification.NotificationSet, "content.collection_slug", "slug"), collection.Collection, "delete")
 
 
+# Word Forms
+subscribe(lexicon.process_word_form_change_in_cache,                      lexicon.WordForm, "save")
+subscribe(lexicon.process_word_form_delete_in_cache,                      lexicon.WordForm, "delete")
+
+
 # Categories
 subscribe(category.process_category_path_change,  category.Category, "attributeChange", "path")
 subscribe(text.rebuild_library_after_category_change,                   category.Category, "save")
@@ -116,6 +142,15 @@ subscribe(text.rebuild_library_after_category_change,                   category
 subscribe(manuscript.process_slug_change_in_manuscript,  manuscript.Manuscript, "attributeChange", "slug")
 subscribe(manuscript.process_manucript_deletion,         manuscript.Manuscript, "delete")
 
+# Texts API Cache
+subscribe(texts_api_cache.process_index_change_in_texts_api_cache,      text.Index, "save")
+subscribe(texts_api_cache.process_index_change_in_texts_api_cache,      text.Index, "attributeChange", "title")
+subscribe(texts_api_cache.process_index_change_in_texts_api_cache,      text.Index, "delete")
+subscribe(texts_api_cache.process_version_change_in_texts_api_cache,    text.Version, "save")
+subscribe(texts_api_cache.process_version_change_in_texts_api_cache,    text.Version, "delete")
+subscribe(texts_api_cache.process_link_change_in_texts_api_cache,       link.Link, "save")
+subscribe(texts_api_cache.process_link_change_in_texts_api_cache,       link.Link, "delete")
+
 '''
 # These are contained in the library rebuild, above.
 subscribe(text.reset_simple_term_mapping,                                   category.Category, "delete")
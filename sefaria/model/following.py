@@ -58,7 +58,7 @@ class FolloweesSet(FollowSet):
         self.uids = db.following.find({"follower": uid}).distinct("followee")
 
 
-@django_cache(timeout=60 * 60 * 24)
+@django_cache(timeout=2 * 60 * 60 * 24, soft_timeout=60 * 60 * 24, lock_timeout=60)
 def aggregate_profiles(lang="english", limit=None):
     match_stage = {"status": "public"} if lang == "english" else {"status": "public", "sheetLanguage": "hebrew"}
     pipeline = [
@@ -3,11 +3,19 @@
 Writes to MongoDB Collection: word_form, lexicon_entry
 """
 import re
+import bisect
+import pickle
 import unicodedata
+from collections import defaultdict
+from bson.objectid import ObjectId
 from . import abstract as abst
 from sefaria.datatype.jagged_array import JaggedTextArray
+from sefaria.system.cache import LRUCache
+from sefaria.system.database import db
 from sefaria.system.exceptions import InputError
 from sefaria.utils.hebrew import is_hebrew, strip_cantillation, has_cantillation
+from sefaria.settings import MULTISERVER_ENABLED
+from sefaria.system.multiserver.coordinator import server_coordinator
 
 
 class WordForm(abst.AbstractMongoRecord):
@@ -406,6 +414,113 @@ class LexiconEntrySet(abst.AbstractMongoSet):
                 self.records.sort(key=is_primary)
 
 
+class WordFormIndex(object):
+    """
+    In memory index of word forms, so that dictionary lookups can be served without database access.
+    Maps both `form` and `c_form` to the raw word form records. Each record's `refs` are kept sorted, so that
+    filtering by ref prefix is a binary search.
+    Built from the database with `build()`, or from a snapshot written by `save()` with `load()`.
+    """
+    lookup_keys = ('form', 'c_form')
+
+    def __init__(self, records=None):
+        self._records = {}  # _id -> record
+        self._ids_by_pair = defaultdict(list)  # (lookup key, value) -> list of _ids
+        for rec in (records or []):
+            self.add(rec)
+
+    def __len__(self):
+        return len(self._records)
+
+    @classmethod
+    def build(cls):
+        return cls(getattr(db, WordForm.collection).find({}))
+
+    @classmethod
+    def load(cls, filepath):
+        with open(filepath, "rb") as fin:
+            return cls(pickle.load(fin))
+
+    def save(self, filepath):
+        with open(filepath, "wb") as fout:
+            pickle.dump(list(self._records.values()), fout, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def add(self, rec):
+        rec = dict(rec)
+        rec["refs"] = sorted(rec.get("refs", []))
+        self.remove(rec["_id"])
+        self._records[rec["_id"]] = rec
+        for key in self.lookup_keys:
+            if rec.get(key, None) is not None:
+                self._ids_by_pair[(key, rec[key])].append(rec["_id"])
+
+    def remove(self, _id):
+        rec = self._records.pop(_id, None)
+        if rec is None:
+            return
+        for key in self.lookup_keys:
+            ids = self._ids_by_pair.get((key, rec.get(key, None)), [])
+            if _id in ids:
+                ids.remove(_id)
+
+    def get(self, pair):
+        """
+        :param tuple pair: (lookup key, value)
+        :return list: raw word form records matching `pair`
+        """
+        return [self._records[_id] for _id in self._ids_by_pair.get(pair, [])]
+
+
+def refs_have_prefix(sorted_refs, prefix):
+    """
+    :param list sorted_refs: sorted list of trefs
+    :return bool: True if any of `sorted_refs` starts with `prefix`
+    """
+    i = bisect.bisect_left(sorted_refs, prefix)
+    return i < len(sorted_refs) and sorted_refs[i].startswith(prefix)
+
+
+# Hot word cache: maps a (lookup key, form) pair to the raw word form records found for it, including empty results.
+WORD_FORM_CACHE_SIZE = 20000
+WORD_FORM_CACHE_TIMEOUT = 60 * 60 * 6
+word_form_cache = LRUCache(max_size=WORD_FORM_CACHE_SIZE, timeout=WORD_FORM_CACHE_TIMEOUT)
+
+
+def refresh_word_form_in_cache(_id):
+    """
+    Reloads the word form with `_id` into this process's word form index.
+    Takes `_id` as a string so that it can be the argument of a multiserver event.
+    """
+    from sefaria.model.text import library
+    word_form_cache.clear()
+    index = library.get_word_form_index()
+    if index is not None:
+        rec = getattr(db, WordForm.collection).find_one({"_id": ObjectId(_id)})
+        if rec is not None:
+            index.add(rec)
+
+
+def remove_word_form_from_cache(_id):
+    from sefaria.model.text import library
+    word_form_cache.clear()
+    index = library.get_word_form_index()
+    if index is not None:
+        index.remove(ObjectId(_id))
+
+
+def process_word_form_change_in_cache(wform, **kwargs):
+    refresh_word_form_in_cache(str(wform._id))
+    if MULTISERVER_ENABLED:
+        server_coordinator.publish_event("lexicon", "refresh_word_form_in_cache", [str(wform._id)])
+
+
+def process_word_form_delete_in_cache(wform, **kwargs):
+    # notified before the record is deleted
+    remove_word_form_from_cache(str(wform._id))
+    if MULTISERVER_ENABLED:
+        server_coordinator.publish_event("lexicon", "remove_word_form_from_cache", [str(wform._id)])
+
+
 class LexiconLookupAggregator(object):
 
     @classmethod
@@ -421,10 +536,10 @@ class LexiconLookupAggregator(object):
         return gram_list
 
     @classmethod
-    def get_word_form_objects(cls, input_word, lookup_key='form', **kwargs):
-        from sefaria.model import Ref
-
-        lookup_ref = kwargs.get("lookup_ref", None)
+    def _lookup_pair(cls, input_word, lookup_key='form'):
+        """
+        :return tuple: (field, value) to match against word forms for `input_word`
+        """
         wform_pkey = lookup_key
         if is_hebrew(input_word):
             # This step technically used to happen in the lookup main method `lexicon_lookup` if there were no initial results, but in case where a
@@ -432,61 +547,126 @@ class LexiconLookupAggregator(object):
             input_word = strip_cantillation(input_word)
             if not has_cantillation(input_word, detect_vowels=True):
                 wform_pkey = 'c_form'
-        query_obj = {wform_pkey: input_word}
-        if lookup_ref:
-            nref = Ref(lookup_ref).normal()
-            query_obj["refs"] = {'$regex': '^{}'.format(nref)}
-        forms = WordFormSet(query_obj)
-        if lookup_ref and len(forms) == 0:
-            del query_obj["refs"]
-            forms = WordFormSet(query_obj)
-        return forms
+        return wform_pkey, input_word
+
+    @classmethod
+    def _load_word_forms(cls, pairs):
+        """
+        Resolves all of `pairs` with at most one query on `form` and `c_form`, using the hot word cache where possible.
+        When the library has a word form index, it is used instead and there is no query at all.
+        :param pairs: list of (field, value) tuples, as returned by `_lookup_pair`
+        :return dict: maps each pair to a list of WordForm
+        """
+        from sefaria.model.text import library
+        index = library.get_word_form_index()
+        if index is not None:
+            return {pair: [WordForm(rec) for rec in index.get(pair)] for pair in set(pairs)}
+
+        raw = {}
+        missing = []
+        for pair in set(pairs):
+            cached = word_form_cache.get(pair)
+            if cached is None:
+                missing.append(pair)
+            else:
+                raw[pair] = cached
+        if missing:
+            values = {key: [value for k, value in missing if k == key] for key in ('form', 'c_form')}
+            query = {"$or": [{key: {"$in": vals}} for key, vals in values.items() if vals]}
+            for pair in missing:
+                raw[pair] = []
+            missing = set(missing)
+            for rec in getattr(db, WordForm.collection).find(query):
+                rec["refs"] = sorted(rec.get("refs", []))
+                for key in ('form', 'c_form'):
+                    if (key, rec.get(key, None)) in missing:
+                        raw[(key, rec[key])].append(rec)
+            for pair in missing:
+                word_form_cache.set(pair, raw[pair])
+        return {pair: [WordForm(rec) for rec in recs] for pair, recs in raw.items()}
 
+    @classmethod
+    def _filter_by_ref(cls, forms, lookup_ref):
+        """
+        Prefers forms attested in `lookup_ref`. If there are none, all `forms` are returned.
+        """
+        if not lookup_ref:
+            return forms
+        from sefaria.model import Ref
+        nref = Ref(lookup_ref).normal()
+        in_ref = [form for form in forms if refs_have_prefix(getattr(form, "refs", []), nref)]
+        return in_ref if len(in_ref) else forms
+
+    @classmethod
+    def get_word_form_objects(cls, input_word, lookup_key='form', **kwargs):
+        pair = cls._lookup_pair(input_word, lookup_key)
+        forms = cls._load_word_forms([pair])[pair]
+        return cls._filter_by_ref(forms, kwargs.get("lookup_ref", None))
+
+    @classmethod
+    def _lookups(cls, forms):
+        headword_query = []
+        for form in forms:
+            for lookup in form.lookups:
+                headword_query.append(lookup)
+        return headword_query
 
     @classmethod
     def _single_lookup(cls, input_word, lookup_key='form', **kwargs):
-        forms = cls.get_word_form_objects(input_word, lookup_key=lookup_key, **kwargs)
-        if len(forms) > 0:
-            headword_query = []
-            for form in forms:
-                for lookup in form.lookups:
-                    headword_query.append(lookup)
-            return headword_query
-        else:
-            return []
+        return cls._lookups(cls.get_word_form_objects(input_word, lookup_key=lookup_key, **kwargs))
 
     @classmethod
-    def _ngram_lookup(cls, input_str, **kwargs):
+    def _ngrams(cls, input_str):
+        """
+        :return list: unique ngrams of `input_str`, shorter than the full input, longest first
+        """
         words = cls._split_input(input_str)
-        input_length = len(words)
+        ngrams = []
+        for k in reversed(range(1, len(words))):
+            ngrams += [" ".join(words[i:i + k]) for i in range(len(words) - k + 1)]
+        return list(dict.fromkeys(ngrams))
+
+    @classmethod
+    def _ngram_lookup(cls, input_str, **kwargs):
+        pairs = [cls._lookup_pair(ng) for ng in cls._ngrams(input_str)]
+        forms = cls._load_word_forms(pairs)
         queries = []
-        for i in reversed(list(range(input_length))):
-            ngrams = cls._create_ngrams(words, i)
-            for ng in ngrams:
-                res = cls._single_lookup(ng, **kwargs)
-                if res:
-                    queries += res
+        for pair in pairs:
+            queries += cls._lookups(cls._filter_by_ref(forms[pair], kwargs.get("lookup_ref", None)))
         return queries
 
     @classmethod
     def lexicon_lookup(cls, input_str, **kwargs):
+        """
+        Looks up lexicon entries for `input_str`: first as is, then by consonantal form and then, for multi word input, by ngrams.
+        Every candidate form is resolved up front in a single word form query, and the entries in a single lexicon query.
+        """
         input_str = unicodedata.normalize("NFC", input_str)
-        results = cls._single_lookup(input_str, **kwargs)
+        lookup_ref = kwargs.get("lookup_ref", None)
+        split = not kwargs.get('never_split', None)
+
+        exact_pair = cls._lookup_pair(input_str)
+        consonantal_pair = cls._lookup_pair(strip_cantillation(input_str, True), lookup_key='c_form')
+        ngram_pairs = [cls._lookup_pair(ng) for ng in cls._ngrams(input_str)] if split else []
+        forms = cls._load_word_forms([exact_pair, consonantal_pair] + ngram_pairs)
+
+        results = cls._lookups(cls._filter_by_ref(forms[exact_pair], lookup_ref))
         if not results or kwargs.get('always_consonants', False):
-            results += cls._single_lookup(strip_cantillation(input_str, True), lookup_key='c_form', **kwargs)
-        if not kwargs.get('never_split', None) and (len(results) == 0 or kwargs.get("always_split", None)):
-            ngram_results = cls._ngram_lookup(input_str, **kwargs)
-            results += ngram_results
+            results += cls._lookups(cls._filter_by_ref(forms[consonantal_pair], lookup_ref))
+        if split and (len(results) == 0 or kwargs.get("always_split", None)):
+            for pair in ngram_pairs:
+                results += cls._lookups(cls._filter_by_ref(forms[pair], lookup_ref))
         if len(results):
             primary_tuples = set()
-            query = set() #TODO: optimize number of word form lookups? there can be a lot of duplicates... is it needed?
+            query = []
             for r in results:
                 # extract the lookups with "primary" field so it can be used for sorting lookup in the LexiconEntrySet,
-                # but also delete it, because its not part of the query obj
-                if "primary" in r:
-                    if r["primary"] is True:
-                        primary_tuples.add((r["headword"], r["parent_lexicon"]))
-                    del r["primary"]
-            return LexiconEntrySet({"$or": results}, primary_tuples=primary_tuples)
+                # but leave it out of the query obj
+                if r.get("primary", None) is True:
+                    primary_tuples.add((r["headword"], r["parent_lexicon"]))
+                q = {k: v for k, v in r.items() if k != "primary"}
+                if q not in query:
+                    query.append(q)
+            return LexiconEntrySet({"$or": query}, primary_tuples=primary_tuples)
         else:
             return None
\ No newline at end of file
@@ -8,6 +8,8 @@ from bson.objectid import ObjectId
 from sefaria.model.text import AbstractTextRecord, VersionSet
 from sefaria.system.exceptions import DuplicateRecordError, InputError, BookNameError
 from sefaria.system.database import db
+from sefaria.settings import USE_REF_SPAN_QUERIES
+from pymongo import UpdateOne
 from . import abstract as abst
 from . import text
 
@@ -30,6 +32,7 @@ class Link(abst.AbstractMongoRecord):
     optional_attrs = [
         "expandedRefs0",    # list of refs corresponding to `refs.0`, but breaking ranging refs down into individual segments
         "expandedRefs1",    # list of refs corresponding to `refs.1`, but breaking ranging refs down into individual segments
+        "refSpans",         # list of spans (see `Ref.span()`) of `refs`, used for range queries
         "anchorText",       # string of dibbur hamatchil (largely depcrated) 
         "availableLangs",   # list of lists corresponding to `refs` showing languages available, e.g. [["he"], ["he", "en"]]  
         "highlightedWords", # list of strings to be highlighted when presenting a text as a connection
@@ -44,7 +47,8 @@ class Link(abst.AbstractMongoRecord):
         "score",             # int. represents how "good"/accurate the link is. introduced for quotations finder
         "inline_citation",    # bool acts as a flag for wrapped refs logic to run on the segments where this citation is inline.
         "versions",          # only for cases when type is `essay`: list of versionTitles corresponding to `refs`, where first versionTitle corresponds to Index of first ref, and each value is a dictionary of language and title of version
-        "displayedText"       # only for cases when type is `essay`: dictionary of en and he strings to be displayed
+        "displayedText",      # only for cases when type is `essay`: dictionary of en and he strings to be displayed
+        "refClientData",      # list of 2 dicts corresponding to `refs`, with the data about each ref that is presented with links to it (see `ref_client_data()`)
     ]
 
     def _normalize(self):
@@ -162,6 +166,8 @@ class Link(abst.AbstractMongoRecord):
         if not getattr(self, "_skip_expanded_refs_set", False):
             self._set_expanded_refs()
 
+        self._set_ref_client_data()
+
     def _sanitize(self):
         """
         bleach all input to protect against security risks
@@ -182,6 +188,18 @@ class Link(abst.AbstractMongoRecord):
     def _set_expanded_refs(self):
         self.expandedRefs0 = [oref.normal() for oref in text.Ref(self.refs[0]).all_segment_refs()]
         self.expandedRefs1 = [oref.normal() for oref in text.Ref(self.refs[1]).all_segment_refs()]
+        self._set_ref_spans()
+
+    def _set_ref_spans(self):
+        self.refSpans = text.Ref.spans_for_refs(self.refs)
+
+    def _set_ref_client_data(self):
+        try:
+            self.refClientData = [ref_client_data(tref) for tref in self.refs]
+        except Exception as e:
+            # presenting the link will fail in the same way, which is left to the client code to handle
+            logger.warning("Failed to set client data for link {} - {}: {}".format(self.refs[0], self.refs[1], e))
+            self.refClientData = None
 
     def ref_opposite(self, from_ref, as_tuple=False):
         """
@@ -220,9 +238,14 @@ class LinkSet(abst.AbstractMongoSet):
         LinkSet can be initialized with a query dictionary, as any other MongoSet.
         It can also be initialized with a :py:class: `sefaria.text.Ref` object,
         and will use the :py:meth: `sefaria.text.Ref.regex()` method to return the set of Links that refer to that Ref or below.
+        When USE_REF_SPAN_QUERIES is on, Refs with a span are instead matched with a range query on `refSpans`.
         :param query_or_ref: A query dict, or a :py:class: `sefaria.text.Ref` object
         '''
         try:
+            span_query = query_or_ref.span_query() if USE_REF_SPAN_QUERIES else None
+            if span_query:
+                super(LinkSet, self).__init__(span_query, page, limit)
+                return
             regex_list = query_or_ref.regex(as_list=True)
             ref_clauses = [{"expandedRefs0": {"$regex": r}} for r in regex_list]
             ref_clauses += [{"expandedRefs1": {"$regex": r}} for r in regex_list]
@@ -348,6 +371,7 @@ def process_index_title_change_in_links(indx, **kwargs):
         l.refs = [r.replace(kwargs["old"], kwargs["new"], 1) if re.search('|'.join(patterns), r) else r for r in l.refs]
         l.expandedRefs0 = [r.replace(kwargs["old"], kwargs["new"], 1) if re.search('|'.join(patterns), r) else r for r in l.expandedRefs0]
         l.expandedRefs1 = [r.replace(kwargs["old"], kwargs["new"], 1) if re.search('|'.join(patterns), r) else r for r in l.expandedRefs1]
+        l._set_ref_spans()
         try:
             l._skip_lang_check = True
             l._skip_expanded_refs_set = True
@@ -357,6 +381,84 @@ def process_index_title_change_in_links(indx, **kwargs):
             l.delete()
 
 
+def _ref_position_data(oref):
+    return {
+        "depth": len(oref.sections),
+        "nodeDepth": getattr(oref.index_node, "depth", None),
+        "verse": oref.sections[-1] if len(oref.sections) else 0,
+    }
+
+
+def ref_position_data(tref):
+    """
+    The part of :func:`ref_client_data` that is read for the anchor of a link: the depth of the ref and of its node,
+    and its last section.
+    :param str tref:
+    :return dict:
+    """
+    return _ref_position_data(text.Ref(tref))
+
+
+def ref_client_data(tref):
+    """
+    The data about one side of a link that is presented to the client, which depends only on the ref and its Index.
+    It is stored on each Link as `refClientData`, so that links can be presented without parsing their refs.
+    :param str tref:
+    :return dict:
+    """
+    oref = text.Ref(tref)
+    index = oref.index
+    data = _ref_position_data(oref)
+    data.update({
+        "indexTitle": index.title,
+        "heIndexTitle": index.get_title("he"),
+        "category": oref.primary_category,  # usually the index's categories[0] or "Commentary".
+        "heRef": oref.he_normal(),
+        "heTitle": oref.index_node.primary_title("he"),
+    })
+    node_depth = data["nodeDepth"]
+    if hasattr(index, "collective_title"):
+        data["collectiveTitle"] = index.collective_title
+
+    compDate = getattr(index, "compDate", None)
+    if compDate:
+        try:
+            data["compDate"] = int(compDate)
+        except ValueError:
+            data["compDate"] = 3000  # default comp date to in the future
+        try:
+            data["errorMargin"] = int(getattr(index, "errorMargin", 0))
+        except ValueError:
+            data["errorMargin"] = 0
+
+    if node_depth is not None:
+        # Pad out the sections list, so that comparison between comment numbers are apples-to-apples
+        lsections = oref.sections[:] + [0] * (node_depth - len(oref.sections))
+        # Build a decimal comment number based on the last two digits of the section array
+        data["commentaryNum"] = lsections[-1] if len(lsections) == 1 \
+                else float('{0}.{1:04d}'.format(*lsections[-2:])) if len(lsections) > 1 else 0
+    return data
+
+
+def save_ref_client_data(client_data_by_id):
+    """
+    Stores `refClientData` computed for links that were saved without it
+    :param dict client_data_by_id: link _id to its `refClientData`
+    """
+    if client_data_by_id:
+        db.links.bulk_write([UpdateOne({"_id": _id}, {"$set": {"refClientData": data}}) for _id, data in client_data_by_id.items()], ordered=False)
+
+
+def process_index_change_in_link_client_data(indx, **kwargs):
+    """
+    Titles, categories and dates in `refClientData` come from the Index, so it is dropped from links to a changed Index.
+    It is computed again the next time those links are presented.
+    """
+    from sefaria.model.text import prepare_index_regex_for_dependency_process
+    pattern = prepare_index_regex_for_dependency_process(indx)
+    db.links.update_many({"refs": {"$regex": pattern}, "refClientData": {"$exists": True}}, {"$unset": {"refClientData": ""}})
+
+
 def process_index_delete_in_links(indx, **kwargs):
     from sefaria.model.text import prepare_index_regex_for_dependency_process
     pattern = prepare_index_regex_for_dependency_process(indx)
@@ -41,6 +41,78 @@ class Test_Lexicon_Lookup(object):
         results = LexiconLookupAggregator.lexicon_lookup(word3)
         assert results.count() == 1
 
+    def test_ngrams(self):
+        assert LexiconLookupAggregator._ngrams("a b c") == ["a b", "b c", "a", "b", "c"]
+        assert LexiconLookupAggregator._ngrams("a") == []
+
+    def test_lookup_uses_word_form_cache(self):
+        from sefaria.model.lexicon import word_form_cache
+        word = "תִּשְׁמֹ֑רוּ"
+        word_form_cache.clear()
+        LexiconLookupAggregator.lexicon_lookup(word)
+        pair = LexiconLookupAggregator._lookup_pair(word)
+        assert len(word_form_cache.get(pair)) > 0
+        assert LexiconLookupAggregator.lexicon_lookup(word)[0].headword == "שָׁמַר"
+
+
+class Test_Word_Form_Index(object):
+
+    def test_index(self, tmpdir):
+        from sefaria.model.lexicon import WordFormIndex, refs_have_prefix
+        records = [
+            {"_id": 1, "form": "אָב", "c_form": "אב", "refs": ["Genesis 2:24", "Exodus 1:1"], "lookups": [{"headword": "אָב", "parent_lexicon": "BDB Dictionary"}]},
+            {"_id": 2, "form": "אַב", "c_form": "אב", "lookups": [{"headword": "אַב", "parent_lexicon": "Jastrow Dictionary"}]},
+        ]
+        index = WordFormIndex(records)
+        assert len(index.get(("c_form", "אב"))) == 2
+        assert [r["_id"] for r in index.get(("form", "אָב"))] == [1]
+        assert index.get(("form", "אב")) == []
+
+        rec = index.get(("form", "אָב"))[0]
+        assert rec["refs"] == ["Exodus 1:1", "Genesis 2:24"]
+        assert refs_have_prefix(rec["refs"], "Genesis 2")
+        assert not refs_have_prefix(rec["refs"], "Genesis 3")
+
+        index.remove(2)
+        assert len(index.get(("c_form", "אב"))) == 1
+
+        filepath = str(tmpdir.join("word_forms.pkl"))
+        index.save(filepath)
+        assert len(WordFormIndex.load(filepath)) == 1
+
+    def test_word_form_index_built_on_first_use(self, monkeypatch):
+        from sefaria.model import text
+        from sefaria.model.lexicon import WordFormIndex
+        index = WordFormIndex()
+        monkeypatch.setattr(text, "ENABLE_WORD_FORM_INDEX", True)
+        monkeypatch.setattr(library, "_word_form_index", None)
+        monkeypatch.setattr(library, "build_word_form_index", lambda *args: setattr(library, "_word_form_index", index))
+        assert library.get_word_form_index() is index
+
+    def test_word_form_changes_reach_every_process(self, monkeypatch):
+        from sefaria.model import lexicon
+        from sefaria.model.lexicon import WordFormIndex
+
+        class FakeCoordinator(object):
+            events = []
+
+            def publish_event(self, obj, method, args=None):
+                self.events.append((obj, method, args))
+
+        index = WordFormIndex()
+        monkeypatch.setattr(library, "get_word_form_index", lambda: index)
+        monkeypatch.setattr(lexicon, "MULTISERVER_ENABLED", True)
+        monkeypatch.setattr(lexicon, "server_coordinator", FakeCoordinator())
+        wform = WordForm({"form": "בדיקה", "c_form": "בדיקה", "lookups": [{"headword": "בדיקה", "parent_lexicon": "Test Lexicon"}]})
+        try:
+            wform.save()
+            assert [r["_id"] for r in index.get(("form", "בדיקה"))] == [wform._id]
+            assert FakeCoordinator.events[-1] == ("lexicon", "refresh_word_form_in_cache", [str(wform._id)])
+        finally:
+            wform.delete()
+        assert index.get(("form", "בדיקה")) == []
+        assert FakeCoordinator.events[-1] == ("lexicon", "remove_word_form_from_cache", [str(wform._id)])
+
 
 class Test_Lexicon_Save(object):
 
@@ -429,6 +429,15 @@ class Test_Library(object):
         assert 'רש"י על בראשית' in library._index_title_maps["he"]["Rashi on Genesis"]
         assert 'רש"י על בראשית' in library._title_node_maps["he"]
 
+    def test_title_lists_updated_on_remove_and_add(self):
+        assert "Bereishit" in library.full_title_list("en")
+        library.remove_index_record_from_cache(library.get_index("Genesis"))
+        assert "Bereishit" not in library.full_title_list("en")
+        assert "Exodus" in library.full_title_list("en")
+        library.add_index_record_to_cache(Index().load({"title": "Genesis"}))
+        assert "Bereishit" in library.full_title_list("en")
+        assert sorted(library.full_title_list("en")) == sorted(library.get_title_node_dict("en").keys())
+
     def test_get_title_node(self):
         node = library.get_schema_node("Exodus")
         assert node.is_flat()
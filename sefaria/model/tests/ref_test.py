@@ -854,6 +854,56 @@ class Test_comparisons(object):
         assert Ref("Shabbat 5b:23-29").follows(Ref("Shabbat 5b:10-20"))
         assert not Ref("Shabbat 5b:15-29").follows(Ref("Shabbat 5b:10-20"))
 
+
+class Test_SegmentRefIndex(object):
+    def test_overlapping(self):
+        from sefaria.model.text import SegmentRefIndex
+        index = SegmentRefIndex(Ref("Genesis 1-2").all_segment_refs())
+        assert "Genesis 1:5" in index
+        assert "Genesis 3:1" not in index
+
+        positions = index.positions(["Genesis 1:5", "Genesis 1:3", "Genesis 2:1", "Genesis 3:1"])
+        assert [r.normal() for r in index.overlapping(Ref("Genesis 1"), positions)] == ["Genesis 1:3", "Genesis 1:5"]
+        assert [r.normal() for r in index.overlapping(Ref("Genesis 1:4-2:3"), positions)] == ["Genesis 1:5", "Genesis 2:1"]
+        assert [r.normal() for r in index.overlapping(Ref("Genesis 1:5"))] == ["Genesis 1:5"]
+        assert index.overlapping(Ref("Genesis 4"), positions) == []
+
+    def test_anchor_refs_match_unindexed(self):
+        from sefaria.model.text import SegmentRefIndex
+        oref = Ref("Genesis 1")
+        segment_index = SegmentRefIndex(oref.all_segment_refs())
+        doc_refs = ["Genesis 1:3-5", "Genesis 1:31-2:2", "Exodus 1:1"]
+        doc_expanded = Ref.expand_refs(doc_refs)
+        anchors, expanded = oref.get_all_anchor_refs(segment_index.normals(), doc_refs, doc_expanded)
+        indexed_anchors, indexed_expanded = oref.get_all_anchor_refs(segment_index.normals(), doc_refs, doc_expanded, segment_index=segment_index)
+        assert anchors == indexed_anchors
+        assert [sorted(r.normal() for r in l) for l in expanded] == [sorted(r.normal() for r in l) for l in indexed_expanded]
+
+
+class Test_Span(object):
+    @staticmethod
+    def spans_overlap(a, b):
+        return a["node"] == b["node"] and a["start"] <= b["end"] and b["start"] <= a["end"]
+
+    def test_span_overlap_matches_ref_overlap(self):
+        trefs = ["Genesis", "Genesis 5", "Genesis 5:10-20", "Genesis 5:18-25", "Genesis 5:21-25", "Genesis 5:10-6:20",
+                 "Genesis 6:18-25", "Genesis 6", "Exodus 5:10", "Shabbat 5b-7a", "Shabbat 6b-9a", "Shabbat 15b-17a",
+                 "Shabbat 5b:10-20", "Shabbat 5b:23-29", "Rashi on Genesis 5:10-20", "Rashi on Genesis 5:18-25"]
+        orefs = [Ref(tref) for tref in trefs]
+        for a in orefs:
+            for b in orefs:
+                assert self.spans_overlap(a.span(), b.span()) == a.overlaps(b), "{} / {}".format(a, b)
+
+    def test_spans_for_refs(self):
+        spans = Ref.spans_for_refs(["Genesis 1:1", "Genesis 1:1", "Not a ref 1:1"])
+        assert spans == [Ref("Genesis 1:1").span()]
+
+    def test_span_query(self):
+        query = Ref("Genesis 1").span_query()
+        assert query["refSpans"]["$elemMatch"]["node"] == "Genesis"
+        assert Ref("Genesis 1").span_query(field="spans").keys() == {"spans"}
+
+
 @pytest.mark.skip(reason='Zohar structure has been changed. We currently have no index with talmud at second place')
 class Test_Talmud_at_Second_Place(object):
     def test_simple_ref(self):
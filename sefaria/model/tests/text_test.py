@@ -1,7 +1,9 @@
 # -*- coding: utf-8 -*-
+import json
 import regex as re
 from copy import deepcopy
 import pytest
+from bson.objectid import ObjectId
 
 import sefaria.model as model
 from sefaria.system.exceptions import InputError
@@ -790,4 +792,144 @@ class TestVersionActualLanguage:
 
     def test_fails_validation_when_language_mismatch(self):
         with pytest.raises(InputError, match='Version actualLanguage does not match bracketed language'):
-            self.versionThatWillBreak.save()
\ No newline at end of file
+            self.versionThatWillBreak.save()
+
+class TestVersionCatalog:
+
+    def test_content_map(self):
+        catalog = model.text.VersionCatalog
+        assert catalog.content_map(["a", "", "b"]) == (3, 0b101)
+        assert catalog.content_map([["a"], [], ["", "b"]]) == [(1, 1), (0, 0), (2, 0b10)]
+        assert catalog.content_map("") is False
+
+    def test_ref_has_content(self):
+        catalog = model.text.VersionCatalog
+        oref = model.Ref("Genesis 1")
+        record = {"masks": {tuple(oref.index_node.address()): [(2, 0b10), (0, 0)]}, "present": set()}
+        assert catalog._ref_has_content(record, model.Ref("Genesis 1"))
+        assert catalog._ref_has_content(record, model.Ref("Genesis 1:2"))
+        assert not catalog._ref_has_content(record, model.Ref("Genesis 1:1"))
+        assert not catalog._ref_has_content(record, model.Ref("Genesis 2"))
+        assert not catalog._ref_has_content(record, model.Ref("Genesis 3"))
+        assert catalog._ref_has_content(record, model.Ref("Genesis 1:2-2:1"))
+
+    @pytest.mark.parametrize("tref", ["Genesis", "Genesis 1", "Genesis 1:4-7", "Genesis 1:30-2:3", "Rashi on Genesis 1:1", "Pirkei Avot 1"])
+    def test_matches_version_query(self, tref):
+        oref = model.Ref(tref)
+        for lang in [None, "en", "he"]:
+            expected = [v.versionTitle for v in model.VersionSet(oref.condition_query(lang))]
+            assert [r["versionTitle"] for r in model.text.version_catalog.versions_for_ref(oref, lang)] == expected
+
+    def test_entries_shared_between_processes(self):
+        from sefaria.system.cache import get_shared_cache_elem
+        catalog = model.text.VersionCatalog()
+        key = catalog._shared_key("Genesis")
+        catalog.invalidate("Genesis", shared=True)
+        entry = catalog.get("Genesis")
+        # stored as JSON, which the shared cache may be serialized to
+        shared = json.loads(json.dumps(get_shared_cache_elem(key)))
+        assert catalog._load_entry(shared) == entry
+        catalog.invalidate("Genesis")
+        assert catalog.get("Genesis") == entry
+        catalog.invalidate("Genesis", shared=True)
+        assert get_shared_cache_elem(key) is None
+
+    def test_shared_entry_of_older_revision(self):
+        from sefaria.system.cache import get_shared_cache_elem, set_shared_cache_elem
+        catalog = model.text.VersionCatalog()
+        key = catalog._shared_key("Genesis")
+        entry = catalog.get("Genesis")
+        shared = get_shared_cache_elem(key)
+        stale_record = dict(shared["records"][0], versionTitle="Stale")
+        set_shared_cache_elem(key, dict(shared, records=[stale_record], fingerprint={}))
+        catalog.invalidate("Genesis")
+        assert catalog.get("Genesis") == entry
+
+
+@pytest.mark.parametrize("texts", [
+    [["a", ""], ["", "b", "c"]],
+    [[["a", ""], ["p", "", "q"]], [["", "b", "c"], ["p", "d", ""]]],
+    [[["a", ""], ["p", "", ""]], [["", "b", ""], ["p", "d", ""]], [["", "", "c"], ["", "", "q"]]],
+    [[[["a"], []]], [[["", "b"], ["c"]]]],
+])
+def test_merge_texts_with_attribution(texts):
+    sources = ["v{}".format(i) for i in range(len(texts))]
+    merged, expected_sources = model.merge_texts(texts, sources)
+    merged_with_attribution, attribution = model.text.merge_texts_with_attribution(texts)
+    assert merged_with_attribution == merged
+    assert [sources[s] for t, s in model.text._flatten_attribution(merged_with_attribution, attribution)] == expected_sources
+
+
+def test_stored_merged_section(monkeypatch):
+    from sefaria.system.database import db
+    monkeypatch.setattr(model.text, "USE_MERGED_TEXTS", True)
+    oref = model.Ref("Genesis 2")
+    query = model.text._merged_section_query("Genesis", "en", oref.index_node, 2)
+    try:
+        model.text.build_merged_section("Genesis", "en", oref)
+        doc = db.merged_texts.find_one(query)
+        versions = model.VersionSet({"title": "Genesis", "language": "en"}, proj=dict(oref.part_projection(), _id=1)).array()
+        assert doc["fingerprint"] == model.text.merged_text_fingerprint([vars(v) for v in versions])
+        assert doc["chapter"] == model.text.merge_texts_with_attribution([v.content_node(oref.index_node)[0] for v in versions])[0]
+
+        # a version saved since the merge was stored makes it out of date
+        db.merged_texts.update_one(query, {"$set": {"fingerprint": {}}})
+        candidates = [r for r in model.text.version_catalog.get("Genesis") if r["language"] == "en"]
+        assert not model.TextChunk(oref, "en")._load_merged_text("en", candidates, False, None, None)
+    finally:
+        db.merged_texts.delete_one(query)
+
+
+@pytest.mark.parametrize(("tref", "expected"), [
+    ("Genesis", False),
+    ("Genesis 1-2", False),
+    ("Genesis 1:30-2:3", False),
+    ("Genesis 1", True),
+    ("Genesis 1:2-5", True),
+    ("Pirkei Avot", False),
+])
+def test_merged_texts_rebuilt_for_whole_book_saves(monkeypatch, tref, expected):
+    rebuilt = []
+    monkeypatch.setattr(model.text, "USE_MERGED_TEXTS", True)
+    monkeypatch.setattr(model.text, "build_merged_text_in_background", lambda title, lang: rebuilt.append(None))
+    monkeypatch.setattr(model.text, "build_merged_section", lambda title, lang, oref: None)
+    ver = model.Version({"title": "Genesis", "language": "en", "_id": ObjectId(), "revision": 1})
+    ver._changed_ref = model.Ref(tref)
+    model.text.process_version_change_in_merged_texts(ver)
+    assert bool(rebuilt) != expected
+
+
+def test_attribution_titles():
+    assert model.text._attribution_titles([[0, 1], [1]], ["a", "b"]) == [["a", "b"], ["b"]]
+
+
+def test_text_family_preloaded_versions():
+    oref = model.Ref("Genesis 1")
+    vtitles = {lang: model.TextChunk.versions_to_load(oref, lang) for lang in ["en", "he"]}
+    preloaded = model.TextChunk.load_versions(oref, vtitles)
+    assert set(preloaded) == {(lang, vtitle) for lang, titles in vtitles.items() for vtitle in titles}
+    family = model.TextFamily(oref, commentary=False).contents()
+    assert family["text"] == model.TextChunk(oref, "en").text
+    assert family["he"] == model.TextChunk(oref, "he").text
+
+
+@pytest.mark.parametrize(('tref', 'kwargs'), [
+    ["Genesis 1-3", {}],
+    ["Genesis 1:5-3:4", {"stripItags": True}],
+])
+def test_text_family_stream(tref, kwargs):
+    from sefaria.client.util import iter_json
+    oref = model.Ref(tref)
+    family = model.TextFamily(oref, commentary=False, pad=False, **kwargs).contents()
+    streamed = model.TextFamily(oref, commentary=False, pad=False, stream=True, **kwargs).contents()
+    assert json.loads(b"".join(iter_json(streamed))) == json.loads(json.dumps(family))
+
+
+def test_alt_struct_interval_index():
+    index = model.library.get_index("Genesis")
+    starts = index.alt_struct_interval_index().starts_in(model.Ref("Genesis 6"))
+    noach = [(start_ref, labels) for start_ref, labels in starts if "Noach" in labels["en"]]
+    assert len(noach) == 1
+    assert noach[0][0] == model.Ref("Genesis 6:9")
+    assert noach[0][1]["whole"]
+    assert index.alt_struct_interval_index().starts_in(model.Ref("Genesis 6:9")) == []
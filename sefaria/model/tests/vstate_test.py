@@ -13,6 +13,25 @@ class Test_VState(object):
             assert getattr(vs, "title")
             assert getattr(vs, "content")
 
+    def test_navigation_matches_walk(self):
+        from sefaria.model.text import SectionNavigationTable
+        for title in ["Exodus", "Shabbat", "Rashi on Exodus", "Pesach Haggadah"]:
+            vs = VersionState(title)
+            refs = vs.navigation_refs()
+            assert refs
+            table = SectionNavigationTable(library.get_index(title), refs)
+            for tref in refs[:3] + refs[-3:]:
+                oref = Ref(tref)
+                expected_next = oref._iter_text_section(vstate=vs) if oref.index_node.depth > 1 else None
+                expected_prev = oref._iter_text_section(False, vstate=vs) if oref.index_node.depth > 1 else None
+                if expected_next:
+                    assert table.next_section_ref(oref) == expected_next
+                if expected_prev:
+                    assert table.prev_section_ref(oref) == expected_prev
+            for prev, next in zip(refs, refs[1:]):
+                assert table.next_section_ref(Ref(prev)).normal() == next
+                assert table.prev_section_ref(Ref(next)).normal() == prev
+
 
 class Test_VSNode(object):
     def test_section_counts(self):
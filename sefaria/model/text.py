@@ -9,14 +9,19 @@ from functools import reduce, partial
 from typing import Optional, Union
 logger = structlog.get_logger(__name__)
 
+import os
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import regex
 import copy
 import bleach
 import json
 import itertools
+import bisect
 from collections import defaultdict
 from bs4 import BeautifulSoup, Tag
+from bson.objectid import ObjectId
 try:
     import re2 as re
     re.set_fallback_notification(re.FALLBACK_WARNING)
@@ -35,8 +40,10 @@ from sefaria.system.exceptions import InputError, BookNameError, PartialRefInput
 from sefaria.utils.hebrew import is_hebrew, hebrew_term
 from sefaria.utils.util import list_depth, truncate_string
 from sefaria.datatype.jagged_array import JaggedTextArray, JaggedArray
-from sefaria.settings import DISABLE_INDEX_SAVE, USE_VARNISH, MULTISERVER_ENABLED, RAW_REF_MODEL_BY_LANG_FILEPATH, RAW_REF_PART_MODEL_BY_LANG_FILEPATH, DISABLE_AUTOCOMPLETER
+from sefaria.settings import DISABLE_INDEX_SAVE, USE_VARNISH, MULTISERVER_ENABLED, RAW_REF_MODEL_BY_LANG_FILEPATH, RAW_REF_PART_MODEL_BY_LANG_FILEPATH, DISABLE_AUTOCOMPLETER, \
+    ENABLE_VERSION_CATALOG, USE_MERGED_TEXTS, LIBRARY_LAZY_INIT, WORD_FORM_INDEX_SNAPSHOT_FILEPATH, ENABLE_WORD_FORM_INDEX
 from sefaria.system.multiserver.coordinator import server_coordinator
+from sefaria.system import startup, instrumentation
 from sefaria.constants import model as constants
 
 """
@@ -238,6 +245,7 @@ class Index(abst.AbstractMongoRecord, AbstractIndex):
 
     def _set_struct_objs(self):
         self.struct_objs = {}
+        self._alt_struct_interval_index = None
         if getattr(self, "alt_structs", None) and self.nodes:
             for name, struct in list(self.alt_structs.items()):
                 self.struct_objs[name] = deserialize_tree(struct, index=self, struct_class=TitledTreeNode)
@@ -363,6 +371,7 @@ class Index(abst.AbstractMongoRecord, AbstractIndex):
         """
         self.struct_objs[name] = struct_obj
         self.struct_objs[name].title_group = self.nodes.title_group
+        self._alt_struct_interval_index = None
 
     def get_alt_structure(self, name):
         """
@@ -376,6 +385,14 @@ class Index(abst.AbstractMongoRecord, AbstractIndex):
     def has_alt_structures(self):
         return bool(self.struct_objs)
 
+    def alt_struct_interval_index(self):
+        """
+        :returns: :py.class:`AltStructIntervalIndex`, built on first use
+        """
+        if getattr(self, "_alt_struct_interval_index", None) is None:
+            self._alt_struct_interval_index = AltStructIntervalIndex(self)
+        return self._alt_struct_interval_index
+
     #These next 3 functions parallel functions on Library, but are simpler.  Refactor?
     def alt_titles_dict(self, lang):
         title_dict = {}
@@ -1265,6 +1282,25 @@ class AbstractTextRecord(object):
         start_sections = None if start_sections is None else [s-1 for s in start_sections]  # zero-indexed for ja
         return self.ja().modify_by_function(modifier, start_sections)
 
+    def _iter_text_after_modifications(self, text_modification_funcs, start_sections=None):
+        """
+        Like :meth:`_get_text_after_modifications`, for texts that are lists, but yields the text one top level
+        element at a time (e.g. one section of a range of sections), applying text_modification_funcs as it goes
+        """
+        text = getattr(self, self.text_attr)
+        if len(text_modification_funcs) == 0:
+            yield from text
+            return
+
+        def modifier(string, sections):
+            for func in text_modification_funcs:
+                string = func(string, sections)
+            return string
+        start_sections = None if start_sections is None else [s-1 for s in start_sections]  # zero-indexed for ja
+        ja = self.ja()
+        for i, element in enumerate(text):
+            yield ja.modify_by_function(modifier, start_sections, element, [i])
+
     # Currently assumes that text is JA
     def _sanitize(self):
         setattr(self, self.text_attr,
@@ -1331,6 +1367,7 @@ class Version(AbstractTextRecord, abst.AbstractMongoRecord, AbstractSchemaConten
         "hasManuallyWrappedRefs",  # true for texts where refs were manually wrapped in a-tags. no need to run linker at run-time.
         "actualLanguage",
         "isBaseText",
+        "revision",  # incremented on every save
     ]
 
     def __str__(self):
@@ -1403,6 +1440,11 @@ class Version(AbstractTextRecord, abst.AbstractMongoRecord, AbstractSchemaConten
         # sanitization happens on TextChunk saving
         pass
 
+    def _pre_save(self):
+        # lets stored merges tell whether they include the latest content
+        self._previous_revision = getattr(self, "revision", 0)
+        self.revision = self._previous_revision + 1
+
     def get_index(self):
         return library.get_index(self.title)
 
@@ -1582,6 +1624,16 @@ class VersionSet(abst.AbstractMongoSet):
     def __init__(self, query={}, page=0, limit=0, sort=[["priority", -1], ["_id", 1]], proj=None):
         super(VersionSet, self).__init__(query, page, limit, sort, proj)
 
+    @classmethod
+    def from_versions(cls, query, versions):
+        """
+        A VersionSet of Versions that have already been loaded with `query`
+        """
+        vset = cls(query)
+        vset.records = list(versions)
+        vset.max = len(vset.records)
+        return vset
+
     def word_count(self):
         return sum([v.word_count() for v in self])
 
@@ -1661,6 +1713,418 @@ def merge_texts(text, sources):
     return [text, text_sources]
 
 
+def merge_texts_with_attribution(text):
+    """
+    Merges like :func:`merge_texts`, but rather than a flat list of sources, returns the index of the source of each
+    segment in an array with the same shape as the merged text.
+    e.g. [["a", ""], ["", "b", "c"]] becomes ["a", "b", "c"], [0, 1, 1]
+    """
+    if not len(text):
+        return "", []
+
+    depth = list_depth(text)
+    if depth > 2:
+        results = []
+        result_sources = []
+        for x in range(max(list(map(len, text)))):
+            result, source = merge_texts_with_attribution([(t[x] if x < len(t) else None) or [] for t in text])
+            results.append(result)
+            result_sources.append(source)
+        return results, result_sources
+
+    if depth == 1:
+        text = [[x] for x in text]
+
+    merged = []
+    merged_sources = []
+    for verses in itertools.zip_longest(*text):
+        index, value = 0, ""
+        for i, version in enumerate(verses):
+            if version:
+                index = i
+                value = version
+                break
+        merged.append(value)
+        merged_sources.append(index)
+
+    if depth == 1:
+        return merged[0], merged_sources[0]
+    return merged, merged_sources
+
+
+def _attribution_titles(attribution, vtitles):
+    """
+    Replaces each position in `attribution` with the title in `vtitles` at that position
+    """
+    if isinstance(attribution, list):
+        return [_attribution_titles(a, vtitles) for a in attribution]
+    return vtitles[attribution]
+
+
+def _flatten_attribution(text, sources):
+    """
+    Pairs each segment of a merged text with its source index, in order
+    """
+    if isinstance(text, list):
+        for t, s in zip(text, sources):
+            yield from _flatten_attribution(t, s)
+    else:
+        yield text, sources
+
+
+def merged_text_fingerprint(versions_attrs):
+    """
+    :param versions_attrs: dicts of the attributes of Versions, with their `_id` and `revision`
+    :return dict: the revision of each version, by id, which changes whenever any of the versions are saved
+    """
+    return {str(attrs["_id"]): attrs.get("revision", 0) for attrs in versions_attrs}
+
+
+def _merged_section_query(title, lang, node, section):
+    return {"title": title, "language": lang, "node": ".".join(node.address()[1:]), "section": section}
+
+
+def build_merged_section(title, lang, oref, exclude_id=None):
+    """
+    Stores the merge of the `lang` Versions of `title` at the top level section `oref`, as read by :class:`TextChunk`
+    when no version is specified.  Texts of depth 1 are merged a whole node at a time.
+    The document in the `merged_texts` collection holds the merged content as `chapter`, with a parallel `sources`
+    array that holds, for each segment, the position in `versionTitles` of the Version it came from, and the
+    `fingerprint` of the versions it was merged from.  Sections with fewer than two versions don't need a merge.
+    :param exclude_id: _id of a Version that is being deleted
+    """
+    node = oref.index_node
+    section = oref.sections[0] if node.depth > 1 else None
+    query = _merged_section_query(title, lang, node, section)
+    projection = dict(oref.part_projection() if node.depth > 1 else node.ref().part_projection(), _id=1)
+    versions = [v for v in VersionSet({"title": title, "language": lang}, proj=projection) if v._id != exclude_id]
+    if len(versions) < 2:
+        db.merged_texts.delete_one(query)
+        return
+    contents = []
+    for v in versions:
+        try:
+            content = v.content_node(node)
+        except (KeyError, TypeError, AttributeError):
+            content = None
+        if section is not None:
+            # the projection sliced out the one section
+            content = content[0] if content else None
+        contents.append(content or [])
+    merged, attribution = merge_texts_with_attribution(contents)
+    db.merged_texts.replace_one(query, dict(query, **{
+        "versionTitles": [v.versionTitle for v in versions],
+        "fingerprint": merged_text_fingerprint([vars(v) for v in versions]),
+        Version.content_attr: merged,
+        "sources": attribution,
+    }), upsert=True)
+
+
+def build_merged_text(title, lang, exclude_id=None):
+    """
+    Stores the merge of every section of the `lang` Versions of `title`, one section at a time,
+    see :func:`build_merged_section`
+    """
+    index = library.get_index(title)
+    for node in index.nodes.get_leaf_nodes():
+        if not isinstance(node, JaggedArrayNode):
+            continue
+        node_ref = node.ref()
+        if node.depth == 1:
+            build_merged_section(title, lang, node_ref, exclude_id)
+            continue
+        sizes = db.texts.aggregate([
+            {"$match": {"title": title, "language": lang, "_id": {"$ne": exclude_id}}},
+            {"$project": {"size": {"$cond": [{"$isArray": "$" + node_ref.storage_address()}, {"$size": "$" + node_ref.storage_address()}, 0]}}},
+        ])
+        num_sections = max([d["size"] for d in sizes] or [0])
+        for section in range(1, num_sections + 1):
+            build_merged_section(title, lang, node_ref.subref(section), exclude_id)
+        db.merged_texts.delete_many(dict(_merged_section_query(title, lang, node, None), section={"$gt": num_sections}))
+
+
+_merge_executor = None
+_merge_executor_pid = None
+_merges_pending = set()  # (title, language) of queued merges
+_merges_lock = threading.Lock()
+
+
+def _get_merge_executor():
+    """
+    Threads don't survive a fork, so each process starts its own executor, and forgets the merges queued in the
+    process it was forked from.  Called with _merges_lock held.
+    """
+    global _merge_executor, _merge_executor_pid
+    if _merge_executor is None or _merge_executor_pid != os.getpid():
+        _merge_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="merged_texts")
+        _merge_executor_pid = os.getpid()
+        _merges_pending.clear()
+    return _merge_executor
+
+
+def build_merged_text_in_background(title, lang, exclude_id=None):
+    with _merges_lock:
+        executor = _get_merge_executor()
+        if (title, lang) in _merges_pending:
+            return
+        _merges_pending.add((title, lang))
+
+    def _build():
+        with _merges_lock:
+            _merges_pending.discard((title, lang))
+        try:
+            build_merged_text(title, lang, exclude_id)
+        except Exception:
+            logger.exception("Failed to build merged text", title=title, language=lang)
+
+    executor.submit(_build)
+
+
+def delete_merged_texts(title, lang=None):
+    query = {"title": title}
+    if lang:
+        query["language"] = lang
+    db.merged_texts.delete_many(query)
+
+
+class VersionCatalog(object):
+    """
+    Per process catalog of the Versions of each Index: their metadata, first available section, and a compact map of
+    which locations have content.
+    Lets :meth:`Ref.version_list` and :class:`TextChunk` choose versions without querying the texts collection,
+    so that only the content of the chosen versions is loaded.
+
+    Entries are built lazily, one Index at a time, and dropped when a Version or the Index changes. Building an entry
+    reads the content of every version of the Index, so built entries are kept in the shared cache, where other
+    processes find them rather than building their own.  They are stored there as JSON, with the revisions of the
+    versions they were built from, and aren't used if a version has been saved since.
+
+    Content maps mirror the semantics of :meth:`Ref.condition_query`. A jagged array is stored as a list of
+    its elements' maps. An array of strings is stored as a tuple (length, bitmask of non-empty elements).
+    A string is stored as a bool.
+    """
+    version_list_fields = ["title", "versionTitle", "versionSource", "language", "status", "license", "versionNotes",
+                           "digitizedBySefaria", "priority", "versionTitleInHebrew", "versionNotesInHebrew", "extendedNotes",
+                           "extendedNotesHebrew", "purchaseInformationImage", "purchaseInformationURL", "shortVersionTitle",
+                           "shortVersionTitleInHebrew", "isBaseText"]
+    _missing = object()
+
+    shared_timeout = 60 * 60 * 24
+
+    def __init__(self, max_size=500):
+        # Entries are dropped when their versions change, so they don't need a timeout
+        self._entries = scache.LRUCache(max_size=max_size)
+
+    def stats(self):
+        return self._entries.stats()
+
+    @staticmethod
+    def _shared_key(title):
+        return "version_catalog:{}".format(title)
+
+    def invalidate(self, title=None, shared=False):
+        """
+        Drops the catalog entry for Index `title`, or every entry if `title` is None
+        :param shared: also drop the entry for `title` from the shared cache
+        """
+        if title is None:
+            self._entries.clear()
+            return
+        self._entries.delete(title)
+        if shared:
+            scache.delete_shared_cache_elem(self._shared_key(title))
+
+    def get(self, title):
+        """
+        :param title: Index title
+        :return list: catalog records for the versions of `title`, in VersionSet order
+        """
+        entry = self._entries.get(title)
+        if entry is not None:
+            return entry
+        fingerprint = self._fingerprint(title)
+        shared = scache.get_shared_cache_elem(self._shared_key(title))
+        if shared is not None and shared["fingerprint"] == fingerprint:
+            entry = self._load_entry(shared)
+        else:
+            entry = self._build(title)
+            if merged_text_fingerprint(r["attrs"] for r in entry) != self._fingerprint(title):
+                return entry  # a version was saved while building
+            scache.set_shared_cache_elem(self._shared_key(title), self._dump_entry(entry), self.shared_timeout)
+        self._entries.set(title, entry)
+        return entry
+
+    @staticmethod
+    def _fingerprint(title):
+        return merged_text_fingerprint(db.texts.find({"title": title}, {"revision": 1}))
+
+    @classmethod
+    def _dump_entry(cls, entry):
+        """
+        :return dict: `entry`, with only JSON values, and the fingerprint of the versions it was built from
+        """
+        return {
+            "fingerprint": merged_text_fingerprint(r["attrs"] for r in entry),
+            "records": [dict(r,
+                             attrs=dict(r["attrs"], _id=str(r["attrs"]["_id"])),
+                             masks=[[list(address), cls._dump_map(m)] for address, m in r["masks"].items()],
+                             present=[list(address) for address in r["present"]]) for r in entry],
+        }
+
+    @classmethod
+    def _load_entry(cls, shared):
+        return [dict(r,
+                     attrs=dict(r["attrs"], _id=ObjectId(r["attrs"]["_id"])),
+                     masks={tuple(address): cls._load_map(m) for address, m in r["masks"]},
+                     present={tuple(address) for address in r["present"]}) for r in shared["records"]]
+
+    @classmethod
+    def _dump_map(cls, m):
+        if isinstance(m, tuple):
+            return {"length": m[0], "bits": m[1]}
+        if isinstance(m, list):
+            return [cls._dump_map(e) for e in m]
+        return m
+
+    @classmethod
+    def _load_map(cls, m):
+        if isinstance(m, dict):
+            return m["length"], m["bits"]
+        if isinstance(m, list):
+            return [cls._load_map(e) for e in m]
+        return m
+
+    @classmethod
+    def _build(cls, title):
+        index = library.get_index(title)
+        entry = []
+        # Load content one version at a time, so that only one version's text is held at once
+        for version_meta in VersionSet({"title": title}, proj={Version.content_attr: 0}):
+            v = Version().load_by_id(version_meta._id)
+            if v is None:
+                continue
+            try:
+                first_section_ref = v.first_section_ref() or index.nodes.first_leaf().first_section_ref()
+            except (AssertionError, AttributeError):
+                first_section_ref = None
+            masks, present = {}, set()
+            cls._map_node(v, index.nodes, masks, present)
+            entry.append({
+                "versionTitle": v.versionTitle,
+                "language": v.language,
+                "metadata": {f: getattr(v, f, "") for f in cls.version_list_fields},
+                "attrs": {k: getattr(v, k) for k in ["_id"] + Version.required_attrs + Version.optional_attrs
+                          if k != Version.content_attr and hasattr(v, k)},
+                "firstSectionRef": first_section_ref.normal() if first_section_ref else None,
+                "masks": masks,
+                "present": present,
+            })
+        return entry
+
+    @classmethod
+    def _map_node(cls, version, node, masks, present):
+        try:
+            content = version.content_node(node)
+        except (KeyError, IndexError, TypeError, AttributeError):
+            return
+        present.add(tuple(node.address()))
+        if node.children:
+            for child in node.children:
+                cls._map_node(version, child, masks, present)
+        elif isinstance(node, JaggedArrayNode):
+            masks[tuple(node.address())] = cls.content_map(content)
+
+    @classmethod
+    def content_map(cls, content):
+        if not isinstance(content, list):
+            return content not in ("", 0)
+        if not any(isinstance(e, list) for e in content):
+            bits = 0
+            for i, e in enumerate(content):
+                if e not in ("", 0):
+                    bits |= 1 << i
+            return len(content), bits
+        return [cls.content_map(e) for e in content]
+
+    @staticmethod
+    def _is_nonempty(m):
+        # an element that is not "", [] or 0
+        if isinstance(m, tuple):
+            return m[0] > 0
+        if isinstance(m, list):
+            return len(m) > 0
+        return m
+
+    @classmethod
+    def _has_content(cls, m):
+        # an array with any non-empty element
+        if isinstance(m, tuple):
+            return m[1] != 0
+        if isinstance(m, list):
+            return any(cls._is_nonempty(e) for e in m)
+        return False
+
+    @classmethod
+    def _map_at(cls, m, indexes):
+        for i in indexes:
+            if isinstance(m, tuple):
+                if i >= m[0]:
+                    return cls._missing
+                m = bool(m[1] >> i & 1)
+            elif isinstance(m, list):
+                if i >= len(m):
+                    return cls._missing
+                m = m[i]
+            else:
+                return cls._missing
+        return m
+
+    @classmethod
+    def _ref_has_content(cls, record, oref):
+        if not isinstance(oref.index_node, JaggedArrayNode):
+            return tuple(oref.index_node.address()) in record["present"]
+        m = record["masks"].get(tuple(oref.index_node.address()), cls._missing)
+        if m is cls._missing:
+            return False
+        if not oref.sections:
+            return cls._has_content(m)
+        if oref.is_spanning():
+            return any(cls._ref_has_content(record, r) for r in oref.split_spanning_ref())
+        depth = len(oref.sections) if not oref.is_range() else len(oref.sections) - 1
+        m = cls._map_at(m, [s - 1 for s in oref.sections[:depth]])
+        if m is cls._missing:
+            return False
+        if len(oref.sections) == oref.index_node.depth and not oref.is_range():
+            return cls._is_nonempty(m)
+        return cls._has_content(m)
+
+    def versions_for_ref(self, oref, lang=None, actual_lang=None):
+        """
+        The catalog equivalent of `VersionSet(oref.condition_query(lang, actual_lang))`
+        :return list: catalog records for versions with content at `oref`, in VersionSet order, or None if the catalog can't answer for `oref`
+        """
+        if not ENABLE_VERSION_CATALOG or oref.index_node.is_virtual:
+            return None
+        records = self.get(oref.index.title)
+        if lang:
+            records = [r for r in records if r["language"] == lang]
+        if actual_lang:
+            # same selection as the versionTitle regex in condition_query
+            records = [r for r in records if self._title_language_code(r["versionTitle"]) == (None if actual_lang in {'en', 'he'} else actual_lang)]
+        return [r for r in records if self._ref_has_content(r, oref)]
+
+    def has_versions(self, title):
+        return len(self.get(title)) > 0
+
+    @staticmethod
+    def _title_language_code(version_title):
+        match = re.search(r"\[([a-z]{2})\]$", version_title)
+        return match.group(1) if match else None
+
+
+version_catalog = VersionCatalog()
+
+
 class TextFamilyDelegator(type):
     """
     Metaclass to delegate virtual text records
@@ -1672,10 +2136,11 @@ class TextFamilyDelegator(type):
         else:
             oref = kwargs.get("oref")
 
-        if oref and oref.index_node.is_virtual:
-            return VirtualTextChunk(*args, **kwargs)
-        else:
-            return super(TextFamilyDelegator, cls).__call__(*args, **kwargs)
+        with instrumentation.timer("text_chunk_ms", "text_chunk_loads"):
+            if oref and oref.index_node.is_virtual:
+                return VirtualTextChunk(*args, **kwargs)
+            else:
+                return super(TextFamilyDelegator, cls).__call__(*args, **kwargs)
 
 
 class TextChunk(AbstractTextRecord, metaclass=TextFamilyDelegator):
@@ -1691,12 +2156,13 @@ class TextChunk(AbstractTextRecord, metaclass=TextFamilyDelegator):
 
     text_attr = "text"
 
-    def __init__(self, oref, lang="en", vtitle=None, exclude_copyrighted=False, actual_lang=None, fallback_on_default_version=False):
+    def __init__(self, oref, lang="en", vtitle=None, exclude_copyrighted=False, actual_lang=None, fallback_on_default_version=False, preloaded_versions=None):
         """
         :param oref:
         :type oref: Ref
         :param lang: "he" or "en"
         :param vtitle:
+        :param preloaded_versions: optional dict of (language, versionTitle) to Version, as returned by :meth:`load_versions`, to use rather than querying for them
         :return:
         """
         if isinstance(oref.index_node, JaggedArrayNode):
@@ -1710,6 +2176,7 @@ class TextChunk(AbstractTextRecord, metaclass=TextFamilyDelegator):
         self._versions = []
         self._version_ids = None
         self._saveable = False  # Can this TextChunk be saved?
+        self._preloaded_versions = preloaded_versions or {}
 
         self.lang = lang
         self.is_merged = False
@@ -1722,7 +2189,7 @@ class TextChunk(AbstractTextRecord, metaclass=TextFamilyDelegator):
 
         if lang and vtitle and not fallback_on_default_version:
             self._saveable = True
-            v = Version().load({"title": self._oref.index.title, "language": lang, "versionTitle": vtitle}, self._oref.part_projection())
+            v = self._preloaded_versions.get((lang, vtitle)) or Version().load({"title": self._oref.index.title, "language": lang, "versionTitle": vtitle}, self._oref.part_projection())
             if exclude_copyrighted and v.is_copyrighted():
                 raise InputError("Can not provision copyrighted text. {} ({}/{})".format(oref.normal(), vtitle, lang))
             if v:
@@ -1742,7 +2209,23 @@ class TextChunk(AbstractTextRecord, metaclass=TextFamilyDelegator):
     def _choose_version_by_lang(self, oref, lang: str, exclude_copyrighted: bool, actual_lang: str = None, prioritized_vtitle: str = None) -> None:
         if prioritized_vtitle:
             actual_lang = None
-        vset = VersionSet(self._oref.condition_query(lang, actual_lang), proj=self._oref.part_projection())
+        candidates = version_catalog.versions_for_ref(self._oref, lang, actual_lang)
+        if candidates is None:
+            vset = VersionSet(self._oref.condition_query(lang, actual_lang), proj=self._oref.part_projection())
+        elif len(candidates) == 0:
+            if not version_catalog.has_versions(self._oref.index.title):
+                raise NoVersionFoundError("No text record found for '{}'".format(self._oref.index.title))
+            return
+        elif len(candidates) > 1 and self._load_merged_text(lang, candidates, exclude_copyrighted, actual_lang, prioritized_vtitle):
+            return
+        else:
+            # the catalog has already chosen the versions, so only their content is loaded
+            vtitles = [r["versionTitle"] for r in candidates]
+            query = {"title": self._oref.index.title, "language": lang, "versionTitle": {"$in": vtitles}}
+            if all((lang, t) in self._preloaded_versions for t in vtitles):
+                vset = VersionSet.from_versions(query, [self._preloaded_versions[(lang, t)] for t in vtitles])
+            else:
+                vset = VersionSet(query, proj=self._oref.part_projection())
         if len(vset) == 0:
             if VersionSet({"title": self._oref.index.title}).count() == 0:
                 raise NoVersionFoundError("No text record found for '{}'".format(self._oref.index.title))
@@ -1769,6 +2252,90 @@ class TextChunk(AbstractTextRecord, metaclass=TextFamilyDelegator):
                 self.is_merged = True
                 self._versions = vset.array()
 
+    @staticmethod
+    def versions_to_load(oref, lang, vtitle=None, actual_lang=None, fallback_on_default_version=False):
+        """
+        The titles of the versions whose content a TextChunk with these arguments reads, without querying the texts collection
+        :return list: version titles, or None if they can't be known in advance
+        """
+        if not isinstance(oref.index_node, JaggedArrayNode):
+            return None
+        if vtitle and not fallback_on_default_version:
+            return [vtitle]
+        candidates = version_catalog.versions_for_ref(oref, lang, None if vtitle else actual_lang)
+        if candidates is None or (USE_MERGED_TEXTS and len(candidates) > 1):
+            # chunks with several versions are read from the merged text
+            return None
+        return [r["versionTitle"] for r in candidates]
+
+    @staticmethod
+    def load_versions(oref, vtitles_by_lang):
+        """
+        Loads, in one query, the content at `oref` of the versions named in `vtitles_by_lang`
+        :param dict vtitles_by_lang: language to list of version titles
+        :return dict: (language, versionTitle) to Version
+        """
+        conditions = [{"language": lang, "versionTitle": {"$in": vtitles}} for lang, vtitles in vtitles_by_lang.items() if vtitles]
+        if not conditions:
+            return {}
+        vset = VersionSet({"title": oref.index.title, "$or": conditions}, proj=oref.part_projection())
+        return {(v.language, v.versionTitle): v for v in vset}
+
+    def _load_merged_text(self, lang, candidates, exclude_copyrighted, actual_lang, prioritized_vtitle):
+        """
+        Reads the merge of `candidates` from the stored merges of its sections, see :func:`build_merged_section`.
+        :return bool: False if the stored merges can't be used for this chunk, or were merged from different content
+        """
+        if not USE_MERGED_TEXTS or actual_lang or prioritized_vtitle:
+            return False
+        if exclude_copyrighted and any("Copyright" in r["attrs"].get("license", "") for r in candidates):
+            return False
+        refs = self._oref.split_spanning_ref() if self._oref.is_spanning() else [self._oref]
+        if any(len(r.sections) - r.is_range() > 1 for r in refs):
+            # Candidates were selected below the top level sections that are fetched, so other versions may fill
+            # segments in the fetched sections that a merge of only the candidates wouldn't.
+            return False
+        node = self._oref.index_node
+        if node.depth > 1 and not self._oref.sections:
+            # merges are stored by section, and a whole book is better read from its versions
+            return False
+        if node.depth > 1:
+            first = self._oref.sections[0]
+            last = first if self._oref.range_index() > 0 else self._oref.toSections[0]
+            sections = list(range(first, last + 1))
+        else:
+            sections = [None]
+        fingerprint = merged_text_fingerprint([r["attrs"] for r in version_catalog.get(self._oref.index.title) if r["language"] == lang])
+        query = _merged_section_query(self._oref.index.title, lang, node, None)
+        query["section"] = {"$in": sections}
+        docs = {d["section"]: d for d in db.merged_texts.find(query, {"_id": 0})}
+        if len(docs) < len(sections) or any(d["fingerprint"] != fingerprint for d in docs.values()):
+            # missing or out of date
+            return False
+        if node.depth > 1:
+            # as the versions would be, sliced by Ref.part_projection()
+            text = [docs[s][Version.content_attr] for s in sections]
+            attribution = [_attribution_titles(docs[s]["sources"], docs[s]["versionTitles"]) for s in sections]
+        else:
+            text = docs[None][Version.content_attr]
+            attribution = _attribution_titles(docs[None]["sources"], docs[None]["versionTitles"])
+            if self._oref.sections:
+                offset = self._oref.sections[0] - 1
+                limit = 1 if self._oref.range_index() > 0 else self._oref.toSections[0] - self._oref.sections[0] + 1
+                text, attribution = text[offset:offset + limit], attribution[offset:offset + limit]
+        text, attribution = self.trim_text(text), self.trim_text(attribution)
+        # as in a merge of only the candidates, empty segments are attributed to the first candidate
+        sources = [s if t else candidates[0]["versionTitle"] for t, s in _flatten_attribution(text, attribution)]
+        versions = [Version(dict(r["attrs"])) for r in candidates]
+        self.text = text
+        if len(set(sources)) == 1:
+            self._versions += [v for v in versions if v.versionTitle == sources[0]][:1]
+        else:
+            self.sources = sources
+            self.is_merged = True
+            self._versions = versions
+        return True
+
     def __str__(self):
         args = "{}, {}".format(self._oref, self.lang)
         if self.vtitle:
@@ -1783,7 +2350,10 @@ class TextChunk(AbstractTextRecord, metaclass=TextFamilyDelegator):
 
     def version_ids(self):
         if self._version_ids is None:
-            if self._versions:
+            if self._versions and ENABLE_VERSION_CATALOG and not self._oref.index_node.is_virtual:
+                vtitles = {v.versionTitle for v in self._versions}
+                self._version_ids = [r["attrs"]["_id"] for r in version_catalog.get(self._oref.index.title) if r["versionTitle"] in vtitles]
+            elif self._versions:
                 vtitle_query = [{'versionTitle': v.versionTitle} for v in self._versions]
                 query = {"title": self._oref.index.title, "$or": vtitle_query}
                 self._version_ids = VersionSet(query).distinct("_id")
@@ -1843,6 +2413,8 @@ class TextChunk(AbstractTextRecord, metaclass=TextFamilyDelegator):
 
         self._check_available_text_pre_save()
 
+        # lets dependencies tell which part of the version changed
+        self.full_version._changed_ref = self._oref
         self.full_version.save()
         self._oref.recalibrate_next_prev_refs(len(self.text))
         self._update_link_language_availability()
@@ -2231,6 +2803,7 @@ class TextFamily(object):
     :param version2: optional. Additional name of version to use.
     :param bool pad: Default: True.  Pads the provided ref before processing.  See :func:`Ref.padded_ref`
     :param bool alts: Default: False.  Adds notes of where alternate structure elements begin
+    :param bool stream: Default: False.  Makes `text` and `he` generators of their top level elements, where they are lists
     """
 
     ## Attribute maps used for generating dict format ##
@@ -2309,7 +2882,7 @@ class TextFamily(object):
         "he": "heSources"
     }
 
-    def __init__(self, oref, context=1, commentary=True, version=None, lang=None, version2=None, lang2=None, pad=True, alts=False, wrapLinks=False, stripItags=False, wrapNamedEntities=False, translationLanguagePreference=None, fallbackOnDefaultVersion=False):
+    def __init__(self, oref, context=1, commentary=True, version=None, lang=None, version2=None, lang2=None, pad=True, alts=False, wrapLinks=False, stripItags=False, wrapNamedEntities=False, translationLanguagePreference=None, fallbackOnDefaultVersion=False, stream=False):
         """
         :param oref:
         :param context:
@@ -2323,6 +2896,7 @@ class TextFamily(object):
         :param wrapLinks: whether to return the text requested with all internal citations marked up as html links <a>
         :param stripItags: whether to strip inline commentator tags and inline footnotes from text
         :param wrapNamedEntities: whether to return the text requested with all known named entities marked up as html links <a>.
+        :param stream: whether to return the text lazily, one top level element at a time, so that large ranges can be streamed
         :return:
         """
         if pad:
@@ -2350,9 +2924,24 @@ class TextFamily(object):
             oref = oref.context_ref()
         self._context_oref = oref
 
+        # plan the versions that the TextChunks will read, so that they can all be loaded in one query
+        vtitles_by_lang = {}
+        for language in self.text_attr_map:
+            curr_version = (version if language == lang else version2) if language in {lang, lang2} else None
+            actual_lang = translationLanguagePreference if language == 'en' else None
+            vtitles = TextChunk.versions_to_load(oref, language, curr_version, actual_lang, fallbackOnDefaultVersion)
+            if vtitles == [] and actual_lang and not curr_version:
+                # the chunk will fall back to versions in any language
+                vtitles = TextChunk.versions_to_load(oref, language, curr_version, None, fallbackOnDefaultVersion)
+            if vtitles is None:
+                continue
+            vtitles_by_lang[language] = vtitles
+        preloaded_versions = TextChunk.load_versions(oref, vtitles_by_lang)
+        has_inline_citations = None
+
         # processes "en" and "he" TextChunks, and puts the text in self.text and self.he, respectively.
         for language, attr in list(self.text_attr_map.items()):
-            tc_kwargs = dict(oref=oref, lang=language, fallback_on_default_version=fallbackOnDefaultVersion)
+            tc_kwargs = dict(oref=oref, lang=language, fallback_on_default_version=fallbackOnDefaultVersion, preloaded_versions=preloaded_versions)
             if language == 'en': tc_kwargs['actual_lang'] = translationLanguagePreference
             if language in {lang, lang2}:
                 curr_version = version if language == lang else version2
@@ -2381,20 +2970,28 @@ class TextFamily(object):
                             continue
                         temp_secs = tuple(s-1 for s in temp_ref.sections)
                         ne_by_secs[temp_secs] += [ne]
-                    text_modification_funcs += [lambda s, secs: library.get_wrapped_named_entities_string(ne_by_secs[tuple(secs)], s)]
+                    text_modification_funcs += [lambda s, secs, ne_by_secs=ne_by_secs: library.get_wrapped_named_entities_string(ne_by_secs[tuple(secs)], s)]
             if stripItags:
-                text_modification_funcs += [lambda s, secs: c.strip_itags(s), lambda s, secs: ' '.join(s.split()).strip()]
+                text_modification_funcs += [lambda s, secs, c=c: c.strip_itags(s), lambda s, secs: ' '.join(s.split()).strip()]
             if wrapLinks and c.version_ids() and not c.has_manually_wrapped_refs():
                 #only wrap links if we know there ARE links- get the version, since that's the only reliable way to get it's ObjectId
                 #then count how many links came from that version. If any- do the wrapping.
                 from . import Link
-                query = oref.ref_regex_query()
-                query.update({"inline_citation": True})  # , "source_text_oid": {"$in": c.version_ids()}
-                if Link().load(query) is not None:
+                if has_inline_citations is None:
+                    # the same for both languages, so only checked once
+                    query = oref.ref_regex_query()
+                    query.update({"inline_citation": True})  # , "source_text_oid": {"$in": c.version_ids()}
+                    has_inline_citations = Link().load(query) is not None
+                if has_inline_citations:
                     link_wrapping_reg, title_nodes = library.get_regex_and_titles_for_ref_wrapping(c.ja().flatten_to_string(), lang=language, citing_only=True)
-                    text_modification_funcs += [lambda s, secs: library.get_wrapped_refs_string(s, lang=language, citing_only=True, reg=link_wrapping_reg, title_nodes=title_nodes)]
+                    # bound as defaults, as streamed text is only modified after this loop is done
+                    text_modification_funcs += [lambda s, secs, language=language, reg=link_wrapping_reg, title_nodes=title_nodes: library.get_wrapped_refs_string(s, lang=language, citing_only=True, reg=reg, title_nodes=title_nodes)]
             padded_sections, _ = oref.get_padded_sections()
-            setattr(self, self.text_attr_map[language], c._get_text_after_modifications(text_modification_funcs, start_sections=padded_sections))
+            if stream and isinstance(getattr(c, c.text_attr), list):
+                text = c._iter_text_after_modifications(text_modification_funcs, start_sections=padded_sections)
+            else:
+                text = c._get_text_after_modifications(text_modification_funcs, start_sections=padded_sections)
+            setattr(self, self.text_attr_map[language], text)
 
         if oref.is_spanning():
             self.spanning = True
@@ -2415,55 +3012,21 @@ class TextFamily(object):
             # Set up empty Array that mirrors text structure
             alts_ja = JaggedArray()
 
-            for key, struct in oref.index.get_alt_structures().items():
-                # Assuming these are in order, continue if it is before ours, break if we see one after
-                for n in struct.get_leaf_nodes():
-                    wholeRef = Ref(n.wholeRef).default_child_ref().as_ranged_segment_ref()
-                    if wholeRef.ending_ref().precedes(oref):
-                        continue
-                    if wholeRef.starting_ref().follows(oref):
-                        break
-
-                    #It's in our territory
-                    wholeRefStart = wholeRef.starting_ref()
-                    if oref.contains(wholeRefStart) and not wholeRefStart.contains(oref):
-                        indxs = [k - 1 for k in wholeRefStart.in_terms_of(oref)]
-                        val = {"en":[], "he":[]}
+            for start_ref, labels in oref.index.alt_struct_interval_index().starts_in(oref):
+                indxs = [k - 1 for k in start_ref.in_terms_of(oref)]
+                val = {"en": [], "he": []}
 
-                        try:
-                            val = alts_ja.get_element(indxs) or val
-                        except IndexError:
-                            pass
-
-                        val["en"] += [n.primary_title("en")]
-                        val["he"] += [n.primary_title("he")]
-                        val["whole"] = True
-
-                        alts_ja.set_element(indxs, val)
-
-                    if getattr(n, "refs", None):
-                        for i, r in enumerate(n.refs):
-                            # hack to skip Rishon, skip empty refs
-                            if i == 0 or not r:
-                                continue
-                            subRef = Ref(r)
-                            subRefStart = subRef.starting_ref()
-                            if oref.contains(subRefStart) and not subRefStart.contains(oref):
-                                indxs = [k - 1 for k in subRefStart.in_terms_of(oref)]
-                                val = {"en":[], "he":[]}
-
-                                try:
-                                    val = alts_ja.get_element(indxs) or val
-                                except IndexError:
-                                    pass
-
-                                val["en"] += [n.sectionString([i + 1], "en", title=False)]
-                                val["he"] += [n.sectionString([i + 1], "he", title=False)]
+                try:
+                    val = alts_ja.get_element(indxs) or val
+                except IndexError:
+                    pass
 
-                                alts_ja.set_element(indxs, val)
+                val["en"] += labels["en"]
+                val["he"] += labels["he"]
+                if labels.get("whole"):
+                    val["whole"] = True
 
-                            elif subRefStart.follows(oref):
-                                break
+                alts_ja.set_element(indxs, val)
 
             self._alts = alts_ja.array()
         if self._inode.is_virtual:
@@ -2625,9 +3188,12 @@ class RefCacheType(type):
 
         if tref:
             if tref in cls.__tref_oref_map:
+                instrumentation.incr("ref_cache_hits")
                 return cls.__tref_oref_map[tref]
             else:
-                result = super(RefCacheType, cls).__call__(*args, **kwargs)
+                instrumentation.incr("ref_cache_misses")
+                with instrumentation.timer("ref_instantiation_ms", "ref_instantiations"):
+                    result = super(RefCacheType, cls).__call__(*args, **kwargs)
                 uid = result.uid()
                 title = result.index.title
                 if uid in cls.__tref_oref_map:
@@ -2648,7 +3214,8 @@ class RefCacheType(type):
 
                 return result
         elif obj_arg:
-            result = super(RefCacheType, cls).__call__(*args, **kwargs)
+            with instrumentation.timer("ref_instantiation_ms", "ref_instantiations"):
+                result = super(RefCacheType, cls).__call__(*args, **kwargs)
             uid = result.uid()
             title = result.index.title
             if uid in cls.__tref_oref_map:
@@ -3489,6 +4056,10 @@ class Ref(object, metaclass=RefCacheType):
                 nl = self.index_node.next_leaf()
                 self._next = nl.ref() if nl else None
                 return self._next
+            table = self._navigation_table() if vstate is None else None
+            if table:
+                self._next = table.next_section_ref(self)
+                return self._next
             self._next = self._iter_text_section(vstate=vstate)
             if self._next is None and not self.index_node.children:
                 current_leaf = self.index_node
@@ -3525,6 +4096,10 @@ class Ref(object, metaclass=RefCacheType):
                 pl = self.index_node.prev_leaf()
                 self._prev = pl.ref() if pl else None
                 return self._prev
+            table = self._navigation_table() if vstate is None else None
+            if table:
+                self._prev = table.prev_section_ref(self)
+                return self._prev
             self._prev = self._iter_text_section(False, vstate=vstate)
             if self._prev is None and not self.index_node.children:
                 current_leaf = self.index_node
@@ -3548,6 +4123,15 @@ class Ref(object, metaclass=RefCacheType):
                         break
         return self._prev
 
+    def _navigation_table(self):
+        """
+        :return SectionNavigationTable: for this Ref's Index, or None if next and previous sections have to be found by walking the VersionState
+        """
+        if not isinstance(self.index_node, JaggedArrayNode):
+            return None
+        table = get_navigation_table(self.index.title)
+        return table if table and table.covers(self) else None
+
     def recalibrate_next_prev_refs(self, add_self=True):
         """
         Internal. Called when a section is inserted or deleted.
@@ -3654,6 +4238,9 @@ class Ref(object, metaclass=RefCacheType):
             r = r.subref([1])
             return r.next_segment_ref() if r.is_empty() else r
         else:
+            table = r._navigation_table()
+            if table and r.is_section_level():
+                return r if r in table else r.next_section_ref()
             return r.next_section_ref() if r.is_empty() else r
 
     #Don't store results on Ref cache - state objects change, and don't yet propogate to this Cache
@@ -4402,6 +4989,66 @@ class Ref(object, metaclass=RefCacheType):
             logger.warning("Failed to execute order_id for {} : {}".format(self, e))
             return "Z"
 
+    # Ref spans encode the extent of a Ref within its node as two integers, one digit group per section level,
+    # so that overlap between stored refs can be found with a range query rather than a list of segment refs.
+    SPAN_SECTION_BASE = 10000
+    SPAN_MAX_DEPTH = 4
+
+    @classmethod
+    def _span_position(cls, sections, depth, fill):
+        position = 0
+        for i in range(min(depth, cls.SPAN_MAX_DEPTH)):
+            section = sections[i] if i < len(sections) else fill
+            position = position * cls.SPAN_SECTION_BASE + min(max(section, 0), cls.SPAN_SECTION_BASE - 1)
+        return position
+
+    def span(self):
+        """
+        Returns the extent of this Ref as a dict with keys `node` (the full title of the node), `start` and `end`.
+        `start` and `end` are integers that sort in reading order within the node, so that two Refs on the same node
+        overlap iff `a.start <= b.end and b.start <= a.end`.
+        Sections deeper than `SPAN_MAX_DEPTH` levels are not encoded, so for very deep texts spans are approximate and may overlap more than the Refs do.
+
+        Returns None for Refs that aren't on a jagged array node.
+
+        :return dict:
+        """
+        if not isinstance(self.index_node, JaggedArrayNode):
+            return None
+        depth = self.index_node.depth
+        return {
+            "node": self.index_node.full_title("en"),
+            "start": self._span_position(self.sections, depth, 0),
+            "end": self._span_position(self.toSections, depth, self.SPAN_SECTION_BASE - 1),
+        }
+
+    @staticmethod
+    def spans_for_refs(refs):
+        """
+        Returns the spans of `refs`, skipping those that are invalid or that don't have a span.
+        :param refs: list of trefs
+        :return: list(dict). See `Ref.span()`
+        """
+        spans = []
+        for tref in refs:
+            try:
+                span = Ref(tref).span()
+            except (InputError, IndexError):
+                continue
+            if span is not None and span not in spans:
+                spans.append(span)
+        return spans
+
+    def span_query(self, field="refSpans"):
+        """
+        Returns a query matching documents whose `field` (a list of spans, see `Ref.span()`) has a span overlapping this Ref,
+        or None if this Ref doesn't have a span.
+        """
+        span = self.span()
+        if span is None:
+            return None
+        return {field: {"$elemMatch": {"node": span["node"], "start": {"$lte": span["end"]}, "end": {"$gte": span["start"]}}}}
+
     """ Methods for working with Versions and VersionSets """
     def storage_address(self, format="string"):
         """
@@ -4540,10 +5187,13 @@ class Ref(object, metaclass=RefCacheType):
 
         :return list: each list element is an object with keys 'versionTitle' and 'language'
         """
-        fields = ["title", "versionTitle", "versionSource", "language", "status", "license", "versionNotes",
-                  "digitizedBySefaria", "priority", "versionTitleInHebrew", "versionNotesInHebrew", "extendedNotes",
-                  "extendedNotesHebrew", "purchaseInformationImage", "purchaseInformationURL", "shortVersionTitle",
-                  "shortVersionTitleInHebrew", "isBaseText"]
+        catalog_records = version_catalog.versions_for_ref(self)
+        if catalog_records is not None:
+            if self.is_book_level():
+                return [dict(r["metadata"], firstSectionRef=r["firstSectionRef"]) for r in catalog_records]
+            return [dict(r["metadata"]) for r in catalog_records]
+
+        fields = VersionCatalog.version_list_fields
         versions = VersionSet(self.condition_query())
         version_list = []
         if self.is_book_level():
@@ -4750,14 +5400,17 @@ class Ref(object, metaclass=RefCacheType):
         else:
             return distance
 
-    def get_all_anchor_refs(self, expanded_self, document_tref_list, document_tref_expanded):
+    def get_all_anchor_refs(self, expanded_self, document_tref_list, document_tref_expanded, segment_index=None):
         """
         Return all refs in document_ref_list that overlap with self. These are your anchor_refs. Useful for related API.
         :param list(str): expanded_self. precalculated list of segment trefs for self
         :param list(str): document_tref_list. list of trefs to from document in which you want to find archor refs
         :param list(Ref): document_tref_expanded. unique list of trefs that results from running Ref.expand_refs(document_tref_list)
+        :param SegmentRefIndex segment_index: optional precalculated index of the segments of self. When calling this function in a loop over many documents, pass one in to avoid instantiating segment Refs per document.
         Returns tuple(list(Ref), list(list(Ref))). returns two lists. First are the anchor_refs for self. The second is a 2D list, where the inner list represents the expanded anchor refs for the corresponding position in anchor_ref_list
         """
+        if segment_index is not None:
+            return self._get_all_anchor_refs_with_index(segment_index, document_tref_list, document_tref_expanded)
 
         # narrow down search space to avoid excissive Ref instantiation
         unique_anchor_ref_expanded_set = set(expanded_self) & set(document_tref_expanded)
@@ -4781,6 +5434,21 @@ class Ref(object, metaclass=RefCacheType):
         anchor_ref_expanded_list = [list(filter(lambda document_segment_ref: anchor_ref.overlaps(document_segment_ref), unique_anchor_ref_expanded_list)) for anchor_ref in anchor_ref_list]
         return anchor_ref_list, anchor_ref_expanded_list
 
+    def _get_all_anchor_refs_with_index(self, segment_index, document_tref_list, document_tref_expanded):
+        positions = segment_index.positions(document_tref_expanded)
+        anchor_ref_list = []
+        for tref in document_tref_list:
+            if not tref.startswith(self.index.title):
+                continue
+            try:
+                oref = Ref(tref)
+            except InputError:
+                continue
+            if self.overlaps(oref):
+                anchor_ref_list += [oref]
+        anchor_ref_expanded_list = [segment_index.overlapping(anchor_ref, positions) for anchor_ref in anchor_ref_list]
+        return anchor_ref_list, anchor_ref_expanded_list
+
     @staticmethod
     def expand_refs(refs):
         """
@@ -4832,6 +5500,205 @@ class Ref(object, metaclass=RefCacheType):
                 return matched_ref
 
 
+class AltStructIntervalIndex(object):
+    """
+    The starting points of the nodes of an Index's alt structures, sorted by position within each schema node.
+    Used to decorate a section of text with the alt structure nodes that start in it, with a binary search rather than
+    a walk over every node of every alt structure.
+    """
+
+    def __init__(self, index):
+        starts = defaultdict(list)
+        order = 0
+        for key, struct in index.get_alt_structures().items():
+            for n in struct.get_leaf_nodes():
+                try:
+                    whole_ref = Ref(n.wholeRef).default_child_ref().as_ranged_segment_ref()
+                except (InputError, AttributeError):
+                    logger.warning("Invalid wholeRef on alt structure node", index=index.title, struct=key)
+                    continue
+                labels = {"en": [n.primary_title("en")], "he": [n.primary_title("he")], "whole": True}
+                order = self._add(starts, whole_ref.starting_ref(), labels, order)
+                for i, r in enumerate(getattr(n, "refs", None) or []):
+                    # skip Rishon, skip empty refs
+                    if i == 0 or not r:
+                        continue
+                    try:
+                        sub_ref_start = Ref(r).starting_ref()
+                    except InputError:
+                        continue
+                    labels = {"en": [n.sectionString([i + 1], "en", title=False)], "he": [n.sectionString([i + 1], "he", title=False)]}
+                    order = self._add(starts, sub_ref_start, labels, order)
+        for node_starts in starts.values():
+            node_starts.sort(key=lambda x: (x[0], x[1]))
+        self._starts = dict(starts)
+        self._keys = {node: [x[0] for x in node_starts] for node, node_starts in self._starts.items()}
+
+    @staticmethod
+    def _add(starts, oref, labels, order):
+        span = oref.span()
+        if span is not None:
+            starts[span["node"]].append((span["start"], order, oref, labels))
+        return order + 1
+
+    def starts_in(self, oref):
+        """
+        :param oref: Ref
+        :return list: (Ref, labels) for each alt structure node that starts within `oref` but doesn't contain it, in alt structure order.
+        `labels` is a dict with lists of "en" and "he" titles, and "whole": True if the node starts there, rather than one of its refs.
+        """
+        span = oref.span()
+        if span is None or span["node"] not in self._starts:
+            return []
+        node_starts = self._starts[span["node"]]
+        i = bisect.bisect_left(self._keys[span["node"]], span["start"])
+        matches = []
+        # spans can be approximate for very deep texts, so matches are confirmed with Refs
+        while i < len(node_starts) and node_starts[i][0] <= span["end"]:
+            start, order, start_ref, labels = node_starts[i]
+            if oref.contains(start_ref) and not start_ref.contains(oref):
+                matches.append((order, start_ref, labels))
+            i += 1
+        return [(start_ref, labels) for order, start_ref, labels in sorted(matches, key=lambda x: x[0])]
+
+
+class SectionNavigationTable(object):
+    """
+    The sections of an Index that have text, in reading order, as listed by :meth:`VersionState.navigation_refs`.
+    Answers next and previous section lookups with a binary search rather than a walk over the VersionState.
+    """
+
+    def __init__(self, index, trefs):
+        self._leaf_order = {tuple(leaf.address()): i for i, leaf in enumerate(index.nodes.get_leaf_nodes())}
+        entries = []
+        for tref in trefs:
+            try:
+                oref = Ref(tref)
+            except InputError:
+                continue
+            order = self._leaf_order.get(tuple(oref.index_node.address()))
+            if order is not None:
+                entries.append(((order, tuple(oref.sections)), oref))
+        entries.sort(key=lambda e: e[0])
+        self._keys = [e[0] for e in entries]
+        self._refs = [e[1] for e in entries]
+        self._key_set = set(self._keys)
+
+    def covers(self, oref):
+        return tuple(oref.index_node.address()) in self._leaf_order
+
+    def __contains__(self, oref):
+        return (self._leaf_order.get(tuple(oref.index_node.address())), tuple(oref.sections)) in self._key_set
+
+    def next_section_ref(self, oref):
+        order = self._leaf_order[tuple(oref.index_node.address())]
+        depth = oref.index_node.depth
+        if depth == 1:
+            # nodes of depth 1 are a single section, so move on to the next node
+            i = bisect.bisect_right(self._keys, (order, ()))
+        else:
+            start = list(oref.toSections[:depth - 1])
+            if start:
+                start[-1] += 1
+            i = bisect.bisect_left(self._keys, (order, tuple(start)))
+        return self._refs[i] if i < len(self._refs) else None
+
+    def prev_section_ref(self, oref):
+        order = self._leaf_order[tuple(oref.index_node.address())]
+        depth = oref.index_node.depth
+        if depth == 1:
+            i = bisect.bisect_left(self._keys, (order, ())) - 1
+        else:
+            start = list(oref.sections[:depth - 1])
+            if start:
+                start[-1] -= 1
+            # the last section at or before `start`, including any sections below it
+            i = bisect.bisect_right(self._keys, (order, tuple(start) + (float("inf"),))) - 1
+        return self._refs[i] if i >= 0 else None
+
+
+navigation_tables = scache.LRUCache(max_size=1000, timeout=60 * 60)
+
+
+def get_navigation_table(title):
+    """
+    :return SectionNavigationTable: for Index `title`, or None if its sections can't be navigated by table
+    """
+    table = navigation_tables.get(title)
+    if table is None:
+        from . import version_state
+        vstate = version_state.VersionState(title, proj={"title": 1, "navigation": 1})
+        if not hasattr(vstate, "navigation"):
+            # not yet refreshed since navigation was added
+            vstate = version_state.VersionState(title)
+            trefs = vstate.navigation_refs()
+        else:
+            trefs = vstate.navigation
+        table = SectionNavigationTable(library.get_index(title), trefs) if trefs is not None else False
+        navigation_tables.set(title, table)
+    return table or None
+
+
+def invalidate_navigation_table(title):
+    navigation_tables.delete(title)
+
+
+class SegmentRefIndex(object):
+    """
+    Positional index over the segment Refs of a Ref, in reading order.
+    Used to find the segments of many documents (sheets, webpages...) that overlap an anchor Ref without instantiating
+    a Ref per segment string, and with a binary search rather than a pairwise `overlaps()` check.
+    """
+
+    def __init__(self, segment_refs):
+        """
+        :param list(Ref) segment_refs: segment level Refs, usually `oref.all_segment_refs()`
+        """
+        self._refs = segment_refs
+        self._positions = {r.normal(): i for i, r in enumerate(segment_refs)}
+        self._keys = [tuple(r.sections) for r in segment_refs]
+        self._node = segment_refs[0].index_node if len(segment_refs) else None
+        # binary search is only valid when all segments share a node and are sorted by sections
+        self._searchable = all(r.index_node == self._node for r in segment_refs) and \
+            all(self._keys[i] <= self._keys[i+1] for i in range(len(self._keys) - 1))
+
+    def __len__(self):
+        return len(self._refs)
+
+    def __contains__(self, tref):
+        return tref in self._positions
+
+    def normals(self):
+        """
+        :return list(str): normal trefs of all segments, in order
+        """
+        return list(self._positions.keys())
+
+    def positions(self, trefs):
+        """
+        :param list(str) trefs: segment trefs
+        :return list(int): sorted positions of those `trefs` that are segments of this index. Others are ignored.
+        """
+        return sorted({self._positions[tref] for tref in trefs if tref in self._positions})
+
+    def overlapping(self, oref, positions=None):
+        """
+        :param Ref oref:
+        :param list(int) positions: optional sorted subset of positions (as returned by `positions()`) to search within
+        :return list(Ref): segments at `positions` that overlap `oref`, in order
+        """
+        if positions is None:
+            positions = list(range(len(self._refs)))
+        if not self._searchable or oref.index_node != self._node:
+            return [self._refs[p] for p in positions if oref.overlaps(self._refs[p])]
+        # a less specific `oref` covers every segment whose sections start with its own
+        lo = bisect.bisect_left(self._keys, tuple(oref.sections))
+        hi = bisect.bisect_right(self._keys, tuple(oref.toSections) + (float("inf"),))
+        start = bisect.bisect_left(positions, lo)
+        end = bisect.bisect_left(positions, hi)
+        return [self._refs[p] for p in positions[start:end]]
+
+
 class Library(object):
     """
     Operates as a singleton, through the instance called ``library``.
@@ -4853,6 +5720,10 @@ class Library(object):
         - toc tree is built (categories loaded)
         - autocompleters are created
 
+    With LIBRARY_LAZY_INIT set, the autocompleters, word form index and ref resolver are instead built on first use
+    ("on_demand"), or in a background thread while the worker serves requests ("background").
+    The time and memory each stage takes is recorded in `sefaria.system.startup`.
+
 
     """
 
@@ -4878,6 +5749,10 @@ class Library(object):
         # Title regex strings & objects, keys are strings generated from a combination of arguments to `all_titles_regex` and `all_titles_regex_string`
         self._title_regex_strings = {}
         self._title_regexes = {}
+        # Arguments to `all_titles_regex_string` of each compiled regex, so that it can be rebuilt when titles change
+        self._title_regex_args = {}
+        # Incremented when titles change, so that a regex rebuilt for older titles isn't stored
+        self._title_regex_generation = 0
 
         # Maps, keyed by language, from term names to text refs
         self._term_ref_maps = {lang: {} for lang in self.langs}
@@ -4904,6 +5779,9 @@ class Library(object):
         self._cross_lexicon_auto_completer = None
         self._topic_auto_completer = {}
 
+        # Dictionary lookup
+        self._word_form_index = None
+
         # Term Mapping
         self._simple_term_mapping = {}
         self._full_term_mapping = {}
@@ -4925,6 +5803,18 @@ class Library(object):
         self._cross_lexicon_auto_completer_is_ready = False
         self._topic_auto_completer_is_ready = False
 
+        # Structures that can be built after startup. Name -> (build function, function that returns whether it's built)
+        self._deferrable_structures = {
+            "full_auto_completer": (self.build_full_auto_completer, lambda: self._full_auto_completer_is_ready),
+            "ref_auto_completer": (self.build_ref_auto_completer, lambda: self._ref_auto_completer_is_ready),
+            "lexicon_auto_completers": (self.build_lexicon_auto_completers, lambda: self._lexicon_auto_completer_is_ready),
+            "cross_lexicon_auto_completer": (self.build_cross_lexicon_auto_completer, lambda: self._cross_lexicon_auto_completer_is_ready),
+            "topic_auto_completer": (self.build_topic_auto_completer, lambda: self._topic_auto_completer_is_ready),
+            "word_form_index": (lambda: self.build_word_form_index(WORD_FORM_INDEX_SNAPSHOT_FILEPATH), lambda: self._word_form_index is not None),
+            "ref_resolver": (self.build_ref_resolver, lambda: self._ref_resolver is not None),
+        }
+        self._build_locks = {name: threading.Lock() for name in self._deferrable_structures}
+
         if not hasattr(sys, '_doc_build'):  # Can't build cache without DB
             self.get_simple_term_mapping() # this will implicitly call self.build_term_mappings() but also make sure its cached.
 
@@ -4959,6 +5849,53 @@ class Library(object):
         self._title_regexes = {}
         # TOC is handled separately since it can be edited in place
 
+    def _update_index_derivative_objects(self, index_object=None, added=None, removed=None):
+        """
+        Updates the objects which are derivatives of the index for a change in the titles of one index, rather than
+        resetting them.  Compiled title regexes are rebuilt in a background thread, and the previous ones are used until then.
+        :param index_object: the index whose titles changed, if it still exists
+        :param added: dict, keyed by language, of the title-node dicts of titles that were added
+        :param removed: dict, keyed by language, of lists of titles that were removed
+        """
+        added = added or {}
+        removed = removed or {}
+        is_cited = getattr(index_object, "is_cited", False)
+        full_title_lists = {}
+        for key, titles in self._full_title_lists.items():
+            if key.endswith("_terms"):
+                continue  # terms may share titles with indexes, so these are rebuilt on demand
+            lang = key[len("citing-"):] if key.startswith("citing-") else key
+            removed_titles = set(removed.get(lang, []))
+            added_titles = list(added.get(lang, {}).keys()) if is_cited or not key.startswith("citing-") else []
+            full_title_lists[key] = [t for t in titles if t not in removed_titles] + added_titles
+        self._full_title_lists = full_title_lists
+        self._full_title_list_jsons = {}
+        self._title_regex_strings = {}
+        self._rebuild_title_regexes_in_background()
+
+        for auto_completers in (self._full_auto_completer, self._ref_auto_completer):
+            for lang, ac in auto_completers.items():
+                ac.remove_titles(removed.get(lang, []))
+                ac.add_titles(added.get(lang, {}), new_titles=set(added.get(lang, {})) - set(removed.get(lang, [])))
+
+    def _rebuild_title_regexes_in_background(self):
+        self._title_regex_generation += 1
+        generation = self._title_regex_generation
+        regex_args = dict(self._title_regex_args)
+        if not regex_args:
+            return
+
+        def rebuild():
+            start = time.perf_counter()
+            for key, args in regex_args.items():
+                reg = self._compile_title_regex(self.all_titles_regex_string(*args))
+                if generation != self._title_regex_generation:
+                    return  # titles changed again, and another thread is rebuilding
+                self._title_regexes[key] = reg
+            logger.info("Rebuilt title regexes in {:.0f}ms".format((time.perf_counter() - start) * 1000), keys=list(regex_args))
+
+        threading.Thread(target=rebuild, name="title_regex_rebuild", daemon=True).start()
+
     def rebuild(self, include_toc = False, include_auto_complete=False):
         self.get_simple_term_mapping_json(rebuild=True)
         self._build_topic_mapping()
@@ -4968,12 +5905,13 @@ class Library(object):
         self.reset_text_titles_cache()
         self._title_regex_strings = {}
         self._title_regexes = {}
+        self._title_regex_generation += 1
         Ref.clear_cache()
         in_memory_cache.reset_all()
         if include_toc:
             self.rebuild_toc()
 
-    def rebuild_toc(self, skip_toc_tree=False):
+    def rebuild_toc(self, skip_toc_tree=False, skip_topic_toc=False):
         """
         Rebuilds the TocTree representation at startup time upon load of the Library class singleton.
         The ToC is a tree of nodes that represents the ToC as seen on the Sefaria homepage.
@@ -4982,14 +5920,16 @@ class Library(object):
         as an API optimization.
 
         @param: skip_toc_tree boolean
+        @param: skip_topic_toc boolean - True when only texts changed, as the topics ToC doesn't depend on them
         """
         if not skip_toc_tree:
             self._toc_tree = self.get_toc_tree(rebuild=True)
         self._toc = self.get_toc(rebuild=True)
         self._toc_json = self.get_toc_json(rebuild=True)
-        self._topic_toc = self.get_topic_toc(rebuild=True)
-        self._topic_toc_json = self.get_topic_toc_json(rebuild=True)
-        self._topic_toc_category_mapping = self.get_topic_toc_category_mapping(rebuild=True)
+        if not skip_topic_toc:
+            self._topic_toc = self.get_topic_toc(rebuild=True)
+            self._topic_toc_json = self.get_topic_toc_json(rebuild=True)
+            self._topic_toc_category_mapping = self.get_topic_toc_category_mapping(rebuild=True)
         self._category_id_dict = None
         scache.delete_template_cache("texts_list")
         scache.delete_template_cache("texts_dashboard")
@@ -5283,6 +6223,33 @@ class Library(object):
         }
         self._lexicon_auto_completer_is_ready = True
 
+    def build_word_form_index(self, snapshot_filepath=None):
+        """
+        Builds the in memory word form index used to serve dictionary lookups without database access.
+        :param snapshot_filepath: optional path of a snapshot written by `WordFormIndex.save()`. If missing, the index is built from the database.
+        """
+        from .lexicon import WordFormIndex
+        if snapshot_filepath and os.path.exists(snapshot_filepath):
+            self._word_form_index = WordFormIndex.load(snapshot_filepath)
+        else:
+            self._word_form_index = WordFormIndex.build()
+
+    def rebuild_word_form_index(self):
+        """
+        Rebuilds the word form index from the database, if it was built
+        """
+        if self._word_form_index is not None:
+            self.build_word_form_index()
+
+    def get_word_form_index(self):
+        """
+        Returns the word form index, building it first if it is enabled and wasn't built at startup.
+        Returns None if it is not enabled. In that case dictionary lookups go to the database.
+        """
+        if ENABLE_WORD_FORM_INDEX:
+            self.ensure_built("word_form_index")
+        return self._word_form_index
+
     def build_cross_lexicon_auto_completer(self):
         """
         Builds the cross lexicon auto completer excluding titles
@@ -5305,10 +6272,7 @@ class Library(object):
         Returns the topic auto completer. If the auto completer was not initially loaded,
         it rebuilds before returning, emitting warnings to the logger.
         """
-        if self._topic_auto_completer is None:
-            logger.warning("Failed to load topic auto completer. rebuilding")
-            self.build_topic_auto_completer()
-            logger.warning("Built topic auto completer")
+        self.ensure_built("topic_auto_completer")
         return self._topic_auto_completer
 
     def cross_lexicon_auto_completer(self):
@@ -5316,10 +6280,7 @@ class Library(object):
         Returns the cross lexicon auto completer. If the auto completer was not initially loaded,
         it rebuilds before returning, emitting warnings to the logger.
         """
-        if self._cross_lexicon_auto_completer is None:
-            logger.warning("Failed to load cross lexicon auto completer, rebuilding.")
-            self.build_cross_lexicon_auto_completer()  # I worry that these could pile up.
-            logger.warning("Built cross lexicon auto completer.")
+        self.ensure_built("cross_lexicon_auto_completer")
         return self._cross_lexicon_auto_completer
 
     def lexicon_auto_completer(self, lexicon):
@@ -5330,6 +6291,7 @@ class Library(object):
 
         @param: lexicon String
         """
+        self.ensure_built("lexicon_auto_completers")
         try:
             return self._lexicon_auto_completer[lexicon]
         except KeyError:
@@ -5339,22 +6301,28 @@ class Library(object):
             return self._lexicon_auto_completer[lexicon]
 
     def full_auto_completer(self, lang):
-        try:
-            return self._full_auto_completer[lang]
-        except KeyError:
-            logger.warning("Failed to load full {} auto completer, rebuilding.".format(lang))
-            self.build_full_auto_completer()  # I worry that these could pile up.
-            logger.warning("Built full {} auto completer.".format(lang))
-            return self._full_auto_completer[lang]
+        self.ensure_built("full_auto_completer")
+        return self._full_auto_completer[lang]
 
     def ref_auto_completer(self, lang):
-        try:
-            return self._ref_auto_completer[lang]
-        except KeyError:
-            logger.warning("Failed to load {} ref auto completer, rebuilding.".format(lang))
-            self.build_ref_auto_completer()  # I worry that these could pile up.
-            logger.warning("Built {} ref auto completer.".format(lang))
-            return self._ref_auto_completer[lang]
+        self.ensure_built("ref_auto_completer")
+        return self._ref_auto_completer[lang]
+
+    def ensure_built(self, *names):
+        """
+        Builds each of the structures named, in `_deferrable_structures`, that isn't built yet.
+        A structure that is being built in another thread is waited for, rather than built again.
+        """
+        for name in names:
+            build, is_built = self._deferrable_structures[name]
+            if is_built():
+                continue
+            with self._build_locks[name]:
+                if not is_built():
+                    if not LIBRARY_LAZY_INIT:
+                        logger.warning("{} was not built at startup, building.".format(name))
+                    with startup.stage(name):
+                        build()
 
     def recount_index_in_toc(self, indx):
         # This is used in the case of a remotely triggered multiserver update
@@ -5363,7 +6331,7 @@ class Library(object):
 
         self.get_toc_tree().update_title(indx, recount=True)
 
-        self.rebuild_toc(skip_toc_tree=True)
+        self.rebuild_toc(skip_toc_tree=True, skip_topic_toc=True)
 
     def delete_category_from_toc(self, category):
         # This is used in the case of a remotely triggered multiserver update
@@ -5384,7 +6352,7 @@ class Library(object):
         if toc_node:
             self.get_toc_tree().remove_index(toc_node)
 
-        self.rebuild_toc(skip_toc_tree=True)
+        self.rebuild_toc(skip_toc_tree=True, skip_topic_toc=True)
 
     def update_index_in_toc(self, indx, old_ref=None):
         """
@@ -5399,7 +6367,7 @@ class Library(object):
 
         self.get_toc_tree().update_title(indx, old_ref=old_ref, recount=False)
 
-        self.rebuild_toc(skip_toc_tree=True)
+        self.rebuild_toc(skip_toc_tree=True, skip_topic_toc=True)
 
     def get_index(self, bookname):
         """
@@ -5434,8 +6402,8 @@ class Library(object):
         Update library title dictionaries and caches with information from provided index.
         Index can be passed with primary title in `index_title` or as an object in `index_object`
         :param index_object: Index record
-        :param rebuild: Perform a rebuild of derivative objects afterwards?  False only in cases of batch update.
-        :return:
+        :param rebuild: Update derivative objects afterwards?  False only in cases of batch update.
+        :return: dict, keyed by language, of the title-node dicts of the titles added
         """
         assert index_object, "Library.add_index_record_to_cache called without index"
 
@@ -5444,32 +6412,37 @@ class Library(object):
             index_object = Index().load({"title": index_object})
 
         self._index_map[index_object.title] = index_object
+        added = {}
         try:
             for lang in self.langs:
                 title_dict = index_object.nodes.title_dict(lang)
                 self._index_title_maps[lang][index_object.title] = list(title_dict.keys())
                 self._title_node_maps[lang].update(title_dict)
+                added[lang] = title_dict
         except IndexSchemaError as e:
             logger.error("Error in generating title node dictionary: {}".format(e))
 
         if rebuild:
-            self._reset_index_derivative_objects()
+            self._update_index_derivative_objects(index_object, added=added)
+        return added
 
     def remove_index_record_from_cache(self, index_object=None, old_title=None, rebuild = True):
         """
         Update provided index from library title dictionaries and caches
         :param index_object: In the local case - the index object to remove.  In the remote case, the name of the index object to remove.
         :param old_title: In the case of a title change - the old title of the Index record
-        :param rebuild: Perform a rebuild of derivative objects afterwards?
-        :return:
+        :param rebuild: Update derivative objects afterwards?
+        :return: dict, keyed by language, of lists of the titles removed
         """
 
         index_object_title = old_title if old_title else (index_object.title if isinstance(index_object, Index) else index_object)
         Ref.remove_index_from_cache(index_object_title)
 
+        removed = {}
         for lang in self.langs:
             simple_titles = self._index_title_maps[lang].get(index_object_title)
             if simple_titles:
+                removed[lang] = simple_titles
                 for key in simple_titles:
                     try:
                         del self._title_node_maps[lang][key]
@@ -5482,10 +6455,11 @@ class Library(object):
                 del self._index_title_maps[lang][index_object_title]
             else:
                 logger.warning("Failed to remove '{}' from {} index-title and title-node cache: nothing to remove".format(index_object_title, lang))
-                return
+                return removed
 
         if rebuild:
-            self._reset_index_derivative_objects()
+            self._update_index_derivative_objects(removed=removed)
+        return removed
 
     def refresh_index_record_in_cache(self, index_object, old_title = None):
         """
@@ -5495,10 +6469,11 @@ class Library(object):
         :return:
         """
         index_object_title = index_object.title if isinstance(index_object, Index) else index_object
-        self.remove_index_record_from_cache(index_object, old_title=old_title, rebuild=False)
+        removed = self.remove_index_record_from_cache(index_object, old_title=old_title, rebuild=False)
         new_index = Index().load({"title": index_object_title})
         assert new_index, "No Index record found for {}: {}".format(index_object.__class__.__name__, index_object_title)
-        self.add_index_record_to_cache(new_index, rebuild=True)
+        added = self.add_index_record_to_cache(new_index, rebuild=False)
+        self._update_index_derivative_objects(new_index, added=added, removed=removed)
 
     # todo: the for_js path here does not appear to be in use.
     # todo: Rename, as method not gauraunteed to return all titles
@@ -5553,14 +6528,18 @@ class Library(object):
             key += "_terms" if with_terms else ""
         reg = self._title_regexes.get(key)
         if not reg:
-            re_string = self.all_titles_regex_string(lang, with_terms, citing_only)
-            try:
-                reg = re.compile(re_string, max_mem=512 * 1024 * 1024)
-            except TypeError:
-                reg = re.compile(re_string)
+            reg = self._compile_title_regex(self.all_titles_regex_string(lang, with_terms, citing_only))
             self._title_regexes[key] = reg
+            self._title_regex_args[key] = (lang, with_terms, citing_only)
         return reg
 
+    @staticmethod
+    def _compile_title_regex(re_string):
+        try:
+            return re.compile(re_string, max_mem=512 * 1024 * 1024)
+        except TypeError:
+            return re.compile(re_string)
+
     def ref_list(self):
         """
         :return: list of all section-level Refs in the library
@@ -5644,10 +6623,10 @@ class Library(object):
         return self._topic_mapping
 
     def get_ref_resolver(self, rebuild=False):
-        resolver = self._ref_resolver
-        if not resolver or rebuild:
-            resolver = self.build_ref_resolver()
-        return resolver
+        if rebuild:
+            return self.build_ref_resolver()
+        self.ensure_built("ref_resolver")
+        return self._ref_resolver
 
     def build_ref_resolver(self):
         from .linker.match_template import MatchTemplateTrie
@@ -6253,7 +7232,8 @@ class Library(object):
 
         # Avoid allocation here since it will be called very frequently
         are_autocompleters_ready = self._full_auto_completer_is_ready and self._ref_auto_completer_is_ready and self._lexicon_auto_completer_is_ready and self._cross_lexicon_auto_completer_is_ready
-        is_initialized = self._toc_tree_is_ready and (DISABLE_AUTOCOMPLETER or are_autocompleters_ready)
+        # With lazy initialization, a worker serves requests while its autocompleters are built
+        is_initialized = self._toc_tree_is_ready and (DISABLE_AUTOCOMPLETER or LIBRARY_LAZY_INIT or are_autocompleters_ready)
         if not is_initialized:
             logger.warning({"message": "Application not fully initialized", "Current State": {
                 "toc_tree_is_ready": self._toc_tree_is_ready,
@@ -6270,7 +7250,8 @@ class Library(object):
         return CategorySet({'depth': 1}) if full_records else CategorySet({'depth': 1}).distinct('path')
 
 
-library = Library()
+with startup.stage("term mappings"):
+    library = Library()
 
 
 def prepare_index_regex_for_dependency_process(index_object, as_list=False):
@@ -6317,6 +7298,7 @@ def process_index_title_change_in_sheets(indx, **kwargs):
     for sheet in sheets:
         sheet["includedRefs"] = [r.replace(kwargs["old"], kwargs["new"], 1) if re.search('|'.join(regex_list), r) else r for r in sheet.get("includedRefs", [])]
         sheet["expandedRefs"] = Ref.expand_refs(sheet["includedRefs"])
+        sheet["refSpans"] = Ref.spans_for_refs(sheet["includedRefs"])
         for source in sheet.get("sources", []):
             if "ref" in source:
                 source["ref"] = source["ref"].replace(kwargs["old"], kwargs["new"], 1) if re.search('|'.join(regex_list), source["ref"]) else source["ref"]
@@ -6327,6 +7309,78 @@ def process_index_delete_in_versions(indx, **kwargs):
     VersionSet({"title": indx.title}).delete()
 
 
+def _is_single_section(oref):
+    node = oref.index_node
+    if not isinstance(node, JaggedArrayNode):
+        return False
+    return node.depth == 1 or (len(oref.sections) >= node.depth - 1 and not oref.is_spanning())
+
+
+def process_version_change_in_merged_texts(ver, **kwargs):
+    """
+    Stored merges that this change makes out of date no longer match the fingerprint of their versions, and aren't
+    read. When only one section changed, its merge is rebuilt and the other merges of the version are marked as
+    current. Otherwise, as when a whole book or a range of sections was saved, every merge of the text is rebuilt in
+    the background.
+    """
+    if not USE_MERGED_TEXTS:
+        return
+    changed_ref = getattr(ver, "_changed_ref", None)
+    if changed_ref is None or kwargs.get("is_new") or not _is_single_section(changed_ref):
+        build_merged_text_in_background(ver.title, ver.language)
+        return
+    version_key = "fingerprint.{}".format(ver._id)
+    db.merged_texts.update_many({"title": ver.title, "language": ver.language, version_key: getattr(ver, "_previous_revision", 0)},
+                                {"$set": {version_key: ver.revision}})
+    build_merged_section(ver.title, ver.language, changed_ref.top_section_ref() if changed_ref.index_node.depth > 1 else changed_ref)
+
+
+def process_version_delete_in_merged_texts(ver, **kwargs):
+    if USE_MERGED_TEXTS:
+        # notified before the version is deleted
+        build_merged_text_in_background(ver.title, ver.language, exclude_id=ver._id)
+
+
+def process_index_title_change_in_merged_texts(indx, **kwargs):
+    db.merged_texts.update_many({"title": kwargs["old"]}, {"$set": {"title": kwargs["new"]}})
+
+
+def process_index_delete_in_merged_texts(indx, **kwargs):
+    delete_merged_texts(indx.title)
+
+
+def process_version_state_change_in_navigation_tables(vstate, **kwargs):
+    invalidate_navigation_table(vstate.title)
+    if MULTISERVER_ENABLED:
+        server_coordinator.publish_event("text", "invalidate_navigation_table", [vstate.title])
+
+
+def process_index_change_in_navigation_tables(indx, **kwargs):
+    titles = [indx.title] + ([kwargs["old"]] if kwargs.get("old") else [])
+    for title in titles:
+        invalidate_navigation_table(title)
+        if MULTISERVER_ENABLED:
+            server_coordinator.publish_event("text", "invalidate_navigation_table", [title])
+
+
+def invalidate_version_catalog(title):
+    version_catalog.invalidate(title)
+
+
+def process_version_change_in_version_catalog(ver, **kwargs):
+    version_catalog.invalidate(ver.title, shared=True)
+    if MULTISERVER_ENABLED:
+        server_coordinator.publish_event("text", "invalidate_version_catalog", [ver.title])
+
+
+def process_index_change_in_version_catalog(indx, **kwargs):
+    titles = [indx.title] + ([kwargs["old"]] if kwargs.get("old") else [])
+    for title in titles:
+        version_catalog.invalidate(title, shared=True)
+        if MULTISERVER_ENABLED:
+            server_coordinator.publish_event("text", "invalidate_version_catalog", [title])
+
+
 def process_index_title_change_in_core_cache(indx, **kwargs):
     old_title = kwargs["old"]
 
@@ -26,6 +26,7 @@ from sefaria.model.following import FollowersSet, FolloweesSet, general_follow_r
 from sefaria.model.blocking import BlockersSet, BlockeesSet
 from sefaria.model.text import Ref, TextChunk
 from sefaria.system.database import db
+from sefaria.system.cache import LRUCache, get_shared_cache_elem, set_shared_cache_elem, get_shared_cache_elems, set_shared_cache_elems, delete_shared_cache_elem
 from sefaria.utils.util import epoch_time
 from django.utils import translation
 
@@ -517,6 +518,9 @@ class UserProfile(object):
             self.delete_user_history()
             self._process_remove_history = False
 
+        delete_public_user_data_cache(self.id)
+        delete_user_request_settings_cache(self.id)
+
         return self
 
     def errors(self):
@@ -617,6 +621,17 @@ class UserProfile(object):
             self.interrupting_messages.remove(message)
             self.save()
 
+    def request_settings(self):
+        """
+        Returns the settings that are read on every page request, in a small dict that is cached for each user.
+        """
+        return {
+            "interface_language": self.settings.get("interface_language", None),
+            "translation_language_preference": self.settings.get("translation_language_preference", None),
+            "translation_language_preference_suggested": self.settings.get("translation_language_preference_suggested", False),
+            "version_preferences_by_corpus": getattr(self, "version_preferences_by_corpus", None),
+        }
+
     def process_history_item(self, hist, time_stamp):
         action = hist.pop("action", None)
         if self.settings.get("reading_history", True) or action == "add_saved":  # regular case where history enabled, save/unsave saved item etc. or save history in either case
@@ -836,12 +851,19 @@ def email_unread_notifications(timeframe):
             translation.deactivate()
 
 
-public_user_data_cache = {}
-def public_user_data(uid, ignore_cache=False):
-    """Returns a dictionary with common public data for `uid`"""
-    if uid in public_user_data_cache and not ignore_cache:
-        return public_user_data_cache[uid]
+# Public user data is cached in two tiers: a small per-process LRU with a short timeout, in front of the shared cache.
+# `UserProfile.save()` clears both tiers for that user; other processes see the change once their local entry times out.
+PUBLIC_USER_DATA_LOCAL_CACHE_SIZE = 5000
+PUBLIC_USER_DATA_LOCAL_TIMEOUT = 60 * 5
+PUBLIC_USER_DATA_SHARED_TIMEOUT = 60 * 60 * 24
+public_user_data_cache = LRUCache(max_size=PUBLIC_USER_DATA_LOCAL_CACHE_SIZE, timeout=PUBLIC_USER_DATA_LOCAL_TIMEOUT)
+
+
+def _public_user_data_cache_key(uid):
+    return "public_user_data:{}".format(uid)
 
+
+def _public_user_data_from_profile(uid):
     profile = UserProfile(id=uid)
     try:
         user = User.objects.get(id=uid)
@@ -849,7 +871,7 @@ def public_user_data(uid, ignore_cache=False):
     except:
         is_staff = False
 
-    data = {
+    return {
         "name": profile.full_name,
         "profileUrl": "/profile/" + profile.slug,
         "imageUrl": profile.profile_pic_url_small,
@@ -858,10 +880,98 @@ def public_user_data(uid, ignore_cache=False):
         "isStaff": is_staff,
         "uid": uid
     }
-    public_user_data_cache[uid] = data
+
+
+def _load_public_user_data_many(uids):
+    """
+    Builds public user data for `uids` with one query to the Django user table and one to profiles.
+    Users missing either record fall back to `UserProfile`, which knows how to handle those cases.
+    """
+    users = {u["id"]: u for u in User.objects.filter(id__in=uids).values("id", "first_name", "last_name")}
+    profiles = {p["id"]: p for p in db.profiles.find({"id": {"$in": uids}}, {"id": 1, "slug": 1, "profile_pic_url_small": 1, "position": 1, "organization": 1})}
+    data = {}
+    for uid in uids:
+        if uid not in users or uid not in profiles:
+            data[uid] = _public_user_data_from_profile(uid)
+            continue
+        user, profile = users[uid], profiles[uid]
+        data[uid] = {
+            "name": user["first_name"] + " " + user["last_name"],
+            "profileUrl": "/profile/" + profile.get("slug", ""),
+            "imageUrl": profile.get("profile_pic_url_small", ""),
+            "position": profile.get("position", ""),
+            "organization": profile.get("organization", ""),
+            "isStaff": False,
+            "uid": uid
+        }
     return data
 
 
+def public_user_data_many(uids, ignore_cache=False):
+    """
+    Returns a dictionary mapping each of `uids` to the public data returned by `public_user_data`.
+    Misses in the local and shared caches are loaded together, so the cost is constant in the number of users.
+    """
+    results = {}
+    uids = list(dict.fromkeys(uids))
+    if not ignore_cache:
+        for uid in uids:
+            data = public_user_data_cache.get(uid)
+            if data is not None:
+                results[uid] = data
+        missing = [uid for uid in uids if uid not in results]
+        if missing:
+            shared = get_shared_cache_elems([_public_user_data_cache_key(uid) for uid in missing])
+            for uid in missing:
+                data = shared.get(_public_user_data_cache_key(uid), None)
+                if data is not None:
+                    results[uid] = data
+                    public_user_data_cache.set(uid, data)
+    missing = [uid for uid in uids if uid not in results]
+    if missing:
+        loaded = _load_public_user_data_many(missing)
+        set_shared_cache_elems({_public_user_data_cache_key(uid): data for uid, data in loaded.items()}, timeout=PUBLIC_USER_DATA_SHARED_TIMEOUT)
+        for uid, data in loaded.items():
+            public_user_data_cache.set(uid, data)
+        results.update(loaded)
+    return results
+
+
+def public_user_data(uid, ignore_cache=False):
+    """Returns a dictionary with common public data for `uid`"""
+    return public_user_data_many([uid], ignore_cache=ignore_cache)[uid]
+
+
+def delete_public_user_data_cache(uid):
+    public_user_data_cache.delete(uid)
+    delete_shared_cache_elem(_public_user_data_cache_key(uid))
+
+
+# The settings read on every page request are cached for each user in the shared cache, so that every process sees
+# a change as soon as `UserProfile.save()` clears them.
+USER_REQUEST_SETTINGS_TIMEOUT = 60 * 60 * 24
+
+
+def _user_request_settings_cache_key(uid):
+    return "user_request_settings:{}".format(uid)
+
+
+def cached_user_request_settings(uid):
+    """Returns the cached `UserProfile.request_settings()` of `uid`, or None if they aren't cached"""
+    return get_shared_cache_elem(_user_request_settings_cache_key(uid))
+
+
+def cache_user_request_settings(profile):
+    """Caches and returns the request settings of `profile`"""
+    settings = profile.request_settings()
+    set_shared_cache_elem(_user_request_settings_cache_key(profile.id), settings, timeout=USER_REQUEST_SETTINGS_TIMEOUT)
+    return settings
+
+
+def delete_user_request_settings_cache(uid):
+    delete_shared_cache_elem(_user_request_settings_cache_key(uid))
+
+
 def user_name(uid):
     """Returns a string of a user's full name"""
     data = public_user_data(uid)
@@ -916,10 +1026,11 @@ def annotate_user_list(uids):
     for the user ids list in uids.
     """
     annotated_list = []
+    user_data = public_user_data_many(uids)
     for uid in uids:
-        data = public_user_data(uid)
+        data = user_data[uid]
         annotated = {
-            "userLink": user_link(uid),
+            "userLink": "<a href='" + data["profileUrl"] + "' class='userLink'>" + data["name"] + "</a>",
             "imageUrl": data["imageUrl"]
         }
         annotated_list.append(annotated)
@@ -91,7 +91,8 @@ class VersionState(abst.AbstractMongoRecord, AbstractSchemaContent):
     optional_attrs = [
         "flags",
         "linksCount",
-        "first_section_ref"
+        "first_section_ref",
+        "navigation"  # normal refs of the sections with text, in reading order. See navigation_refs()
     ]
 
     langs = ["en", "he"]
@@ -172,6 +173,39 @@ class VersionState(abst.AbstractMongoRecord, AbstractSchemaContent):
         d["toSections"] = d["sections"] = [(s + 1) for s in new_section[:-depth_up]]
         return Ref(_obj=d)
 
+    def navigation_refs(self):
+        """
+        Lists the sections that next_section_ref() and prev_section_ref() can move to, in reading order, with the same
+        notion of a section as Ref._iter_text_section(): one level above the segments, or the whole node for nodes of depth 1.
+        :return list: normal refs, or None for indexes with virtual nodes, which are navigated differently
+        """
+        leaves = self.index.nodes.get_leaf_nodes()
+        if any(leaf.is_virtual for leaf in leaves):
+            return None
+
+        def populated_addresses(counts, address):
+            if isinstance(counts, (int, str)):
+                if counts:
+                    yield address
+                return
+            for i, c in enumerate(counts):
+                yield from populated_addresses(c, address + [i])
+
+        refs = []
+        for leaf in leaves:
+            depth_up = 0 if leaf.depth == 1 else 1
+            leaf_ref = leaf.ref()
+            previous = None
+            for address in populated_addresses(self.state_node(leaf).var("all", "availableTexts"), []):
+                section = address[:-depth_up] if depth_up else []
+                if section == previous:
+                    continue
+                previous = section
+                d = leaf_ref._core_dict()
+                d["toSections"] = d["sections"] = [(s + 1) for s in section]
+                refs.append(Ref(_obj=d).normal())
+        return refs
+
     def refresh(self):
         if self.is_new_state:  # refresh done on init
             return
@@ -180,6 +214,7 @@ class VersionState(abst.AbstractMongoRecord, AbstractSchemaContent):
         self.linksCount = link.LinkSet(Ref(self.index.title)).count()
         fsr = self._first_section_ref()
         self.first_section_ref = fsr.normal() if fsr else None
+        self.navigation = self.navigation_refs()
         self.save()
 
         if USE_VARNISH:
@@ -7,6 +7,7 @@ from . import abstract as abst
 from . import text
 from sefaria.system.database import db
 from sefaria.system.cache import in_memory_cache
+from sefaria.settings import USE_REF_SPAN_QUERIES
 import bleach
 import structlog
 logger = structlog.get_logger(__name__)
@@ -31,6 +32,7 @@ class WebPage(abst.AbstractMongoRecord):
     optional_attrs = [
         "description",
         "expandedRefs",
+        "refSpans",
         "body",
         "linkerHits",
         'authors',
@@ -69,6 +71,7 @@ class WebPage(abst.AbstractMongoRecord):
         super(WebPage, self)._normalize()
         self._normalize_data_sent_from_linker()
         self.expandedRefs = text.Ref.expand_refs(self.refs)
+        self.refSpans = text.Ref.spans_for_refs(self.refs)
 
     def _validate(self):
         validator = URLValidator()
@@ -336,7 +339,11 @@ def get_webpages_for_ref(tref):
     from pymongo.errors import OperationFailure
     oref = text.Ref(tref)
     segment_refs = [r.normal() for r in oref.all_segment_refs()]
-    results = WebPageSet(query={"expandedRefs": {"$in": segment_refs}}, hint="expandedRefs_1", sort=None)
+    span_query = oref.span_query() if USE_REF_SPAN_QUERIES else None
+    if span_query:
+        results = WebPageSet(query=span_query, sort=None)
+    else:
+        results = WebPageSet(query={"expandedRefs": {"$in": segment_refs}}, hint="expandedRefs_1", sort=None)
     try:
         results = results.array()
     except OperationFailure as e:
@@ -400,6 +407,7 @@ def dedupe_webpages(webpages, test=True):
                         normpage.lastUpdated = webpage.lastUpdated
                         normpage.refs = webpage.refs
                         normpage.expandedRefs = webpage.expandedRefs
+                        normpage.refSpans = getattr(webpage, "refSpans", [])
                     normpage.save()
                     webpage.delete()
 
@@ -106,6 +106,7 @@ TEMPLATES = [
 ]
 
 MIDDLEWARE = [
+    'sefaria.system.middleware.InstrumentationMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.locale.LocaleMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -318,6 +319,40 @@ GLOBAL_INTERRUPTING_MESSAGE = None
 ALLOWED_HOSTS = ["localhost", "127.0.0.1","0.0.0.0","sefaria-docker.onrender.com","sefaria-web:80","sefaria-web.onrender.com"]
 
 
+# Defaults for optional features, which can be overridden in local settings
+ENABLE_WORD_FORM_INDEX = False
+WORD_FORM_INDEX_SNAPSHOT_FILEPATH = None
+# Query links, sheets and webpages by their `refSpans` range index rather than by lists of segment refs.
+# Turn on once scripts/add_ref_spans_to_links_sheets_and_webpages.py has been run.
+USE_REF_SPAN_QUERIES = False
+# Turn on once scripts/add_client_data_to_links.py has been run.
+USE_LINK_CLIENT_DATA = False
+ENABLE_VERSION_CATALOG = False
+# Read merged texts from the `merged_texts` collection. Turn on once scripts/build_merged_texts.py has been run.
+USE_MERGED_TEXTS = False
+ENABLE_TEXTS_API_CACHE = False
+TEXTS_API_CACHE_TIMEOUT = 60 * 60 * 24
+TEXTS_API_PREFETCH = False
+TEXTS_API_PREFETCH_WORKERS = 2
+TEXTS_API_PREFETCH_MAX_PENDING = 16
+TEXTS_API_PREFETCH_MAX_DELAY = 5
+ENABLE_JSON_STREAMING = False
+JSON_STREAMING_CHUNK_SIZE = 64 * 1024
+JSON_SERIALIZER = "json"
+NODE_POOL_SIZE = 10
+SSR_CACHE_SIZE = 500
+SSR_CACHE_TIMEOUT = 60
+SSR_CACHE_STALE_TIMEOUT = 60 * 60
+MULTISERVER_REDIS_EVENT_STREAM = "msync_stream"
+MULTISERVER_REDIS_LISTENERS_KEY = "msync_listeners"
+MULTISERVER_EVENT_BACKLOG = 1000
+MULTISERVER_LISTENER_THREAD = True
+MULTISERVER_REDIS_CACHE_CHANNEL = "msync_cache"
+LIBRARY_LAZY_INIT = None
+ENABLE_REQUEST_INSTRUMENTATION = True
+REQUEST_INSTRUMENTATION_FLUSH_INTERVAL = 10
+METRICS_TOKEN = None
+
 
 # Grab environment specific settings from a file which
 # is left out of the repo.
@@ -27,12 +27,13 @@ from sefaria.model.following import FollowersSet
 from sefaria.model.user_profile import UserProfile, annotate_user_list, public_user_data, user_link
 from sefaria.model.collection import Collection, CollectionSet
 from sefaria.model.topic import TopicSet, Topic, RefTopicLink, RefTopicLinkSet
+from sefaria.model.text import SegmentRefIndex
 from sefaria.utils.util import strip_tags, string_overlap, titlecase
 from sefaria.utils.hebrew import is_hebrew
 from sefaria.system.exceptions import InputError, DuplicateRecordError
 from sefaria.system.cache import django_cache
 from .history import record_sheet_publication, delete_sheet_publication
-from .settings import SEARCH_INDEX_ON_SAVE
+from .settings import SEARCH_INDEX_ON_SAVE, USE_REF_SPAN_QUERIES
 from . import search
 from sefaria.google_storage_manager import GoogleStorageManager
 import re
@@ -356,7 +357,7 @@ def order_tags_for_user(tag_counts, uid):
 
 	return tag_counts
 
-@django_cache(timeout=6 * 60 * 60)
+@django_cache(timeout=12 * 60 * 60, soft_timeout=6 * 60 * 60, lock_timeout=60)
 def trending_topics(days=7, ntags=14):
 	"""
 	Returns a list of trending topics plus sheet count and author count modified in the last `days`.
@@ -564,6 +565,7 @@ def save_sheet(sheet, user_id, search_override=False, rebuild_nodes=False):
 
 	sheet["includedRefs"] = refs_in_sources(sheet.get("sources", []))
 	sheet["expandedRefs"] = model.Ref.expand_refs(sheet["includedRefs"])
+	sheet["refSpans"] = model.Ref.spans_for_refs(sheet["includedRefs"])
 	sheet["sheetLanguage"] = get_sheet_language(sheet)
 
 	if rebuild_nodes:
@@ -773,7 +775,7 @@ def update_included_refs(query=None, hours=None, refine_refs=False):
 	for sheet in sheets:
 		sources = sheet.get("sources", [])
 		refs = refs_in_sources(sources, refine_refs=refine_refs)
-		db.sheets.update({"_id": sheet["_id"]}, {"$set": {"includedRefs": refs, "expandedRefs": model.Ref.expand_refs(refs)}})
+		db.sheets.update({"_id": sheet["_id"]}, {"$set": {"includedRefs": refs, "expandedRefs": model.Ref.expand_refs(refs), "refSpans": model.Ref.spans_for_refs(refs)}})
 
 
 def get_top_sheets(limit=3):
@@ -785,17 +787,21 @@ def get_top_sheets(limit=3):
 	return sheet_list(query=query, limit=limit)
 
 
-def get_sheets_for_ref(tref, uid=None, in_collection=None):
+def get_sheets_for_ref(tref, uid=None, in_collection=None, limit=0, skip=0):
 	"""
 	Returns a list of sheets that include ref,
 	formating as need for the Client Sidebar.
 	If `uid` is present return user sheets, otherwise return public sheets.
 	If `in_collection` (list of slugs) is present, only return sheets in one of the listed collections.
+	Sheets are sorted by views. `limit` and `skip` page through them, so callers can fetch the top N sheets
+	without loading every sheet on the ref. `limit` of 0 returns all sheets.
 	"""
 	oref = model.Ref(tref)
 	# perform initial search with context to catch ranges that include a segment ref
-	segment_refs = [r.normal() for r in oref.all_segment_refs()]
-	query = {"expandedRefs": {"$in": segment_refs}}
+	segment_index = SegmentRefIndex(oref.all_segment_refs())
+	segment_refs = segment_index.normals()
+	span_query = oref.span_query() if USE_REF_SPAN_QUERIES else None
+	query = span_query or {"expandedRefs": {"$in": segment_refs}}
 	if uid:
 		query["owner"] = uid
 	else:
@@ -808,9 +814,16 @@ def get_sheets_for_ref(tref, uid=None, in_collection=None):
 
 	sheetsObj = db.sheets.find(query,
 		{"id": 1, "title": 1, "owner": 1, "viaOwner":1, "via":1, "dateCreated": 1, "includedRefs": 1, "expandedRefs": 1, "views": 1, "topics": 1, "status": 1, "summary":1, "attribution":1, "assigner_id":1, "likes":1, "displayedCollection":1, "options":1}).sort([["views", -1]])
-	sheetsObj.hint("expandedRefs_1")
+	if not span_query:
+		sheetsObj.hint("expandedRefs_1")
+	sheetsObj = sheetsObj.skip(skip).limit(limit)
 	sheets = [s for s in sheetsObj]
-	user_ids = list({s["owner"] for s in sheets})
+
+	# load every user referenced by these sheets (owners, assigners, via owners) in one query per database
+	user_ids = {s["owner"] for s in sheets}
+	user_ids |= {s["assigner_id"] for s in sheets if "assigner_id" in s}
+	user_ids |= {s["viaOwner"] for s in sheets if "viaOwner" in s}
+	user_ids = list(user_ids)
 	django_user_profiles = User.objects.filter(id__in=user_ids).values('email','first_name','last_name','id')
 	user_profiles = {item['id']: item for item in django_user_profiles}
 	mongo_user_profiles = list(db.profiles.find({"id": {"$in": user_ids}},{"id":1,"slug":1,"profile_pic_url_small":1}))
@@ -826,23 +839,28 @@ def get_sheets_for_ref(tref, uid=None, in_collection=None):
 		except:
 			user_profiles[profile]["profile_pic_url_small"] = ""
 
+	def name_and_profile_url(user_id):
+		if user_id in user_profiles:
+			data = user_profiles[user_id]
+			return data["first_name"] + " " + data["last_name"], "/profile/" + data["slug"]
+		data = public_user_data(user_id)
+		return data["name"], data["profileUrl"]
+
+	collection_slugs = list({s["displayedCollection"] for s in sheets if "displayedCollection" in s})
+	collection_tocs = {c.slug: getattr(c, "toc", None) for c in CollectionSet({"slug": {"$in": collection_slugs}}, proj={"slug": 1, "toc": 1})} if collection_slugs else {}
+
 	results = []
 	for sheet in sheets:
-		anchor_ref_list, anchor_ref_expanded_list = oref.get_all_anchor_refs(segment_refs, sheet.get("includedRefs", []), sheet.get("expandedRefs", []))
+		anchor_ref_list, anchor_ref_expanded_list = oref.get_all_anchor_refs(segment_refs, sheet.get("includedRefs", []), sheet.get("expandedRefs", []), segment_index=segment_index)
 		ownerData = user_profiles.get(sheet["owner"], {'first_name': 'Ploni', 'last_name': 'Almoni', 'email': 'test@sefaria.org', 'slug': 'Ploni-Almoni', 'id': None, 'profile_pic_url_small': ''})
 
 		if "assigner_id" in sheet:
-			asignerData = public_user_data(sheet["assigner_id"])
-			sheet["assignerName"] = asignerData["name"]
-			sheet["assignerProfileUrl"] = asignerData["profileUrl"]
+			sheet["assignerName"], sheet["assignerProfileUrl"] = name_and_profile_url(sheet["assigner_id"])
 		if "viaOwner" in sheet:
-			viaOwnerData = public_user_data(sheet["viaOwner"])
-			sheet["viaOwnerName"] = viaOwnerData["name"]
-			sheet["viaOwnerProfileUrl"] = viaOwnerData["profileUrl"]
+			sheet["viaOwnerName"], sheet["viaOwnerProfileUrl"] = name_and_profile_url(sheet["viaOwner"])
 
 		if "displayedCollection" in sheet:
-			collection = Collection().load({"slug": sheet["displayedCollection"]})
-			sheet["collectionTOC"] = getattr(collection, "toc", None)
+			sheet["collectionTOC"] = collection_tocs.get(sheet["displayedCollection"], None)
 		topics = add_langs_to_topics(sheet.get("topics", []))
 		for anchor_ref, anchor_ref_expanded in zip(anchor_ref_list, anchor_ref_expanded_list):
 			sheet_data = {
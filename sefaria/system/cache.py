@@ -1,6 +1,13 @@
 
 import hashlib
+import math
+import os
+import random
 import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from functools import wraps
 
@@ -8,6 +15,7 @@ from django.http import HttpRequest
 from django.core.cache import DEFAULT_CACHE_ALIAS
 
 from sefaria import settings
+from sefaria.system import instrumentation
 
 import structlog
 logger = structlog.get_logger(__name__)
@@ -46,57 +54,204 @@ def cache_get_key(key_arr):
     return hashlib.md5("".join(key_arr).encode('utf-8')).hexdigest()
 
 
-def django_cache(action="get", timeout=None, cache_key='', cache_prefix=None, default_on_miss=False, default_on_miss_value=None, cache_type=None, decorate_data_with_key=False):
+_ENVELOPE_KEY = "__django_cache__"
+REFRESH_LOCK_TIMEOUT = 60  # seconds a background refresh holds its lock when the decorator has no lock_timeout
+LOCK_POLL_INTERVAL = 0.05
+
+_refresh_executor = None
+_refresh_executor_pid = None
+_refresh_executor_lock = threading.Lock()
+
+
+def _get_refresh_executor():
+    global _refresh_executor, _refresh_executor_pid
+    with _refresh_executor_lock:
+        # Threads don't survive a fork, so each process starts its own
+        if _refresh_executor is None or _refresh_executor_pid != os.getpid():
+            _refresh_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="django_cache_refresh")
+            _refresh_executor_pid = os.getpid()
+        return _refresh_executor
+
+
+def _is_envelope(cached):
+    return isinstance(cached, dict) and cached.get(_ENVELOPE_KEY, False)
+
+
+def _needs_refresh(envelope, early_expiration):
+    """
+    :param early_expiration: if set, values are due for refresh a random time before they become stale, which is more
+    likely the closer they are to becoming stale and the longer they took to compute ("XFetch")
+    """
+    if envelope["fresh_until"] is None:
+        return False
+    now = time.time()
+    if early_expiration:
+        now -= envelope["compute_time"] * early_expiration * math.log(1 - random.random())
+    return now >= envelope["fresh_until"]
+
+
+def _lock_key(key):
+    return "lock:{}".format(key)
+
+
+def _acquire_lock(key, timeout, cache_type):
+    return get_cache_factory(cache_type).add(_lock_key(key), 1, timeout)
+
+
+def _release_lock(key, cache_type):
+    delete_cache_elem(_lock_key(key), cache_type=cache_type)
+
+
+def django_cache(action="get", timeout=None, cache_key='', cache_prefix=None, default_on_miss=False, default_on_miss_value=None, cache_type=None, decorate_data_with_key=False,
+                 lock_timeout=None, soft_timeout=None, early_expiration=None):
     """
     Easily add caching to a function in django
+
+    The following keep many processes from computing the same expensive value at once when it expires under load.
+    :param lock_timeout: on a miss, only the process that takes a lock on the key, for up to this many seconds, computes
+    the value, while others wait for it to be cached. Relies on `add` being atomic in the cache, as it is in Redis
+    and in SimpleMongoDBCache, whose keys are unique.
+    :param soft_timeout: seconds after which a value is stale. Stale values are returned while one process computes the
+    new value in the background. `timeout` should be longer, or None.
+    :param early_expiration: if set, values are computed again a random time before they become stale (or, without a
+    `soft_timeout`, expire), so that it's unlikely many processes find them stale at the same moment. 1.0 is typical;
+    higher values refresh earlier.
+
+    The decorated function has a `many(arg_tuples, kwargs=None, max_workers=None)` method, which returns its results
+    for each tuple of positional arguments in `arg_tuples` (with the same `kwargs`), getting all of them from the cache
+    at once and then computing only those that are missing, in up to `max_workers` threads.
     """
     if not cache_key:
         cache_key = None
+    use_envelope = bool(soft_timeout or early_expiration)
 
     def decorator(fn):
         fn.__dict__["django_cache"] = True
-        @wraps(fn)
-        def wrapper(*args, **kwargs):
-            #logger.debug([args, kwargs])
 
-            # Inner scope variables are read-only so we set a new var
-            _cache_key = cache_key
-            do_actual_func = False
+        def get_key(args, kwargs):
+            """
+            :return: the cache key for calling `fn` with `args` and `kwargs`, and the list it was made from
+            """
+            if cache_key:
+                return cache_key, None
+            cachekey_args = args[:]
+            if len(cachekey_args) and isinstance(cachekey_args[0], HttpRequest): # we dont want a HttpRequest to form part of the cache key, it wont be replicatable.
+                cachekey_args = cachekey_args[1:]
+            key_arr = cache_get_key_arr(cache_prefix if cache_prefix else fn.__name__, *cachekey_args, **kwargs)
+            return cache_get_key(key_arr), key_arr
+
+        def compute(args, kwargs, key_arr):
+            """
+            :return: the result of calling `fn`, and what should be cached for it
+            """
+            start = time.monotonic()
+            result = fn(*args, **kwargs)
+            if decorate_data_with_key:
+                result = {
+                    'key': "_".join(key_arr),
+                    'data': result
+                }
+            stored = result
+            if use_envelope:
+                fresh_for = soft_timeout or timeout
+                stored = {_ENVELOPE_KEY: True, "value": result, "fresh_until": time.time() + fresh_for if fresh_for else None,
+                          "compute_time": time.monotonic() - start}
+            return result, stored
+
+        def compute_and_set(args, kwargs, key, key_arr):
+            result, stored = compute(args, kwargs, key_arr)
+            set_cache_elem(key, stored, timeout=timeout, cache_type=cache_type)
+            return result
+
+        def refresh(args, kwargs, key, key_arr):
+            try:
+                compute_and_set(args, kwargs, key, key_arr)
+            except Exception:
+                logger.exception("Failed to refresh cached value of {}".format(fn.__name__))
+            finally:
+                _release_lock(key, cache_type)
+
+        def unwrap(cached, args, kwargs, key, key_arr):
+            if _is_envelope(cached):
+                if _needs_refresh(cached, early_expiration) and _acquire_lock(key, lock_timeout or REFRESH_LOCK_TIMEOUT, cache_type):
+                    _get_refresh_executor().submit(refresh, args, kwargs, key, key_arr)
+                cached = cached["value"]
+            if decorate_data_with_key and cached:
+                cached = cached["data"]
+            return cached
+
+        def read(args, kwargs, key, key_arr):
+            return unwrap(get_cache_elem(key, cache_type=cache_type), args, kwargs, key, key_arr)
+
+        def compute_once(args, kwargs, key, key_arr):
+            if _acquire_lock(key, lock_timeout, cache_type):
+                try:
+                    return compute_and_set(args, kwargs, key, key_arr)
+                finally:
+                    _release_lock(key, cache_type)
+            # Another process is computing the value
+            deadline = time.monotonic() + lock_timeout
+            while time.monotonic() < deadline:
+                time.sleep(LOCK_POLL_INTERVAL)
+                result = read(args, kwargs, key, key_arr)
+                if result:
+                    return result
+            return compute_and_set(args, kwargs, key, key_arr)
+
+        def on_miss():
+            logger.critical("No cached data was found for {}".format(fn.__name__))
+            return default_on_miss_value
 
-            if not _cache_key:
-                cachekey_args = args[:]
-                if len(cachekey_args) and isinstance(cachekey_args[0], HttpRequest): # we dont want a HttpRequest to form part of the cache key, it wont be replicatable.
-                    cachekey_args = cachekey_args[1:]
-                _cache_ke_arr = cache_get_key_arr(cache_prefix if cache_prefix else fn.__name__, *cachekey_args, **kwargs)
-                _cache_key = cache_get_key(_cache_ke_arr)
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            key, key_arr = get_key(args, kwargs)
 
             if action in ["reset", "set"]:
-                do_actual_func = True
-                """try:
-                    delete_cache_elem(_cache_key, cache_type=cache_type)
-                except:
-                    pass"""
-                result = None
-            else:
-                #logger.debug(['_cach_key.......',_cache_key])
-                result = get_cache_elem(_cache_key, cache_type=cache_type)
-                if decorate_data_with_key:
-                    result = result["data"]
+                return compute_and_set(args, kwargs, key, key_arr)
 
+            result = read(args, kwargs, key, key_arr)
             if not result:
-                if default_on_miss is False or do_actual_func:
-                    result = fn(*args, **kwargs)
-                    if decorate_data_with_key:
-                        result = {
-                            'key': "_".join(_cache_ke_arr),
-                            'data': result
-                        }
-                    set_cache_elem(_cache_key, result, timeout=timeout, cache_type=cache_type)
+                if default_on_miss is False:
+                    result = compute_once(args, kwargs, key, key_arr) if lock_timeout else compute_and_set(args, kwargs, key, key_arr)
                 else:
-                    result = default_on_miss_value
-                    logger.critical("No cached data was found for {}".format(fn.__name__))
+                    result = on_miss()
 
             return result
+
+        def many(arg_tuples, kwargs=None, max_workers=None):
+            kwargs = kwargs or {}
+            calls = [(tuple(args),) + get_key(tuple(args), kwargs) for args in arg_tuples]
+            if cache_key:
+                # every call has the same key, so there's nothing to batch
+                return [wrapper(*args, **kwargs) for args, _, _ in calls]
+
+            results = {}
+            if action not in ["reset", "set"]:
+                cached = get_cache_elems(list({key for _, key, _ in calls}), cache_type=cache_type)
+                for args, key, key_arr in calls:
+                    if key not in results:
+                        results[key] = unwrap(cached.get(key), args, kwargs, key, key_arr)
+
+            misses = list({key: (args, key_arr) for args, key, key_arr in calls if not results.get(key)}.items())
+            if misses and default_on_miss is not False and action not in ["reset", "set"]:
+                for key, _ in misses:
+                    results[key] = on_miss()
+            elif misses:
+                def compute_miss(miss):
+                    key, (args, key_arr) = miss
+                    return compute(args, kwargs, key_arr)
+                if max_workers and len(misses) > 1:
+                    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                        computed = list(executor.map(compute_miss, misses))
+                else:
+                    computed = [compute_miss(miss) for miss in misses]
+                set_cache_elems({key: stored for (key, _), (_, stored) in zip(misses, computed)}, timeout=timeout, cache_type=cache_type)
+                for (key, _), (result, _) in zip(misses, computed):
+                    results[key] = result
+
+            return [results[key] for _, key, _ in calls]
+
+        wrapper.many = many
         return wrapper
     return decorator
 #-------------------------------------------------------------#
@@ -104,7 +259,10 @@ def django_cache(action="get", timeout=None, cache_key='', cache_prefix=None, de
 
 def get_cache_elem(key, cache_type=None):
     cache_instance = get_cache_factory(cache_type)
-    return cache_instance.get(key)
+    value = cache_instance.get(key)
+    if (cache_type or 'default') == SHARED_DATA_CACHE_ALIAS:
+        instrumentation.incr("shared_cache_misses" if value is None else "shared_cache_hits")
+    return value
 
 
 def get_shared_cache_elem(key):
@@ -120,6 +278,31 @@ def set_shared_cache_elem(key, value, timeout=None):
     return set_cache_elem(key, value, timeout, cache_type=SHARED_DATA_CACHE_ALIAS)
 
 
+def get_cache_elems(keys, cache_type=None):
+    """
+    Returns a dict of key -> value for those `keys` found in the cache, in one round trip where the backend allows
+    """
+    cache_instance = get_cache_factory(cache_type)
+    found = cache_instance.get_many(keys)
+    if (cache_type or 'default') == SHARED_DATA_CACHE_ALIAS:
+        instrumentation.incr("shared_cache_hits", len(found))
+        instrumentation.incr("shared_cache_misses", len(keys) - len(found))
+    return found
+
+
+def get_shared_cache_elems(keys):
+    return get_cache_elems(keys, cache_type=SHARED_DATA_CACHE_ALIAS)
+
+
+def set_cache_elems(data, timeout=None, cache_type=None):
+    cache_instance = get_cache_factory(cache_type)
+    return cache_instance.set_many(data, timeout)
+
+
+def set_shared_cache_elems(data, timeout=None):
+    return set_cache_elems(data, timeout, cache_type=SHARED_DATA_CACHE_ALIAS)
+
+
 def delete_cache_elem(key, cache_type=None):
     cache_instance = get_cache_factory(cache_type)
     if isinstance(key, (list, tuple)):
@@ -168,4 +351,68 @@ class InMemoryCache():
             self.data[k] = None
 
 
-in_memory_cache = InMemoryCache()
\ No newline at end of file
+in_memory_cache = InMemoryCache()
+
+
+class LRUCache(object):
+    """
+    Thread safe in-process cache bounded by number of entries, with an optional per entry timeout (in seconds).
+    Least recently used entries are evicted first. Meant to sit in front of a shared cache for small, hot values.
+    """
+    _missing = object()
+
+    def __init__(self, max_size=1000, timeout=None):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()  # key -> (expiration time or None, value)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return self.get(key, self._missing) is not self._missing
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key, None)
+            if item is None:
+                self.misses += 1
+                return default
+            expires, value = item
+            if expires is not None and expires < time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, timeout=None):
+        timeout = timeout if timeout is not None else self.timeout
+        expires = time.monotonic() + timeout if timeout else None
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else None,
+        }
@@ -16,15 +16,27 @@ except ImportError:
     import pickle
 import base64
 import re
-from datetime import datetime, timedelta
+import threading
+import zlib
+from datetime import timedelta
 import functools
 
 import pymongo
+from bson.binary import Binary
 from django.core.exceptions import ImproperlyConfigured
 from django.utils import timezone
 from django.core.cache.backends.base import BaseCache, DEFAULT_TIMEOUT
-from pymongo.errors import OperationFailure, ExecutionTimeout
+from pymongo.errors import OperationFailure, ExecutionTimeout, DuplicateKeyError
 from sefaria.system.database import db
+from sefaria.system.cache import LRUCache
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+import structlog
+logger = structlog.get_logger(__name__)
 
 
 def get_host_and_port(location):
@@ -55,6 +67,20 @@ def reconnect(retries=3):
     return _decorator
 
 
+def _zstd_compress(data):
+    return zstandard.ZstdCompressor().compress(data)
+
+
+def _zstd_decompress(data):
+    return zstandard.ZstdDecompressor().decompress(data)
+
+
+_compressors = {
+    'zlib': (zlib.compress, zlib.decompress),
+    'zstd': (_zstd_compress, _zstd_decompress),
+}
+
+
 class SimpleMongoDBCache(BaseCache):
     def __init__(self, location, params):
         options = params.get('OPTIONS', {})
@@ -69,6 +95,14 @@ class SimpleMongoDBCache(BaseCache):
 
         self._collection_name = options.get('COLLECTION', None) or 'django_cache'
 
+        # Values that pickle to at least COMPRESS_MIN_SIZE bytes are stored compressed. None turns compression off.
+        self._compress_min_size = options.get('COMPRESS_MIN_SIZE', None)
+        self._compression = options.get('COMPRESSION', 'zlib')
+        if self._compression not in _compressors:
+            raise ImproperlyConfigured("Unknown cache COMPRESSION '{}'".format(self._compression))
+        if self._compression == 'zstd' and zstandard is None:
+            raise ImproperlyConfigured("COMPRESSION 'zstd' requires the zstandard package")
+
         if self.default_timeout is not None and self.default_timeout <= 0:
             self.default_timeout = None
 
@@ -93,24 +127,35 @@ class SimpleMongoDBCache(BaseCache):
 
         return self._base_set('set', key, value, timeout)
 
-    def _base_set(self, mode, key, value, timeout=DEFAULT_TIMEOUT):
+    def _get_expires(self, now, timeout):
         if timeout is DEFAULT_TIMEOUT:
             timeout = self.default_timeout
+        if timeout not in (None, -1):
+            return now + timedelta(seconds=timeout)
+        return None
 
+    def _base_set(self, mode, key, value, timeout=DEFAULT_TIMEOUT):
         now = timezone.now()
-        if timeout not in (None, -1):
-            expires = now + timedelta(seconds=timeout)
-        else:
-            expires = None
+        expires = self._get_expires(now, timeout)
         coll = self._get_collection()
 
-        if mode == 'add' and self.has_key(key):
-            return False
+        if mode == 'add':
+            # Atomic, so that it can take a lock: replaces an expired document that the TTL index hasn't removed yet,
+            # or inserts one, which fails on the unique index on `key` if another process has the key.
+            try:
+                coll.update_one(
+                    {'key': key, 'expires': {'$lte': now}},
+                    {'$set': dict(self._encode(value), expires=expires, last_change=now)},
+                    upsert=True,
+                )
+            except DuplicateKeyError:
+                return False
+            return True
 
         try:
             coll.update_one(
                 {'key': key},
-                {'$set': {'data': value, 'expires': expires, 'last_change': now}},
+                {'$set': dict(self._encode(value), expires=expires, last_change=now)},
                 upsert=True,
             )
         # TODO: check threadsafety!
@@ -119,59 +164,75 @@ class SimpleMongoDBCache(BaseCache):
         else:
             return True
 
+    def _encode(self, value):
+        """
+        :return dict: the fields that store `value` in a cache document
+        """
+        if self._compress_min_size is not None:
+            pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+            if len(pickled) >= self._compress_min_size:
+                compress = _compressors[self._compression][0]
+                return {'data': Binary(compress(pickled)), 'compression': self._compression}
+        return {'data': value, 'compression': None}
+
+    @staticmethod
+    def _decode(doc):
+        compression = doc.get('compression')
+        if compression:
+            decompress = _compressors[compression][1]
+            return pickle.loads(decompress(doc['data']))
+        return doc['data']
+
+    @staticmethod
+    def _unexpired(now):
+        # Matches documents whose `expires` is later than now or is missing.
+        # The TTL index removes expired documents, but only about once a minute.
+        return {'expires': {'$not': {'$lte': now}}}
+
     def get(self, key, default=None, version=None):
         coll = self._get_collection()
         key = self.make_key(key, version)
         self.validate_key(key)
-        now = timezone.now()
 
-        data = coll.find_one({
-            '$and':
-                [
-                    {
-                        'key': key
-                    },
-                    {'$or': [
-                        {'expires': {'$gt': now}},
-                        {'expires': None},
-                    ]}
-                ]
-        })
+        data = coll.find_one(dict(self._unexpired(timezone.now()), key=key))
         if not data:
             return default
 
-        return data['data']
+        return self._decode(data)
 
     def get_many(self, keys, version=None):
         coll = self._get_collection()
-        now = datetime.utcnow()
         out = {}
         parsed_keys = {}
-        now = timezone.now()
 
         for key in keys:
             pkey = self.make_key(key, version)
             self.validate_key(pkey)
             parsed_keys[pkey] = key
 
-        data = coll.find({
-            '$and':
-                [
-                    {
-                        'key': {'$in': parsed_keys.keys()}
-                    },
-                    {'$or': [
-                        {'expires': {'$gt': now}},
-                        {'expires': None},
-                    ]}
-                ]
-        }
-        )
+        data = coll.find(dict(self._unexpired(timezone.now()), key={'$in': list(parsed_keys)}))
         for result in data:
-            out[parsed_keys[result['key']]] = result['data']
+            out[parsed_keys[result['key']]] = self._decode(result)
 
         return out
 
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        """
+        Sets every key in `data` in one round trip
+        :return list: keys that failed to be set
+        """
+        if not data:
+            return []
+        now = timezone.now()
+        expires = self._get_expires(now, timeout)
+        updates = []
+        for key, value in data.items():
+            pkey = self.make_key(key, version)
+            self.validate_key(pkey)
+            updates += [pymongo.UpdateOne({'key': pkey}, {'$set': dict(self._encode(value), expires=expires, last_change=now)}, upsert=True)]
+        self._get_collection().bulk_write(updates, ordered=False)
+        return []
+
     def delete(self, key, version=None):
         key = self.make_key(key, version)
         self.validate_key(key)
@@ -187,19 +248,7 @@ class SimpleMongoDBCache(BaseCache):
         self.validate_key(key)
         now = timezone.now()
 
-        data = coll.find(
-            {'$and':
-                [
-                    {'key': key},
-                    {'$or': [
-                        {'expires': {'$gt': now}},
-                        {'expires': None},
-                    ]}
-                ]
-            }
-        )
-
-        return data.count() > 0
+        return coll.count_documents(dict(self._unexpired(now), key=key), limit=1) > 0
 
     def clear(self):
         coll = self._get_collection()
@@ -218,18 +267,211 @@ class SimpleMongoDBCache(BaseCache):
     def _initialize_collection(self):
         self._db = db
         if self._collection_name not in self._db.collection_names():
-            options = {}
+            self._db.create_collection(self._collection_name)
+        collection = self._db[self._collection_name]
+        # Creating an index that already exists does nothing, so collections made before these indexes were added get them too.
+        # Mongo removes documents once their "expires" time has passed; documents without one are kept.
+        try:
+            collection.create_index([("expires", pymongo.DESCENDING)], expireAfterSeconds=0, background=True)
+        except OperationFailure as e:
+            logger.warning("Couldn't create TTL index on cache collection", collection=self._collection_name, error=str(e))
+        # `add` is atomic only with a unique index on `key`.  Collections made before it was unique have a non unique
+        # index with the same name, which is replaced.
+        key_index = collection.index_information().get("key_1")
+        if key_index is not None and not key_index.get("unique"):
+            collection.drop_index("key_1")
+        try:
+            collection.create_index([("key", pymongo.ASCENDING)], unique=True, background=True)
+        except OperationFailure as e:
+            logger.warning("Couldn't create unique index on cache keys, so add() isn't atomic. Remove documents with duplicate keys.",
+                           collection=self._collection_name, error=str(e))
+            collection.create_index([("key", pymongo.ASCENDING)], background=True)
+        self._coll = collection
+
+
+# The local tier of each TwoTierCache, by the alias of its shared tier.
+# Django makes a cache instance per thread, so these are kept here to be shared by every thread in the process.
+_local_tiers = {}
+_local_tiers_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_stats = {}
+
+
+def _get_local_tier(alias, max_size, timeout):
+    with _local_tiers_lock:
+        if alias not in _local_tiers:
+            _local_tiers[alias] = LRUCache(max_size=max_size, timeout=timeout)
+            _stats[alias] = {"local_hits": 0, "shared_hits": 0, "misses": 0}
+        return _local_tiers[alias]
+
+
+def _record(alias, **kwargs):
+    with _stats_lock:
+        for outcome, count in kwargs.items():
+            _stats[alias][outcome] += count
+
+
+def stats():
+    """
+    :return dict: for the shared tier alias of each TwoTierCache in use, how many lookups were found in the local tier,
+    found in the shared tier, or missed
+    """
+    with _stats_lock:
+        out = {alias: dict(s) for alias, s in _stats.items()}
+    for alias, s in out.items():
+        total = s["local_hits"] + s["shared_hits"] + s["misses"]
+        s["local_hit_ratio"] = s["local_hits"] / total if total else None
+        s["hit_ratio"] = (s["local_hits"] + s["shared_hits"]) / total if total else None
+        s["local_size"] = len(_local_tiers[alias])
+    return out
+
+
+def invalidate_local(alias, keys):
+    """
+    Removes `keys` from the local tier in front of the cache `alias`, or every key if `keys` is None.
+    Called through the multiserver coordinator when another process changes those keys.
+    """
+    local = _local_tiers.get(alias)
+    if local is None:
+        return
+    if keys is None:
+        local.clear()
+        return
+    for key in keys:
+        local.delete(key)
+
+
+def clear_local():
+    """
+    Empties the local tier of every cache
+    """
+    with _local_tiers_lock:
+        tiers = list(_local_tiers.values())
+    for local in tiers:
+        local.clear()
+
+
+class TwoTierCache(BaseCache):
+    """
+    Keeps recently used values in process memory, in front of another configured cache (the shared tier), so that
+    repeated gets of hot keys don't go over the network.
+
+    OPTIONS:
+        SHARED_ALIAS: alias of the cache that values are stored in
+        LOCAL_MAX_SIZE: number of values kept in each process
+        LOCAL_TIMEOUT: seconds a value is kept in a process before it is read from the shared tier again
+
+    Sets and deletes are published to the other servers when MULTISERVER_ENABLED, so that they drop their local copies.
+    Otherwise, or if an invalidation is lost, other processes may read an old value for up to LOCAL_TIMEOUT seconds.
+    Local copies are pickled, so that callers that change a value they got don't change the cached one.
+    """
+    _missing = object()
 
-            self._db.create_collection(self._collection_name, **options)
-            collection = self._db[self._collection_name]
+    def __init__(self, location, params):
+        options = params.get('OPTIONS', {})
+        BaseCache.__init__(self, params)
+        self._shared_alias = options.get('SHARED_ALIAS', None)
+        if not self._shared_alias:
+            raise ImproperlyConfigured("TwoTierCache requires a SHARED_ALIAS option")
+        self._local = _get_local_tier(self._shared_alias, options.get('LOCAL_MAX_SIZE', 1000), options.get('LOCAL_TIMEOUT', 60))
 
-            if self.default_timeout is not None:
-                # Create a TTL index on "expires" field
-                collection.create_index(
-                    [("expires", pymongo.DESCENDING), ],
-                    expireAfterSeconds=0,
-                )
-                # Create an index on "key"/"expires" fields
-                collection.create_index([('key', pymongo.ASCENDING), ('expires', pymongo.ASCENDING), ])
-            collection.create_index([("key", pymongo.ASCENDING)], background=True)
-        self._coll = self._db[self._collection_name]
\ No newline at end of file
+    @property
+    def _shared(self):
+        from django.core.cache import caches
+        return caches[self._shared_alias]
+
+    def _local_set(self, key, value, timeout):
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self._shared.default_timeout
+        if timeout is not None and timeout <= 0:
+            return
+        local_timeout = self._local.timeout if timeout is None else min(timeout, self._local.timeout or timeout)
+        self._local.set(key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), timeout=local_timeout)
+
+    def _local_get(self, key):
+        pickled = self._local.get(key, self._missing)
+        return self._missing if pickled is self._missing else pickle.loads(pickled)
+
+    def _publish_invalidation(self, keys):
+        from sefaria.settings import MULTISERVER_ENABLED
+        if not MULTISERVER_ENABLED:
+            return
+        from sefaria.system.multiserver.coordinator import server_coordinator
+        try:
+            server_coordinator.publish_cache_invalidation(self._shared_alias, keys)
+        except Exception as e:
+            logger.error("Failed to publish cache invalidation", alias=self._shared_alias, error=str(e))
+
+    def get(self, key, default=None, version=None):
+        local_key = self.make_key(key, version)
+        value = self._local_get(local_key)
+        if value is not self._missing:
+            _record(self._shared_alias, local_hits=1)
+            return value
+        value = self._shared.get(key, self._missing, version=version)
+        if value is self._missing:
+            _record(self._shared_alias, misses=1)
+            return default
+        _record(self._shared_alias, shared_hits=1)
+        self._local_set(local_key, value, DEFAULT_TIMEOUT)
+        return value
+
+    def get_many(self, keys, version=None):
+        out = {}
+        remaining = []
+        for key in keys:
+            value = self._local_get(self.make_key(key, version))
+            if value is self._missing:
+                remaining += [key]
+            else:
+                out[key] = value
+        found = self._shared.get_many(remaining, version=version) if remaining else {}
+        for key, value in found.items():
+            self._local_set(self.make_key(key, version), value, DEFAULT_TIMEOUT)
+        out.update(found)
+        _record(self._shared_alias, local_hits=len(keys) - len(remaining), shared_hits=len(found), misses=len(remaining) - len(found))
+        return out
+
+    def has_key(self, key, version=None):
+        return self.get(key, self._missing, version=version) is not self._missing
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self._shared.add(key, value, timeout=timeout, version=version)
+        if added:
+            self._local_set(self.make_key(key, version), value, timeout)
+        return added
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._shared.set(key, value, timeout=timeout, version=version)
+        local_key = self.make_key(key, version)
+        self._local_set(local_key, value, timeout)
+        self._publish_invalidation([local_key])
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self._shared.set_many(data, timeout=timeout, version=version) or []
+        local_keys = []
+        for key, value in data.items():
+            local_key = self.make_key(key, version)
+            if key not in failed:
+                self._local_set(local_key, value, timeout)
+            local_keys += [local_key]
+        self._publish_invalidation(local_keys)
+        return failed
+
+    def delete(self, key, version=None):
+        self._shared.delete(key, version=version)
+        local_key = self.make_key(key, version)
+        self._local.delete(local_key)
+        self._publish_invalidation([local_key])
+
+    def delete_many(self, keys, version=None):
+        self._shared.delete_many(keys, version=version)
+        local_keys = [self.make_key(key, version) for key in keys]
+        for local_key in local_keys:
+            self._local.delete(local_key)
+        self._publish_invalidation(local_keys)
+
+    def clear(self):
+        self._shared.clear()
+        self._local.clear()
+        self._publish_invalidation(None)
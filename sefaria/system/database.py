@@ -6,12 +6,14 @@ import sys
 from sefaria.settings import *
 import pymongo
 from pymongo.errors import OperationFailure
+from sefaria.system import instrumentation
 
 if hasattr(sys, '_doc_build'):
     db = ""
 else:
     # TEST_DB = SEFARIA_DB + "_test"
     TEST_DB = SEFARIA_DB 
+    instrumentation.register_mongo_listener()
     client = pymongo.MongoClient(MONGO_HOST, MONGO_PORT)
 
     if not hasattr(sys, '_called_from_test'):
@@ -81,11 +83,13 @@ def ensure_indices(active_db=None):
         ('links', ["refs.1"], {}),
         ('links', ["expandedRefs0"], {}),
         ('links', ["expandedRefs1"], {}),
+        ('links', [[("refSpans.node", pymongo.ASCENDING), ("refSpans.start", pymongo.ASCENDING), ("refSpans.end", pymongo.ASCENDING)]], {}),
         ('links', ["source_text_oid"], {}),
         ('links', ["is_first_comment"], {}),
         ('links', ["inline_citation"], {}),
         ('metrics', ["timestamp"], {'unique': True}),
         ('media', ["ref.sefaria_ref"], {}),
+        ('merged_texts', [[("title", pymongo.ASCENDING), ("language", pymongo.ASCENDING), ("node", pymongo.ASCENDING), ("section", pymongo.ASCENDING)]], {'unique': True}),
         ('notes', [[("owner", pymongo.ASCENDING), ("ref",
          pymongo.ASCENDING), ("public", pymongo.ASCENDING)]], {}),
         ('notifications', [
@@ -103,6 +107,7 @@ def ensure_indices(active_db=None):
         ('sheets', ["sources.ref"], {}),
         ('sheets', ["includedRefs"], {}),
         ('sheets', ["expandedRefs"], {}),
+        ('sheets', [[("refSpans.node", pymongo.ASCENDING), ("refSpans.start", pymongo.ASCENDING), ("refSpans.end", pymongo.ASCENDING)]], {}),
         ('sheets', ["tags"], {}),
         ('sheets', ["owner"], {}),
         ('sheets', ["assignment_id"], {}),
@@ -157,6 +162,7 @@ def ensure_indices(active_db=None):
         ('trend', ["uid"], {}),
         ('webpages', ["refs"], {}),
         ('webpages', ["expandedRefs"], {}),
+        ('webpages', [[("refSpans.node", pymongo.ASCENDING), ("refSpans.start", pymongo.ASCENDING), ("refSpans.end", pymongo.ASCENDING)]], {}),
         ('manuscript_pages', ['expanded_refs'], {}),
         ('manuscript_pages', [[("manuscript_slug", pymongo.ASCENDING),
          ("page_id", pymongo.ASCENDING)]], {'unique': True}),
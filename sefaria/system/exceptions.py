@@ -58,3 +58,6 @@ class ManuscriptError(Exception):
 
 class MissingKeyError(Exception):
     pass
+
+class NodeRenderError(Exception):
+    pass
@@ -0,0 +1,196 @@
+"""
+Counts and times the work done on the hot paths of each request: Mongo commands, shared cache lookups, Ref cache
+lookups and instantiations, and TextChunk loads.
+
+Counts are kept per thread, between :func:`start_request` and :func:`end_request` (called by
+InstrumentationMiddleware), so counting costs a dict update and work done outside of requests isn't counted.
+At the end of each request its counts are added to this process's totals for its view.  Every
+REQUEST_INSTRUMENTATION_FLUSH_INTERVAL seconds they are added to the totals of every process, in the request_metrics
+collection, which :func:`prometheus_text` presents in the Prometheus text format.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+import pymongo.monitoring
+from pymongo.errors import PyMongoError
+
+from sefaria.settings import ENABLE_REQUEST_INSTRUMENTATION, REQUEST_INSTRUMENTATION_FLUSH_INTERVAL
+
+import structlog
+logger = structlog.get_logger(__name__)
+
+# counter -> help text.  Counters ending in "_ms" are times, and are presented in seconds.
+COUNTERS = {
+    "mongo_commands": "Mongo commands sent",
+    "mongo_ms": "Time spent waiting for Mongo commands",
+    "mongo_failures": "Mongo commands that failed",
+    "shared_cache_hits": "Shared cache lookups that found a value",
+    "shared_cache_misses": "Shared cache lookups that found nothing",
+    "ref_cache_hits": "Refs found in the Ref cache",
+    "ref_cache_misses": "Refs not found in the Ref cache",
+    "ref_instantiations": "Refs parsed and instantiated",
+    "ref_instantiation_ms": "Time spent parsing and instantiating Refs",
+    "text_chunk_loads": "TextChunks loaded",
+    "text_chunk_ms": "Time spent loading TextChunks",
+}
+
+_local = threading.local()
+_totals = {}  # view -> {"requests": n, "request_ms": t, counter: total, ...}, since the last flush
+_totals_lock = threading.Lock()
+_last_flush = time.monotonic()
+collection_name = "request_metrics"  # totals of every process, by view
+
+
+def _collection():
+    from sefaria.system.database import db
+    return db[collection_name]
+
+
+def incr(name, value=1):
+    """
+    Adds `value` to the counter `name` of the request being handled by this thread, if any
+    """
+    counts = getattr(_local, "counts", None)
+    if counts is not None:
+        counts[name] = counts.get(name, 0) + value
+
+
+@contextmanager
+def timer(name, count_name=None):
+    """
+    Adds the time taken by the code in this context to the counter `name` (in ms), and one to `count_name`
+    """
+    if getattr(_local, "counts", None) is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        incr(name, (time.perf_counter() - start) * 1000)
+        if count_name:
+            incr(count_name)
+
+
+def start_request():
+    _local.counts = {}
+    _local.start = time.perf_counter()
+
+
+def end_request(view=None):
+    """
+    Stops counting for this thread's request and adds its counts to the totals for `view`
+    :return dict: the request's counts, with its total time as "request_ms"
+    """
+    counts = getattr(_local, "counts", None)
+    if counts is None:
+        return {}
+    _local.counts = None
+    counts["request_ms"] = (time.perf_counter() - _local.start) * 1000
+    with _totals_lock:
+        view_totals = _totals.setdefault(view or "unknown", {"requests": 0})
+        view_totals["requests"] += 1
+        for key, value in counts.items():
+            view_totals[key] = view_totals.get(key, 0) + value
+    if time.monotonic() - _last_flush >= REQUEST_INSTRUMENTATION_FLUSH_INTERVAL:
+        flush()
+    return counts
+
+
+def flush():
+    """
+    Adds this process's totals to the totals of every process
+    """
+    global _last_flush
+    with _totals_lock:
+        pending = dict(_totals)
+        _totals.clear()
+        _last_flush = time.monotonic()
+    if not pending:
+        return
+    try:
+        _collection().bulk_write([pymongo.UpdateOne({"_id": view}, {"$inc": view_totals}, upsert=True)
+                                       for view, view_totals in pending.items()], ordered=False)
+    except PyMongoError as e:
+        logger.warning("Failed to flush request totals: {}".format(e))
+
+
+def current():
+    """
+    :return dict: the counts so far of the request being handled by this thread, or None
+    """
+    counts = getattr(_local, "counts", None)
+    return dict(counts) if counts is not None else None
+
+
+def format_header(counts):
+    """
+    :return str: `counts` as "name=value" pairs, for a response header
+    """
+    return ", ".join("{}={}".format(key, round(value, 1) if key.endswith("_ms") else value)
+                     for key, value in sorted(counts.items()))
+
+
+def totals():
+    """
+    :return dict: the totals of every process for each view
+    """
+    flush()
+    return {doc.pop("_id"): doc for doc in _collection().find()}
+
+
+def reset():
+    """
+    Clears the totals of every process
+    """
+    with _totals_lock:
+        _totals.clear()
+    _collection().delete_many({})
+
+
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def prometheus_text():
+    """
+    :return str: the totals for each view, in the Prometheus text exposition format
+    """
+    metrics = [("requests", "Requests handled"), ("request_ms", "Time spent handling requests")] + list(COUNTERS.items())
+    all_totals = totals()
+    lines = []
+    for name, help_text in metrics:
+        is_time = name.endswith("_ms")
+        metric = "sefaria_{}_total".format(name[:-3] + "_seconds" if is_time else name)
+        lines += ["# HELP {} {}".format(metric, help_text), "# TYPE {} counter".format(metric)]
+        for view, view_totals in sorted(all_totals.items()):
+            value = view_totals.get(name, 0)
+            lines += ['{}{{view="{}"}} {}'.format(metric, _escape_label(view), value / 1000 if is_time else value)]
+    return "\n".join(lines) + "\n"
+
+
+class MongoCommandListener(pymongo.monitoring.CommandListener):
+    """
+    Counts the Mongo commands sent while handling a request.  pymongo publishes command events on the thread that
+    sent the command, so they are counted against that thread's request.
+    """
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        incr("mongo_commands")
+        incr("mongo_ms", event.duration_micros / 1000)
+
+    def failed(self, event):
+        incr("mongo_commands")
+        incr("mongo_failures")
+        incr("mongo_ms", event.duration_micros / 1000)
+
+
+def register_mongo_listener():
+    """
+    Registers the command listener with pymongo.  Applies only to clients created afterward.
+    """
+    if ENABLE_REQUEST_INSTRUMENTATION:
+        pymongo.monitoring.register(MongoCommandListener())
@@ -11,12 +11,37 @@ from django.http import HttpResponse
 
 from sefaria.settings import *
 from sefaria.site.site_settings import SITE_SETTINGS
-from sefaria.model.user_profile import UserProfile
+from sefaria.model.user_profile import UserProfile, cached_user_request_settings, cache_user_request_settings
 from sefaria.utils.util import short_to_long_lang_code, get_lang_codes_for_territory
 from sefaria.system.cache import get_shared_cache_elem, set_shared_cache_elem
+from sefaria.system import instrumentation
 from django.utils.deprecation import MiddlewareMixin
 
 
+class InstrumentationMiddleware(object):
+    """
+    Counts the Mongo commands, cache lookups and TextChunk loads of each request (see sefaria.system.instrumentation),
+    adds them to the totals for its view, and shows them to staff in the X-Sefaria-Instrumentation header.
+    Should be first, so that the work of every other middleware is counted.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not ENABLE_REQUEST_INSTRUMENTATION:
+            return self.get_response(request)
+        instrumentation.start_request()
+        try:
+            response = self.get_response(request)
+        finally:
+            match = getattr(request, "resolver_match", None)
+            counts = instrumentation.end_request(match.view_name if match else None)
+        user = getattr(request, "user", None)
+        if user is not None and user.is_staff:
+            response["X-Sefaria-Instrumentation"] = instrumentation.format_header(counts)
+        return response
+
+
 class SharedCacheMiddleware(MiddlewareMixin):
     def process_request(self, request):
         last_cached = get_shared_cache_elem("last_cached")
@@ -56,12 +81,18 @@ class LanguageSettingsMiddleware(MiddlewareMixin):
             request.translation_language_preference_suggestion = None
             return # Save looking up a UserProfile, or redirecting when not needed
 
-        profile = UserProfile(id=request.user.id) if request.user.is_authenticated else None
+        user_settings = None
+        if request.user.is_authenticated:
+            user_settings = cached_user_request_settings(request.user.id)
+            if user_settings is None:
+                # kept for base_props, so that the profile is loaded at most once per request
+                request.user_profile = UserProfile(user_obj=request.user)
+                user_settings = cache_user_request_settings(request.user_profile)
         # INTERFACE 
         # Our logic for setting interface lang checks (1) User profile, (2) cookie, (3) geolocation, (4) HTTP language code
         interface = None
         if request.user.is_authenticated and not interface:
-            interface = profile.settings["interface_language"] if "interface_language" in profile.settings else interface 
+            interface = user_settings["interface_language"]
         if not interface: 
             # Pull language setting from cookie, location (set by Cloudflare) or Accept-Lanugage header or default to english
             interface = request.COOKIES.get('interfaceLang') or request.META.get("HTTP_CF_IPCOUNTRY") or request.LANGUAGE_CODE or 'english'
@@ -106,10 +137,10 @@ class LanguageSettingsMiddleware(MiddlewareMixin):
             interface = "english"
 
         # TRANSLATION LANGUAGE PREFERENCE
-        translation_language_preference = (profile is not None and profile.settings.get("translation_language_preference", None)) or request.COOKIES.get("translation_language_preference", None)
+        translation_language_preference = (user_settings is not None and user_settings["translation_language_preference"]) or request.COOKIES.get("translation_language_preference", None)
         langs_in_country = get_lang_codes_for_territory(request.META.get("HTTP_CF_IPCOUNTRY", None))
         translation_language_preference_suggestion = None
-        trans_lang_pref_suggested = (profile is not None and profile.settings.get("translation_language_preference_suggested", False)) or request.COOKIES.get("translation_language_preference_suggested", False)
+        trans_lang_pref_suggested = (user_settings is not None and user_settings["translation_language_preference_suggested"]) or request.COOKIES.get("translation_language_preference_suggested", False)
         if translation_language_preference is None and not trans_lang_pref_suggested:
             supported_translation_langs = set(SITE_SETTINGS['SUPPORTED_TRANSLATION_LANGUAGES'])
             for lang in langs_in_country:
@@ -124,7 +155,7 @@ class LanguageSettingsMiddleware(MiddlewareMixin):
         import json
         from urllib.parse import unquote
         version_preferences_by_corpus_cookie = json.loads(unquote(request.COOKIES.get("version_preferences_by_corpus", "null")))
-        request.version_preferences_by_corpus = (profile is not None and getattr(profile, "version_preferences_by_corpus", None)) or version_preferences_by_corpus_cookie or {}
+        request.version_preferences_by_corpus = (user_settings is not None and user_settings["version_preferences_by_corpus"]) or version_preferences_by_corpus_cookie or {}
         request.LANGUAGE_CODE = interface[0:2]
         request.interfaceLang = interface
         request.contentLang   = content
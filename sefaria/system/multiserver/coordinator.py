@@ -1,9 +1,16 @@
 import json
+import os
+import socket
+import threading
+import time
 import uuid
 
+from redis.exceptions import ResponseError
 from django.core.exceptions import MiddlewareNotUsed
 
-from sefaria.settings import MULTISERVER_ENABLED, MULTISERVER_REDIS_EVENT_CHANNEL, MULTISERVER_REDIS_CONFIRM_CHANNEL
+from sefaria.settings import MULTISERVER_ENABLED, MULTISERVER_REDIS_EVENT_CHANNEL, MULTISERVER_REDIS_CONFIRM_CHANNEL, \
+    MULTISERVER_REDIS_EVENT_STREAM, MULTISERVER_REDIS_LISTENERS_KEY, MULTISERVER_EVENT_BACKLOG, MULTISERVER_LISTENER_THREAD, \
+    MULTISERVER_REDIS_CACHE_CHANNEL
 
 from .messaging import MessagingNode
 
@@ -11,138 +18,339 @@ import structlog
 logger = structlog.get_logger(__name__)
 
 
+# Library events whose work a later library.rebuild() redoes.  Those that change the ToC are only redone when the
+# rebuild includes the ToC.
+INDEX_RECORD_EVENTS = {"refresh_index_record_in_cache", "add_index_record_to_cache", "remove_index_record_from_cache"}
+TOC_EVENTS = {"update_index_in_toc", "delete_index_from_toc", "recount_index_in_toc", "rebuild_toc"}
+
+
+def _rebuilds_toc(data):
+    return bool(data["args"] and data["args"][0])
+
+
+def coalesce_events(events):
+    """
+    Drops events that a later event in `events` makes redundant: identical calls, whose last occurrence is kept, and
+    library events whose work a later rebuild of the library redoes.
+    :param events: list of (stream id, event data)
+    :return list: the events to process, in order
+    """
+    rebuilds = [(i, _rebuilds_toc(data)) for i, (_, data) in enumerate(events) if (data["obj"], data["method"]) == ("library", "rebuild")]
+    rebuild_at = max((i for i, _ in rebuilds), default=-1)
+    toc_rebuild_at = max((i for i, includes_toc in rebuilds if includes_toc), default=-1)
+    last_index = {}
+    for i, (_, data) in enumerate(events):
+        last_index[json.dumps([data["obj"], data["method"], data["args"]])] = i
+    kept = []
+    for i, (event_id, data) in enumerate(events):
+        if last_index[json.dumps([data["obj"], data["method"], data["args"]])] != i:
+            continue
+        if data["obj"] == "library":
+            is_toc_event = data["method"] in TOC_EVENTS or (data["method"] == "rebuild" and _rebuilds_toc(data))
+            is_index_record_event = data["method"] in INDEX_RECORD_EVENTS or (data["method"] == "rebuild" and not _rebuilds_toc(data))
+            if (is_toc_event and i < toc_rebuild_at) or (is_index_record_event and i < rebuild_at):
+                continue
+        kept += [(event_id, data)]
+    return kept
+
+
+def stream_id(event_id):
+    """
+    :return tuple: the parts of the Redis stream id `event_id`, which compare in the order of the stream
+    """
+    ms, _, seq = event_id.partition("-")
+    return int(ms), int(seq or 0)
+
+
 class ServerCoordinator(MessagingNode):
     """
     Runs on each instance of the server.
     publish_event() - Used for publishing events to other servers
-    sync() - used for listening for events. Invoked periodically from MultiServerEventListenerMiddleware
+    sync() - processes the events published by other servers since the last sync
+    start_listener() - starts a thread that syncs as soon as events are published. Without it, sync() is invoked
+    periodically from MultiServerEventListenerMiddleware
+
+    Events are appended to a Redis stream, whose ids order them. The stream keeps the last MULTISERVER_EVENT_BACKLOG
+    events, so a server that loses its connection to Redis processes the events it missed once it reconnects.  A server
+    that was away for longer, so that events it hadn't read were trimmed from the stream, rebuilds the library instead.
+    Events are also published on MULTISERVER_REDIS_EVENT_CHANNEL, for the MultiServerMonitor.
+
+    Invalidations of the local tiers of two tier caches are published on MULTISERVER_REDIS_CACHE_CHANNEL instead, as
+    cache writes are far more frequent than library events, and would push them out of the stream's backlog.
     """
-    subscription_channels = [MULTISERVER_REDIS_EVENT_CHANNEL]
+    subscription_channels = []
+    listen_block_ms = 5000
+    reconnect_delay = 1
+    max_reconnect_delay = 30
+
+    def __init__(self):
+        self.last_event_id = None
+        self._sync_lock = threading.Lock()
+        self._listener = None
+        self._listener_pid = None
+        self._cache_listener = None
+        self._cache_pubsub = None
+        self._cache_pubsub_pid = None
+        self._event_stats = {}  # "obj.method" -> count, total and max processing time
+
+    def event_stats(self):
+        """
+        :return dict: for each kind of event processed here, how many were processed and how long they took
+        """
+        with self._sync_lock:
+            stats = {k: dict(v) for k, v in self._event_stats.items()}
+        for s in stats.values():
+            s["mean_ms"] = s.pop("total_ms") / s["count"]
+        return stats
+
+    def _record_event(self, data, ms):
+        s = self._event_stats.setdefault("{}.{}".format(data["obj"], data["method"]), {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+        s["count"] += 1
+        s["total_ms"] += ms
+        s["max_ms"] = max(s["max_ms"], ms)
+
+    @staticmethod
+    def _origin():
+        # Computed each time, since workers forked from a process that imported this have their own pid
+        return "{}:{}".format(socket.gethostname(), os.getpid())
+
+    def connect(self):
+        super(ServerCoordinator, self).connect()
+        self._record_position()
+
+    def _check_initialization(self):
+        super(ServerCoordinator, self)._check_initialization()
+        self._record_position()
+
+    def _record_position(self):
+        """
+        Events published from here on are processed here.  Recorded when first connecting, so that workers forked from
+        a process that connected also process the events published while they started.
+        """
+        if self.last_event_id is not None or not getattr(self, "redis_client", None):
+            return
+        try:
+            latest = self.redis_client.xrevrange(MULTISERVER_REDIS_EVENT_STREAM, count=1)
+        except Exception:
+            logger.error("Failed to connect to Redis instance while reading the multiserver event stream.")
+            return
+        self.last_event_id = latest[0][0] if latest else "0-0"
 
     def publish_event(self, obj, method, args = None):
         """
-
-        :param obj:
-        :param method:
-        :param args:
-        :return:
+        Has `method` of `obj` called with `args` on every other server.
+        :param obj: name of the object, as listed in _process_message
+        :param method: name of the method
+        :param args: JSON serializable list
         """
-        # Check to see if there's any messages in the queue before pushing/popping a new one.
-        ## Edge case - needs thought - does the order of operations make for trouble in this case?##
-        self.sync()
+        self._check_initialization()
 
         payload = {
             "obj": obj,
             "method": method,
             "args": args or [],
-            "id": uuid.uuid4().hex
+            "id": uuid.uuid4().hex,
+            "origin": self._origin(),
         }
         msg_data = json.dumps(payload)
 
-        import socket
-        import os
-        logger.info("publish_event from {}:{} - {}".format(socket.gethostname(), os.getpid(), msg_data))
+        logger.info("publish_event from {} - {}".format(payload["origin"], msg_data))
         try:
+            self.redis_client.xadd(MULTISERVER_REDIS_EVENT_STREAM, {"data": msg_data}, maxlen=MULTISERVER_EVENT_BACKLOG, approximate=True)
             self.redis_client.publish(MULTISERVER_REDIS_EVENT_CHANNEL, msg_data)
         except Exception:
             logger.error("Failed to connect to Redis instance while doing message publish.")
-            return
 
-        # Since we are subscribed to this channel as well, throw away the message we just sent.
-        # It would be nice to assume that nothing new came through in the microseconds that it took to publish ##
-        # But the below should insulate against even that case ##
+    def publish_cache_invalidation(self, alias, keys):
+        """
+        Has every other process drop `keys`, or every key if None, from its local tier of the cache `alias`
+        """
+        self._check_initialization()
+        msg_data = json.dumps({"alias": alias, "keys": keys, "origin": self._origin()})
         try:
-            popped_msg = self.pubsub.get_message()
+            self.redis_client.publish(MULTISERVER_REDIS_CACHE_CHANNEL, msg_data)
         except Exception:
-            logger.error("Failed to connect to Redis instance while doing message publish listen.")
-            popped_msg = None
+            logger.error("Failed to connect to Redis instance while publishing cache invalidation.")
 
-        while popped_msg:
-            if popped_msg["data"] != msg_data:
-                logger.warning("Multiserver Message collision!")
-                self._process_message(popped_msg)
-            try:
-                popped_msg = self.pubsub.get_message()
-            except Exception:
-                logger.error("Failed to connect to Redis instance while doing message publish listen.")
-                popped_msg = None
-
-    def sync(self):
+    def process_cache_invalidations(self, timeout=0):
+        """
+        Applies the cache invalidations published by other processes since the last call
+        :param timeout: seconds to wait for one, if there are none
+        :return bool: whether Redis could be reached
+        """
+        import sefaria.system.caches as caches
         self._check_initialization()
         try:
-            msg = self.pubsub.get_message()
+            if self._cache_pubsub is None or self._cache_pubsub_pid != os.getpid():
+                self._cache_pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
+                self._cache_pubsub.subscribe(MULTISERVER_REDIS_CACHE_CHANNEL)
+                self._cache_pubsub_pid = os.getpid()
+                # invalidations published while unsubscribed are lost
+                caches.clear_local()
+            message = self._cache_pubsub.get_message(timeout=timeout)
+            while message:
+                data = json.loads(message["data"])
+                if data.get("origin") != self._origin():
+                    caches.invalidate_local(data["alias"], data["keys"])
+                message = self._cache_pubsub.get_message()
         except Exception:
-            logger.error("Failed to connect to Redis instance while doing multiserver sync.")
-            return
-        if not msg or msg["type"] == "subscribe":
-            return
+            logger.error("Failed to connect to Redis instance while reading cache invalidations.")
+            self._cache_pubsub = None
+            return False
+        return True
 
-        if msg["type"] != "message":
-            logger.error("Surprising redis message type: {}".format(msg["type"]))
+    def _heartbeat(self):
+        # Lets the monitor know how many servers to expect confirmations from
+        self.redis_client.zadd(MULTISERVER_REDIS_LISTENERS_KEY, {self._origin(): time.time()})
 
-        self._process_message(msg)
-        self.sync()  # While there are still live messages, keep processing them.
+    def _read_events(self, block=None):
+        """
+        :return list: (stream id, event data) of the events after the last one processed, not including those published here
+        """
+        response = self.redis_client.xread({MULTISERVER_REDIS_EVENT_STREAM: self.last_event_id}, count=MULTISERVER_EVENT_BACKLOG, block=block)
+        events = []
+        origin = self._origin()
+        for _, entries in response or []:
+            for event_id, fields in entries:
+                data = json.loads(fields["data"])
+                if data.get("origin") != origin:
+                    events += [(event_id, data)]
+                self.last_event_id = event_id
+        return events
+
+    def _missed_events(self):
+        """
+        :return bool: whether events after the last one processed were trimmed from the stream before being read
+        """
+        try:
+            info = self.redis_client.xinfo_stream(MULTISERVER_REDIS_EVENT_STREAM)
+        except ResponseError:
+            return False  # nothing has been published yet
+        last = stream_id(self.last_event_id)
+        if info.get("max-deleted-entry-id"):
+            # Redis 7 and up record the last entry trimmed
+            return stream_id(info["max-deleted-entry-id"]) > last
+        # Otherwise, the stream has been trimmed past the last event processed if it starts after it.  Approximate
+        # trimming leaves at least MULTISERVER_EVENT_BACKLOG entries, so a shorter stream hasn't been trimmed.
+        first = info.get("first-entry")
+        return first is not None and info["length"] >= MULTISERVER_EVENT_BACKLOG and stream_id(first[0]) > last
+
+    def _recover_missed_events(self):
+        """
+        Rebuilds the library, and clears the local caches that events invalidate, as any of those events may have been missed
+        """
+        from sefaria.model import library
+        import sefaria.model.text as text
+        import sefaria.model.lexicon as lexicon
+        logger.warning("Events were trimmed from the multiserver event stream before {} read them. Rebuilding the library.".format(self._origin()))
+        library.rebuild(include_toc=True)
+        text.navigation_tables.clear()
+        text.version_catalog.invalidate()
+        lexicon.word_form_cache.clear()
+        library.rebuild_word_form_index()
+
+    def sync(self, block=None):
+        """
+        Processes, in order, every event published by other servers since the last sync
+        :param block: milliseconds to wait for an event, if there are none
+        :return bool: whether Redis could be reached
+        """
+        self._check_initialization()
+        if self.last_event_id is None:
+            return False
+        with self._sync_lock:
+            try:
+                self._heartbeat()
+                missed = self._missed_events()
+                events = self._read_events(block)
+            except Exception:
+                logger.error("Failed to connect to Redis instance while doing multiserver sync.")
+                return False
+            if missed:
+                self._recover_missed_events()
+            kept = coalesce_events(events)
+            kept_ids = {event_id for event_id, _ in kept}
+            for event_id, data in events:
+                if event_id not in kept_ids:
+                    self._confirm(data, "coalesced")
+            for event_id, data in kept:
+                self._process_event(data)
+        return True
+
+    def start_listener(self):
+        """
+        Starts daemon threads that process events and cache invalidations as they are published, reconnecting with
+        backoff when Redis can't be reached
+        """
+        if self.is_listening():
+            return
+        self._listener = threading.Thread(target=self._listen, args=(self.sync, self.listen_block_ms), name="multiserver_listener", daemon=True)
+        self._cache_listener = threading.Thread(target=self._listen, args=(self.process_cache_invalidations, self.listen_block_ms / 1000),
+                                                name="multiserver_cache_listener", daemon=True)
+        self._listener_pid = os.getpid()
+        self._listener.start()
+        self._cache_listener.start()
+
+    def is_listening(self):
+        return self._listener is not None and self._listener_pid == os.getpid() and self._listener.is_alive() and self._cache_listener.is_alive()
 
-    def _process_message(self, msg):
+    def _listen(self, process, wait):
         """
-        :param msg: JSON encoded message.
-         Expecting a message that looks like this:
-         {'channel': 'msync',
-          'data': {
+        :param process: function that processes what has been published, waiting up to `wait` for it, and returns
+        whether Redis could be reached
+        """
+        delay = self.reconnect_delay
+        while True:
+            if process(wait):
+                delay = self.reconnect_delay
+            else:
+                time.sleep(delay)
+                delay = min(delay * 2, self.max_reconnect_delay)
+
+    def _process_event(self, data):
+        """
+        :param data: Event, as published:
+         {
             "obj": obj,
             "method": method,
             "args": args or [],
-            "id": uuid.uuid4().hex
-          }
-          'pattern': None,
-          'type': 'message',
+            "id": uuid.uuid4().hex,
+            "origin": "host:pid"
          }
-
-        :return:
         """
 
-
         # A list of all of the objects that be referenced
         from sefaria.model import library
         import sefaria.system.cache as scache
         import sefaria.model.text as text
+        import sefaria.model.lexicon as lexicon
         from sefaria.system.cache import in_memory_cache
 
-        import socket
-        import os
-        host = socket.gethostname()
-        pid = os.getpid()
-
-        data = json.loads(msg["data"])
-
         obj = locals()[data["obj"]]
         method = getattr(obj, data["method"])
 
+        start = time.monotonic()
         try:
             method(*data["args"])
-            logger.info("Processing succeeded for {} on {}:{}".format(self.event_description(data), host, pid))
-
-            confirm_msg = {
-                'event_id': data["id"],
-                'host': host,
-                'pid': pid,
-                'status': 'success'
-            }
-
+            ms = (time.monotonic() - start) * 1000
+            self._record_event(data, ms)
+            logger.info("Processing succeeded for {} on {} in {:.0f}ms".format(self.event_description(data), self._origin(), ms))
+            self._confirm(data, "success")
         except Exception as e:
-            logger.error("Processing failed for {} on {}:{} - {}".format(self.event_description(data), host, pid, str(e)))
-
-            confirm_msg = {
-                'event_id': data["id"],
-                'host': host,
-                'pid': pid,
-                'status': 'error',
-                'error': str(e)
-            }
-
-        # Send confirmation
+            logger.error("Processing failed for {} on {} - {}".format(self.event_description(data), self._origin(), str(e)))
+            self._confirm(data, "error", str(e))
+
+    def _confirm(self, data, status, error=None):
+        confirm_msg = {
+            'event_id': data["id"],
+            'host': socket.gethostname(),
+            'pid': os.getpid(),
+            'status': status,
+        }
+        if error:
+            confirm_msg['error'] = error
         msg_data = json.dumps(confirm_msg)
-        logger.info("Sending confirm from {}:{} - {}".format(host, pid, msg["data"]))
+        logger.info("Sending confirm from {} - {}".format(self._origin(), msg_data))
         try:
             self.redis_client.publish(MULTISERVER_REDIS_CONFIRM_CHANNEL, msg_data)
         except Exception:
@@ -160,11 +368,17 @@ class MultiServerEventListenerMiddleware(object):
         self.req_counter = 0
 
     def __call__(self, request):
-        if self.req_counter == self.delay:
-            server_coordinator.sync()
-            self.req_counter = 0
-        else:
-            self.req_counter += 1
+        if MULTISERVER_LISTENER_THREAD:
+            # Started here rather than when the middleware is initialized, as that may be in a process that workers are
+            # forked from, and threads don't survive a fork
+            server_coordinator.start_listener()
+        if not server_coordinator.is_listening():
+            if self.req_counter == self.delay:
+                server_coordinator.sync()
+                server_coordinator.process_cache_invalidations()
+                self.req_counter = 0
+            else:
+                self.req_counter += 1
 
         response = self.get_response(request)
         return response
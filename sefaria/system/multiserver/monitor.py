@@ -1,7 +1,7 @@
 import json
 import time
 
-from sefaria.settings import MULTISERVER_REDIS_EVENT_CHANNEL, MULTISERVER_REDIS_CONFIRM_CHANNEL
+from sefaria.settings import MULTISERVER_REDIS_EVENT_CHANNEL, MULTISERVER_REDIS_CONFIRM_CHANNEL, MULTISERVER_REDIS_LISTENERS_KEY
 
 import structlog
 logger = structlog.get_logger(__name__)
@@ -12,6 +12,7 @@ from sefaria.system.varnish.thin_wrapper import invalidate_title
 
 class MultiServerMonitor(MessagingNode):
     subscription_channels = [MULTISERVER_REDIS_EVENT_CHANNEL, MULTISERVER_REDIS_CONFIRM_CHANNEL]
+    listener_timeout = 60  # seconds since its last sync after which a server isn't expected to confirm events
 
     def __init__(self):
         super(MultiServerMonitor, self).__init__()
@@ -60,11 +61,13 @@ class MultiServerMonitor(MessagingNode):
         """
         event_id = data["id"]
         try:
-            (_, subscribers) = self.redis_client.execute_command('PUBSUB', 'NUMSUB', MULTISERVER_REDIS_EVENT_CHANNEL)
+            # Servers that have synced recently, other than the publisher
+            self.redis_client.zremrangebyscore(MULTISERVER_REDIS_LISTENERS_KEY, "-inf", time.time() - self.listener_timeout)
+            listeners = self.redis_client.zrange(MULTISERVER_REDIS_LISTENERS_KEY, 0, -1)
         except Exception:
-            logger.error("Failed to connect to Redis instance while getting subscriber count")
+            logger.error("Failed to connect to Redis instance while getting listener count")
             return
-        expected = int(subscribers - 2)  # No confirms from the publisher or the monitor => subscribers - 2
+        expected = len([l for l in listeners if l != data.get("origin")])
         self.events[event_id] = {
             "data": data,
             "expected": expected,
@@ -0,0 +1,116 @@
+"""
+Client for the Node server that renders React components to HTML.
+
+Requests go through a pool of keep-alive connections, with the props sent as JSON. The HTML of pages that aren't
+particular to a user is cached for a short time, keyed by a hash of the component and its props, and is served past
+that time if Node fails to render the page again.
+"""
+import hashlib
+import json
+import os
+import socket
+import threading
+import time
+
+import urllib3
+import structlog
+logger = structlog.get_logger(__name__)
+
+import sefaria.system.cache as scache
+from sefaria.system.exceptions import NodeRenderError
+from sefaria.settings import NODE_HOST, NODE_TIMEOUT, NODE_POOL_SIZE, SSR_CACHE_SIZE, SSR_CACHE_TIMEOUT, SSR_CACHE_STALE_TIMEOUT
+
+html_cache = scache.LRUCache(max_size=SSR_CACHE_SIZE, timeout=SSR_CACHE_STALE_TIMEOUT)  # cache key -> (time rendered, html)
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+_stats_lock = threading.Lock()
+_stats = {"renders": 0, "cache_hits": 0, "stale_hits": 0, "failures": 0, "props_builds": 0,
+          "props_ms": 0.0, "render_ms": 0.0, "transfer_ms": 0.0}
+_timed = {"props_ms": "props_builds", "render_ms": "renders", "transfer_ms": "renders"}  # totals and what they're totals of
+
+
+def _record(**kwargs):
+    with _stats_lock:
+        for key, value in kwargs.items():
+            _stats[key] += value
+
+
+def record_props_time(ms):
+    """
+    Records the time spent building and encoding the props of a page that is rendered
+    """
+    _record(props_ms=ms, props_builds=1)
+
+
+def stats():
+    """
+    :return dict: counts of renders and cache hits, and the mean time spent building props, rendering in Node, and
+    sending props and HTML between Django and Node
+    """
+    with _stats_lock:
+        d = dict(_stats)
+    for key, count_key in _timed.items():
+        d["mean_" + key] = d.pop(key) / d[count_key] if d.get(count_key) else None
+    return d
+
+
+def _get_pool():
+    global _pool, _pool_pid
+    with _pool_lock:
+        # Connections can't be shared across forked processes, so each process opens its own
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = urllib3.connection_from_url(NODE_HOST, maxsize=NODE_POOL_SIZE, block=False, retries=False,
+                                                timeout=urllib3.Timeout(total=NODE_TIMEOUT))
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def get_cache_key(component, propsJSON):
+    return hashlib.sha1("{}/{}".format(component, propsJSON).encode("utf-8")).hexdigest()
+
+
+def is_timeout(e):
+    return isinstance(e, (socket.timeout, urllib3.exceptions.TimeoutError)) or isinstance(getattr(e, "reason", None), socket.timeout)
+
+
+def render(component, propsJSON, cacheable=False):
+    """
+    Asks the Node server to render `component` with the props encoded in `propsJSON`.
+    :param bool cacheable: whether the HTML can be served to anyone that requests the same props
+    :return str: HTML
+    :raises NodeRenderError: if Node responds with an error
+    """
+    cache_key = get_cache_key(component, propsJSON)
+    cached = html_cache.get(cache_key) if cacheable else None
+    if cached and time.monotonic() - cached[0] < SSR_CACHE_TIMEOUT:
+        _record(cache_hits=1)
+        return cached[1]
+
+    path = urllib3.util.parse_url(NODE_HOST).path or ""
+    body = '{{"propsJSON": {}}}'.format(json.dumps(propsJSON, ensure_ascii=False)).encode("utf-8")
+    start = time.monotonic()
+    try:
+        response = _get_pool().urlopen("POST", "{}/{}/{}".format(path.rstrip("/"), component, cache_key), body=body,
+                                       headers={"Content-Type": "application/json; charset=utf-8"})
+        if response.status != 200:
+            raise NodeRenderError("Node responded with {}: {}".format(response.status, response.data[:200]))
+    except Exception:
+        if cached:
+            # better to serve a page that's a little old than one that has to render on the client
+            _record(stale_hits=1)
+            return cached[1]
+        _record(failures=1)
+        raise
+    html = response.data.decode("utf-8")
+
+    total_ms = (time.monotonic() - start) * 1000
+    render_ms = float(response.headers.get("X-Render-Ms", 0))
+    _record(renders=1, render_ms=render_ms, transfer_ms=total_ms - render_ms)
+    logger.debug("Node render", component=component, render_ms=render_ms, transfer_ms=total_ms - render_ms, bytes=len(body) + len(response.data))
+
+    if cacheable:
+        html_cache.set(cache_key, (time.monotonic(), html))
+    return html
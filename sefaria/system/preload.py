@@ -0,0 +1,44 @@
+"""
+Builds the library in the gunicorn master process, before workers are forked, so that workers share its memory
+copy-on-write rather than each building their own copy.
+
+Used with gunicorn's `preload_app`: `preload()` is called from the `when_ready` hook and `after_fork()` from the
+`post_fork` hook.  Compare worker memory with and without it using scripts/measure_worker_memory.py.
+"""
+import gc
+import warnings
+
+import structlog
+logger = structlog.get_logger(__name__)
+
+
+def preload():
+    """
+    Loads every view, which builds the library, including the structures that LIBRARY_LAZY_INIT would defer. Then
+    closes connections that can't be shared with forked processes, and moves every object allocated so far out of
+    reach of the garbage collector, which would otherwise write to the pages holding them, copying them into each worker.
+    """
+    from django.db import connections
+    from django.urls import get_resolver
+    from sefaria.system import startup
+    from sefaria.system.database import client
+
+    with startup.stage("url patterns"):
+        get_resolver().url_patterns  # imports every view.  Importing reader.views initializes the library.
+    import reader.views
+    from sefaria.model import library
+    library.ensure_built(*reader.views.deferrable_structures)
+
+    # Each worker reopens these on first use
+    connections.close_all()
+    client.close()
+
+    gc.collect()
+    gc.freeze()
+    logger.info("Preloaded library", frozen_objects=gc.get_freeze_count(), rss_mb=round(startup.rss_bytes() / 1024 ** 2, 1))
+    startup.log_summary()
+
+
+def after_fork():
+    # The client was closed before forking, so it's safe to reopen it in the worker
+    warnings.filterwarnings("ignore", message="MongoClient opened before fork")
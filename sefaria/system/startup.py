@@ -0,0 +1,65 @@
+"""
+Records how long each stage of starting the application takes, and how much memory it adds.
+
+Stages are recorded as they complete, logged, and listed by :func:`stages` (and in the cache_stats view).
+"""
+import os
+import resource
+import threading
+import time
+from contextlib import contextmanager
+
+import structlog
+logger = structlog.get_logger(__name__)
+
+_stages = []
+_stages_lock = threading.Lock()
+_page_size = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def rss_bytes():
+    """
+    :return int: memory currently resident for this process, or its peak where that isn't available
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _page_size
+    except (IOError, OSError, IndexError, ValueError):
+        # ru_maxrss is in kilobytes on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+@contextmanager
+def stage(name):
+    """
+    Records the time and memory taken by the code in this context, as the stage `name`
+    """
+    rss_before = rss_bytes()
+    start = time.perf_counter()
+    cpu_start = time.process_time()
+    try:
+        yield
+    finally:
+        record = {
+            "stage": name,
+            "seconds": round(time.perf_counter() - start, 3),
+            "cpu_seconds": round(time.process_time() - cpu_start, 3),
+            "rss_delta_mb": round((rss_bytes() - rss_before) / 1024 ** 2, 1),
+            "rss_mb": round(rss_bytes() / 1024 ** 2, 1),
+            "pid": os.getpid(),
+            "thread": threading.current_thread().name,
+        }
+        with _stages_lock:
+            _stages.append(record)
+        logger.info("Startup stage complete", **record)
+
+
+def stages():
+    with _stages_lock:
+        return list(_stages)
+
+
+def log_summary():
+    recorded = stages()
+    logger.info("Startup stages", total_seconds=round(sum(s["seconds"] for s in recorded), 3),
+                rss_mb=round(rss_bytes() / 1024 ** 2, 1), stages=[(s["stage"], s["seconds"], s["rss_delta_mb"]) for s in recorded])
@@ -0,0 +1,269 @@
+import time
+
+import pytest
+
+from sefaria.system import caches
+from sefaria.system import cache as scache
+from sefaria.system.cache import LRUCache, django_cache
+
+
+class TestLRUCache(object):
+
+    def test_get_set(self):
+        c = LRUCache(max_size=10)
+        assert c.get("a") is None
+        assert c.get("a", 1) == 1
+        c.set("a", 2)
+        assert c.get("a") == 2
+        assert "a" in c
+        c.delete("a")
+        assert "a" not in c
+
+    def test_eviction(self):
+        c = LRUCache(max_size=2)
+        c.set("a", 1)
+        c.set("b", 2)
+        c.get("a")
+        c.set("c", 3)
+        assert len(c) == 2
+        assert c.get("a") == 1
+        assert c.get("b") is None
+        assert c.get("c") == 3
+
+    def test_timeout(self):
+        c = LRUCache(max_size=2, timeout=0.01)
+        c.set("a", 1)
+        c.set("b", 2, timeout=60)
+        time.sleep(0.02)
+        assert c.get("a") is None
+        assert c.get("b") == 2
+
+    def test_stats(self):
+        c = LRUCache(max_size=2)
+        c.set("a", 1)
+        c.get("a")
+        c.get("b")
+        stats = c.stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["hit_ratio"] == 0.5
+
+
+class FakeSharedCache(object):
+    default_timeout = None
+
+    def __init__(self):
+        self.data = {}
+        self.gets = 0
+
+    def get(self, key, default=None, version=None):
+        self.gets += 1
+        return self.data.get(key, default)
+
+    def get_many(self, keys, version=None):
+        self.gets += 1
+        return {k: self.data[k] for k in keys if k in self.data}
+
+    def set(self, key, value, timeout=None, version=None):
+        self.data[key] = value
+
+    def delete(self, key, version=None):
+        self.data.pop(key, None)
+
+
+@pytest.fixture
+def two_tier(monkeypatch):
+    shared = FakeSharedCache()
+    monkeypatch.setattr(caches.TwoTierCache, "_shared", shared)
+    cache = caches.TwoTierCache(None, {"OPTIONS": {"SHARED_ALIAS": "test_shared", "LOCAL_MAX_SIZE": 10}})
+    caches.invalidate_local("test_shared", None)
+    return cache, shared
+
+
+class TestTwoTierCache(object):
+
+    def test_local_tier(self, two_tier):
+        cache, shared = two_tier
+        cache.set("a", {"b": 1})
+        assert cache.get("a") == {"b": 1}
+        assert cache.get("a") == {"b": 1}
+        assert shared.gets == 0
+        cache.get("a")["b"] = 2
+        assert cache.get("a") == {"b": 1}
+
+    def test_shared_tier(self, two_tier):
+        cache, shared = two_tier
+        shared.data["a"] = 1
+        shared.data["b"] = 2
+        assert cache.get("a") == 1
+        assert cache.get_many(["a", "b", "c"]) == {"a": 1, "b": 2}
+        assert shared.gets == 2
+        assert cache.get("c", "default") == "default"
+
+    def test_invalidate_local(self, two_tier):
+        cache, shared = two_tier
+        cache.set("a", 1)
+        shared.data["a"] = 2
+        caches.invalidate_local("test_shared", [cache.make_key("a")])
+        assert cache.get("a") == 2
+        cache.delete("a")
+        assert cache.get("a") is None
+
+
+    def test_clear_local(self, two_tier):
+        cache, shared = two_tier
+        cache.set("a", 1)
+        shared.data["a"] = 2
+        caches.clear_local()
+        assert cache.get("a") == 2
+
+
+class TestMongoCacheCompression(object):
+
+    def test_encode(self):
+        cache = caches.SimpleMongoDBCache(None, {"OPTIONS": {"COMPRESS_MIN_SIZE": 100}})
+        small, large = {"a": 1}, {"a": "b" * 1000}
+        assert cache._encode(small) == {"data": small, "compression": None}
+        encoded = cache._encode(large)
+        assert encoded["compression"] == "zlib"
+        assert len(encoded["data"]) < 100
+        assert cache._decode(encoded) == large
+
+
+class TestMongoCacheAdd(object):
+
+    def test_add(self):
+        cache = caches.SimpleMongoDBCache(None, {"OPTIONS": {"COLLECTION": "test_cache_add"}})
+        try:
+            assert cache.add("a", 1)
+            assert not cache.add("a", 2)
+            assert cache.get("a") == 1
+            cache.set("b", 1, timeout=0)  # expired, but not yet removed by the TTL index
+            assert cache.add("b", 2)
+            assert cache.get("b") == 2
+        finally:
+            caches.db.drop_collection("test_cache_add")
+
+
+class FakeDjangoCache(object):
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key, default=None):
+        return self.data.get(key, default)
+
+    def set(self, key, value, timeout=None):
+        self.data[key] = value
+
+    def add(self, key, value, timeout=None):
+        if key in self.data:
+            return False
+        self.data[key] = value
+        return True
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+    def get_many(self, keys):
+        self.get_manys = getattr(self, "get_manys", 0) + 1
+        return {k: self.data[k] for k in keys if k in self.data}
+
+    def set_many(self, data, timeout=None):
+        self.data.update(data)
+        return []
+
+
+class ImmediateExecutor(object):
+    def submit(self, fn, *args):
+        fn(*args)
+
+
+@pytest.fixture
+def django_cache_backend(monkeypatch):
+    backend = FakeDjangoCache()
+    monkeypatch.setattr(scache, "get_cache_factory", lambda cache_type: backend)
+    monkeypatch.setattr(scache, "_get_refresh_executor", lambda: ImmediateExecutor())
+    return backend
+
+
+class TestDjangoCache(object):
+
+    def test_soft_timeout(self, django_cache_backend, monkeypatch):
+        calls = []
+
+        @django_cache(timeout=100, soft_timeout=10)
+        def f(x):
+            calls.append(x)
+            return len(calls)
+
+        assert f(1) == 1
+        assert f(1) == 1
+        now = time.time()
+        monkeypatch.setattr(scache.time, "time", lambda: now + 11)
+        assert f(1) == 1  # stale value, while it's refreshed
+        assert f(1) == 2
+        assert len(calls) == 2
+        assert not [k for k in django_cache_backend.data if k.startswith("lock:")]
+
+    def test_refresh_once(self, django_cache_backend, monkeypatch):
+        calls = []
+
+        @django_cache(timeout=100, soft_timeout=10)
+        def f():
+            calls.append(1)
+            return len(calls)
+
+        f()
+        monkeypatch.setattr(scache, "_get_refresh_executor", lambda: type("Executor", (), {"submit": lambda self, fn, *args: None})())
+        now = time.time()
+        monkeypatch.setattr(scache.time, "time", lambda: now + 11)
+        f()
+        f()
+        assert len([k for k in django_cache_backend.data if k.startswith("lock:")]) == 1
+
+    def test_lock_waits_for_value(self, django_cache_backend, monkeypatch):
+        @django_cache(lock_timeout=1)
+        def f():
+            return "computed"
+
+        key = scache.cache_get_key(scache.cache_get_key_arr("f"))
+        django_cache_backend.add(scache._lock_key(key), 1)
+        monkeypatch.setattr(scache.time, "sleep", lambda s: django_cache_backend.set(key, "by other process"))
+        assert f() == "by other process"
+
+    def test_early_expiration(self, monkeypatch):
+        monkeypatch.setattr(scache.random, "random", lambda: 0.5)
+        envelope = {"fresh_until": time.time() + 10, "compute_time": 1}
+        assert not scache._needs_refresh(envelope, 1.0)
+        assert not scache._needs_refresh(envelope, None)
+        envelope["compute_time"] = 100
+        assert scache._needs_refresh(envelope, 1.0)
+
+    def test_many(self, django_cache_backend):
+        calls = []
+
+        @django_cache()
+        def f(x, y=0):
+            calls.append(x)
+            return x + y
+
+        assert f(1, y=10) == 11
+        assert f.many([(1,), (2,), (3,), (2,)], kwargs={"y": 10}, max_workers=2) == [11, 12, 13, 12]
+        assert sorted(calls) == [1, 2, 3]
+        assert django_cache_backend.get_manys == 1
+        assert f(3, y=10) == 13
+        assert len(calls) == 3
+
+    def test_many_default_on_miss(self, django_cache_backend):
+        @django_cache(default_on_miss=True, default_on_miss_value="default")
+        def f(x):
+            return x
+
+        assert f.many([(1,)]) == ["default"]
+
+    def test_refresh_executor_per_process(self, monkeypatch):
+        executor = scache._get_refresh_executor()
+        assert scache._get_refresh_executor() is executor
+        # as in a worker forked after the executor was started, whose threads it doesn't have
+        monkeypatch.setattr(scache.os, "getpid", lambda: -1)
+        assert scache._get_refresh_executor() is not executor
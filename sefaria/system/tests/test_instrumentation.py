@@ -0,0 +1,81 @@
+import pytest
+
+from sefaria.system import instrumentation
+from sefaria.system.database import db
+
+
+class FakeCommandEvent(object):
+    duration_micros = 2500
+
+
+@pytest.fixture(autouse=True)
+def clean_totals(monkeypatch):
+    # so as not to clear the totals of the server using this database
+    monkeypatch.setattr(instrumentation, "collection_name", "test_request_metrics")
+    instrumentation.reset()
+    yield
+    instrumentation.end_request()
+    instrumentation.reset()
+    db.drop_collection("test_request_metrics")
+
+
+class TestInstrumentation(object):
+
+    def test_counts_only_during_request(self):
+        instrumentation.incr("ref_cache_hits")
+        assert instrumentation.current() is None
+        instrumentation.start_request()
+        instrumentation.incr("ref_cache_hits")
+        instrumentation.incr("ref_cache_hits")
+        with instrumentation.timer("text_chunk_ms", "text_chunk_loads"):
+            pass
+        counts = instrumentation.end_request("reader.views.text_range")
+        assert counts["ref_cache_hits"] == 2
+        assert counts["text_chunk_loads"] == 1
+        assert counts["text_chunk_ms"] >= 0
+        assert instrumentation.current() is None
+
+    def test_totals_by_view(self):
+        for _ in range(2):
+            instrumentation.start_request()
+            instrumentation.incr("shared_cache_misses")
+            instrumentation.end_request("a")
+        instrumentation.start_request()
+        instrumentation.end_request("b")
+        totals = instrumentation.totals()
+        assert totals["a"]["requests"] == 2
+        assert totals["a"]["shared_cache_misses"] == 2
+        assert totals["b"]["requests"] == 1
+        assert "shared_cache_misses" not in totals["b"]
+
+    def test_totals_of_every_process(self, monkeypatch):
+        monkeypatch.setattr(instrumentation, "REQUEST_INSTRUMENTATION_FLUSH_INTERVAL", 0)
+        # another worker's flushed totals
+        db.test_request_metrics.update_one({"_id": "a"}, {"$inc": {"requests": 3, "mongo_commands": 4}}, upsert=True)
+        instrumentation.start_request()
+        instrumentation.incr("mongo_commands")
+        instrumentation.end_request("a")
+        assert db.test_request_metrics.find_one({"_id": "a"})["requests"] == 4
+        totals = instrumentation.totals()
+        assert totals["a"]["requests"] == 4
+        assert totals["a"]["mongo_commands"] == 5
+
+    def test_mongo_listener(self):
+        listener = instrumentation.MongoCommandListener()
+        instrumentation.start_request()
+        listener.succeeded(FakeCommandEvent())
+        listener.failed(FakeCommandEvent())
+        counts = instrumentation.end_request()
+        assert counts["mongo_commands"] == 2
+        assert counts["mongo_failures"] == 1
+        assert counts["mongo_ms"] == 5
+
+    def test_prometheus_text(self):
+        instrumentation.start_request()
+        instrumentation.incr("mongo_commands", 3)
+        instrumentation.incr("mongo_ms", 1500)
+        instrumentation.end_request('api."texts"')
+        text = instrumentation.prometheus_text()
+        assert "# TYPE sefaria_mongo_commands_total counter" in text
+        assert 'sefaria_mongo_commands_total{view="api.\\"texts\\""} 3' in text
+        assert [line for line in text.splitlines() if line.startswith("sefaria_mongo_seconds_total")][0].endswith(" 1.5")
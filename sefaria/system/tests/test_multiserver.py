@@ -0,0 +1,124 @@
+import json
+
+from sefaria.system import caches
+import sefaria.system.multiserver.coordinator as coordinator_module
+from sefaria.system.multiserver.coordinator import coalesce_events, stream_id, ServerCoordinator
+
+
+def event(obj, method, *args):
+    return {"obj": obj, "method": method, "args": list(args)}
+
+
+class TestCoalesceEvents(object):
+
+    def test_identical_events(self):
+        events = list(enumerate([
+            event("library", "refresh_index_record_in_cache", "Genesis"),
+            event("library", "refresh_index_record_in_cache", "Exodus"),
+            event("text", "invalidate_navigation_table", "Genesis"),
+            event("library", "refresh_index_record_in_cache", "Genesis"),
+        ]))
+        assert [i for i, _ in coalesce_events(events)] == [1, 2, 3]
+
+    def test_rebuild(self):
+        events = list(enumerate([
+            event("library", "refresh_index_record_in_cache", "Genesis"),
+            event("text", "invalidate_navigation_table", "Genesis"),
+            event("library", "rebuild", True),
+            event("library", "refresh_index_record_in_cache", "Exodus"),
+        ]))
+        assert [i for i, _ in coalesce_events(events)] == [1, 2, 3]
+
+    def test_rebuild_without_toc(self):
+        events = list(enumerate([
+            event("library", "refresh_index_record_in_cache", "Genesis"),
+            event("library", "update_index_in_toc", "Genesis"),
+            event("library", "build_full_auto_completer"),
+            event("library", "rebuild", True),
+            event("library", "recount_index_in_toc", "Exodus"),
+            event("library", "rebuild"),
+        ]))
+        assert [i for i, _ in coalesce_events(events)] == [2, 3, 4, 5]
+        events[5] = (5, event("library", "rebuild", True))
+        assert [i for i, _ in coalesce_events(events)] == [2, 5]
+
+
+class FakePubSub(object):
+    def __init__(self, messages):
+        self.messages = messages
+        self.channels = []
+
+    def subscribe(self, *channels):
+        self.channels += channels
+
+    def get_message(self, timeout=0):
+        return self.messages.pop(0) if self.messages else None
+
+
+class FakeRedis(object):
+    def __init__(self, messages):
+        self._pubsub = FakePubSub(messages)
+
+    def pubsub(self, ignore_subscribe_messages=False):
+        return self._pubsub
+
+
+class TestCacheInvalidations(object):
+
+    def test_process_cache_invalidations(self, monkeypatch):
+        invalidated = []
+        monkeypatch.setattr(caches, "invalidate_local", lambda alias, keys: invalidated.append((alias, keys)))
+        coordinator = ServerCoordinator()
+        messages = [
+            {"data": json.dumps({"alias": "shared", "keys": ["a"], "origin": "elsewhere:1"})},
+            {"data": json.dumps({"alias": "shared", "keys": ["b"], "origin": coordinator._origin()})},
+            {"data": json.dumps({"alias": "shared", "keys": None, "origin": "elsewhere:2"})},
+        ]
+        coordinator.redis_client = FakeRedis(messages)
+        coordinator.pubsub = object()
+        assert coordinator.process_cache_invalidations()
+        assert invalidated == [("shared", ["a"]), ("shared", None)]
+
+
+class FakeStreamRedis(object):
+    def __init__(self, entries, info):
+        self.entries = entries
+        self.info = info
+
+    def xinfo_stream(self, name):
+        return self.info
+
+    def xread(self, streams, count=None, block=None):
+        last = stream_id(list(streams.values())[0])
+        entries = [(event_id, fields) for event_id, fields in self.entries if stream_id(event_id) > last]
+        return [("stream", entries)] if entries else []
+
+    def zadd(self, name, mapping):
+        pass
+
+
+class TestMissedEvents(object):
+
+    def sync(self, monkeypatch, last_event_id, info):
+        recovered = []
+        coordinator = ServerCoordinator()
+        monkeypatch.setattr(coordinator, "_recover_missed_events", lambda: recovered.append(True))
+        monkeypatch.setattr(coordinator, "_process_event", lambda data: None)
+        entries = [("{}-0".format(ms), {"data": json.dumps(dict(event("text", "invalidate_navigation_table", title), origin="elsewhere:1"))})
+                   for ms, title in ((5, "Genesis"), (6, "Exodus"))]
+        coordinator.redis_client = FakeStreamRedis(entries, info)
+        coordinator.pubsub = object()
+        coordinator.last_event_id = last_event_id
+        assert coordinator.sync()
+        assert coordinator.last_event_id == "6-0"
+        return bool(recovered)
+
+    def test_max_deleted_entry_id(self, monkeypatch):
+        assert self.sync(monkeypatch, "2-0", {"length": 2, "first-entry": ("5-0", {}), "max-deleted-entry-id": "4-0"})
+        assert not self.sync(monkeypatch, "4-0", {"length": 2, "first-entry": ("5-0", {}), "max-deleted-entry-id": "4-0"})
+
+    def test_first_entry(self, monkeypatch):
+        backlog = coordinator_module.MULTISERVER_EVENT_BACKLOG
+        assert self.sync(monkeypatch, "2-0", {"length": backlog, "first-entry": ("5-0", {})})
+        assert not self.sync(monkeypatch, "2-0", {"length": 2, "first-entry": ("5-0", {})})
+        assert not self.sync(monkeypatch, "5-0", {"length": backlog, "first-entry": ("5-0", {})})
@@ -0,0 +1,51 @@
+import pytest
+
+from sefaria.system import node_renderer
+from sefaria.system.exceptions import NodeRenderError
+
+
+class FakeResponse(object):
+    def __init__(self, status, data):
+        self.status = status
+        self.data = data
+        self.headers = {"X-Render-Ms": "5"}
+
+
+class FakePool(object):
+    def __init__(self):
+        self.requests = []
+        self.status = 200
+
+    def urlopen(self, method, url, body=None, headers=None):
+        self.requests.append(url)
+        return FakeResponse(self.status, "<div>{}</div>".format(len(self.requests)).encode("utf-8"))
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    fake = FakePool()
+    monkeypatch.setattr(node_renderer, "_get_pool", lambda: fake)
+    node_renderer.html_cache.clear()
+    return fake
+
+
+class TestNodeRenderer(object):
+
+    def test_cache_key_in_url(self, pool):
+        node_renderer.render("ReaderApp", '{"a": 1}')
+        assert pool.requests == ["/ReaderApp/{}".format(node_renderer.get_cache_key("ReaderApp", '{"a": 1}'))]
+        assert node_renderer.get_cache_key("ReaderApp", '{"a": 1}') != node_renderer.get_cache_key("ReaderApp", '{"a": 2}')
+
+    def test_cacheable(self, pool):
+        assert node_renderer.render("ReaderApp", '{"a": 1}', cacheable=True) == "<div>1</div>"
+        assert node_renderer.render("ReaderApp", '{"a": 1}', cacheable=True) == "<div>1</div>"
+        assert node_renderer.render("ReaderApp", '{"a": 1}') == "<div>2</div>"
+        assert len(pool.requests) == 2
+
+    def test_stale_on_error(self, pool, monkeypatch):
+        node_renderer.render("ReaderApp", '{"a": 1}', cacheable=True)
+        monkeypatch.setattr(node_renderer, "SSR_CACHE_TIMEOUT", 0)
+        pool.status = 500
+        assert node_renderer.render("ReaderApp", '{"a": 1}', cacheable=True) == "<div>1</div>"
+        with pytest.raises(NodeRenderError):
+            node_renderer.render("ReaderApp", '{"a": 2}', cacheable=True)
@@ -0,0 +1,13 @@
+from sefaria.system import startup
+
+
+def test_stage():
+    with startup.stage("test stage"):
+        data = b"x" * (32 * 1024 ** 2)
+    record = startup.stages()[-1]
+    assert record["stage"] == "test stage"
+    assert record["seconds"] >= 0
+    assert record["cpu_seconds"] >= 0
+    assert record["rss_mb"] > 0
+    assert record["rss_delta_mb"] >= 16
+    assert len(data) == 32 * 1024 ** 2
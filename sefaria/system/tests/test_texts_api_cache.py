@@ -0,0 +1,78 @@
+import importlib
+
+import pytest
+
+from sefaria.model import Ref
+from sefaria.system import texts_api_cache
+
+
+@pytest.fixture(autouse=True)
+def enable_cache(monkeypatch):
+    monkeypatch.setattr(texts_api_cache, "ENABLE_TEXTS_API_CACHE", True)
+
+
+def test_module_imports():
+    # module level names mustn't shadow builtins used at import
+    importlib.reload(texts_api_cache)
+    assert texts_api_cache._prefetch_pending == set()
+
+
+class TestTextsApiCache(object):
+    params = {"commentary": False, "context": 1}
+
+    def test_key_depends_on_params(self):
+        oref = Ref("Genesis 3")
+        assert texts_api_cache.get_cache_key(oref, self.params) != texts_api_cache.get_cache_key(oref, {"commentary": True, "context": 1})
+
+    def test_no_key_above_section_level(self):
+        assert texts_api_cache.get_cache_key(Ref("Genesis"), self.params) is None
+
+    def test_invalidate_ref(self):
+        oref = Ref("Genesis 3")
+        other = Ref("Genesis 4")
+        key, other_key = texts_api_cache.get_cache_key(oref, self.params), texts_api_cache.get_cache_key(other, self.params)
+        texts_api_cache.set_payload(key, {"ref": oref.normal()})
+        assert texts_api_cache.get_payload(key) == {"ref": oref.normal()}
+        texts_api_cache.invalidate_ref(Ref("Genesis 3:5"))
+        assert texts_api_cache.get_cache_key(oref, self.params) != key
+        assert texts_api_cache.get_cache_key(other, self.params) == other_key
+
+    def test_invalidate_index(self):
+        oref = Ref("Genesis 3:4-4:2")
+        key = texts_api_cache.get_cache_key(oref, self.params)
+        texts_api_cache.invalidate_index("Genesis")
+        assert texts_api_cache.get_cache_key(oref, self.params) != key
+
+    def test_evicted_generation(self):
+        from sefaria.system.cache import delete_shared_cache_elem
+        oref = Ref("Genesis 5")
+        key = texts_api_cache.get_cache_key(oref, self.params)
+        assert texts_api_cache.get_cache_key(oref, self.params) == key
+        delete_shared_cache_elem(texts_api_cache._section_generation_key(oref))
+        new_key = texts_api_cache.get_cache_key(oref, self.params)
+        assert new_key != key
+        assert texts_api_cache.get_cache_key(oref, self.params) == new_key
+
+    def test_commentary_change_invalidates_base_text(self):
+        params = {"commentary": True, "context": 1}
+        oref = Ref("Genesis 1")
+        key = texts_api_cache.get_cache_key(oref, params)
+        texts_api_cache.invalidate_linked_refs(Ref("Rashi on Genesis 1"))
+        assert texts_api_cache.get_cache_key(oref, params) != key
+
+    def test_stats(self):
+        texts_api_cache.get_payload("texts_api:missing")
+        stats = texts_api_cache.stats()
+        assert stats["misses"] > 0
+        assert 0 <= stats["hit_ratio"] <= 1
+
+    def test_prefetch(self, monkeypatch):
+        monkeypatch.setattr(texts_api_cache, "TEXTS_API_PREFETCH", True)
+        oref = Ref("Genesis 5")
+        params = {"prefetch_test": True}
+        texts_api_cache.invalidate_ref(oref)
+        future_payload = {"ref": oref.normal()}
+        texts_api_cache.prefetch(oref, params, lambda: future_payload)
+        texts_api_cache._get_prefetch_executor().shutdown(wait=True)
+        texts_api_cache._prefetch_executor = None
+        assert texts_api_cache.get_payload(texts_api_cache.get_cache_key(oref, params)) == future_payload
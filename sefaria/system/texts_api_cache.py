@@ -0,0 +1,247 @@
+"""
+Cache of the section payloads served by the texts api, stored in the shared cache.
+
+Payloads are keyed by their ref, request parameters and the current generation of the sections they cover and of
+their index. Changes to a ref start a new generation for its sections (and changes to an index, for the whole index),
+so stale payloads are never read again and expire on their own.
+
+Payloads of the sections next to one that was served can optionally be computed ahead of time, in a small pool of
+background threads.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import structlog
+logger = structlog.get_logger(__name__)
+
+import sefaria.system.cache as scache
+from sefaria.model import Ref, LinkSet, library
+from sefaria.system.exceptions import InputError, BookNameError
+from sefaria.settings import ENABLE_TEXTS_API_CACHE, TEXTS_API_CACHE_TIMEOUT, TEXTS_API_PREFETCH, \
+    TEXTS_API_PREFETCH_WORKERS, TEXTS_API_PREFETCH_MAX_PENDING, TEXTS_API_PREFETCH_MAX_DELAY
+
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "prefetched": 0, "prefetches_dropped": 0}
+
+
+def _record(outcome):
+    with _stats_lock:
+        _stats[outcome] += 1
+
+
+def stats():
+    with _stats_lock:
+        d = dict(_stats)
+    d["hit_ratio"] = d["hits"] / (d["hits"] + d["misses"]) if d["hits"] + d["misses"] else None
+    return d
+
+
+def _index_generation_key(title):
+    return "texts_api_gen:{}".format(title)
+
+
+def _section_generation_key(oref):
+    return "texts_api_gen:{}".format(oref.normal())
+
+
+def _section_refs(oref):
+    """
+    :return list: the section level Refs that `oref` falls within, or None if `oref` is above the section level
+    """
+    depth = getattr(oref.index_node, "depth", None)
+    if depth is None:
+        return None
+    if oref.is_spanning():
+        return [r.section_ref() for r in oref.split_spanning_ref()]
+    if len(oref.sections) >= depth - 1:
+        return [oref.section_ref()]
+    return None
+
+
+def _generation_keys(oref):
+    sections = _section_refs(oref)
+    if sections is None:
+        return None
+    return [_index_generation_key(oref.index.title)] + [_section_generation_key(r) for r in sections]
+
+
+def get_cache_key(oref, params):
+    """
+    :param oref: the Ref requested
+    :param dict params: every request parameter that the payload depends on
+    :return str: the key of the payload for `oref` and `params` in the current generation, or None if payloads for `oref` aren't cached
+    """
+    if not ENABLE_TEXTS_API_CACHE:
+        return None
+    generation_keys = _generation_keys(oref)
+    if generation_keys is None:
+        return None
+    generations = scache.get_shared_cache_elems(generation_keys)
+    missing = [k for k in generation_keys if generations.get(k) is None]
+    if missing:
+        # Never started, or evicted from the cache.  Payloads cached before an eviction must not be revived.
+        generations.update(_start_generations(missing))
+    key_data = json.dumps([oref.normal(), params, [generations[k] for k in generation_keys]], sort_keys=True)
+    return "texts_api:{}".format(hashlib.md5(key_data.encode("utf-8")).hexdigest())
+
+
+def get_payload(cache_key):
+    payload = scache.get_shared_cache_elem(cache_key)
+    _record("hits" if payload is not None else "misses")
+    return payload
+
+
+def set_payload(cache_key, payload):
+    scache.set_shared_cache_elem(cache_key, payload, TEXTS_API_CACHE_TIMEOUT)
+
+
+def _start_generations(keys):
+    """
+    :return dict: the new generation of each of `keys`
+    """
+    generations = {k: uuid.uuid4().hex for k in keys}
+    scache.set_shared_cache_elems(generations, timeout=None)
+    return generations
+
+
+def invalidate_index(title):
+    if ENABLE_TEXTS_API_CACHE:
+        _start_generations([_index_generation_key(title)])
+
+
+def invalidate_ref(oref):
+    """
+    Called when the text at `oref`, or its links, change
+    """
+    if not ENABLE_TEXTS_API_CACHE or not isinstance(oref, Ref):
+        return
+    sections = _section_refs(oref)
+    if sections is None:
+        invalidate_index(oref.index.title)
+    else:
+        _start_generations([_section_generation_key(r) for r in sections])
+
+
+def invalidate_trefs(trefs):
+    for tref in trefs:
+        try:
+            invalidate_ref(Ref(tref))
+        except InputError:
+            pass
+
+
+def process_link_change_in_texts_api_cache(link, **kwargs):
+    invalidate_trefs(getattr(link, "refs", []))
+
+
+def invalidate_linked_refs(oref):
+    """
+    Called when the text at `oref` changes, as payloads with commentary include the text of the refs linked to theirs
+    """
+    if not ENABLE_TEXTS_API_CACHE:
+        return
+    keys = set()
+    for link in LinkSet(oref):
+        for tref in link.refs:
+            try:
+                sections = _section_refs(Ref(tref))
+            except InputError:
+                continue
+            keys.update(_section_generation_key(r) for r in sections or [])
+    if keys:
+        _start_generations(list(keys))
+
+
+def process_version_change_in_texts_api_cache(ver, **kwargs):
+    changed_ref = getattr(ver, "_changed_ref", None)
+    if changed_ref is None:
+        # metadata is part of every section's payload
+        invalidate_index(ver.title)
+        # and the change may be anywhere in a commentary included in the payloads of its base texts
+        try:
+            base_titles = getattr(library.get_index(ver.title), "base_text_titles", None) or []
+        except BookNameError:
+            base_titles = []
+        for title in base_titles:
+            invalidate_index(title)
+        return
+    invalidate_ref(changed_ref)
+    invalidate_linked_refs(changed_ref)
+    # next and prev depend on which sections have text
+    for neighbor in [changed_ref.next_section_ref(), changed_ref.prev_section_ref()]:
+        if neighbor:
+            invalidate_ref(neighbor)
+
+
+def process_index_change_in_texts_api_cache(indx, **kwargs):
+    invalidate_index(indx.title)
+    if kwargs.get("old"):
+        invalidate_index(kwargs["old"])
+
+
+_prefetch_executor = None
+_prefetch_executor_pid = None
+_prefetch_pending = set()  # refs and params of queued or running prefetches
+_prefetch_lock = threading.Lock()
+
+
+def _get_prefetch_executor():
+    """
+    Threads don't survive a fork, so each process starts its own executor, and forgets the prefetches queued in the
+    process it was forked from.  Called with _prefetch_lock held.
+    """
+    global _prefetch_executor, _prefetch_executor_pid
+    if _prefetch_executor is None or _prefetch_executor_pid != os.getpid():
+        _prefetch_executor = ThreadPoolExecutor(max_workers=TEXTS_API_PREFETCH_WORKERS, thread_name_prefix="texts_api_prefetch")
+        _prefetch_executor_pid = os.getpid()
+        _prefetch_pending.clear()
+    return _prefetch_executor
+
+
+def prefetch(oref, params, compute):
+    """
+    Computes and caches the payload for `oref` and `params` in the background, if it isn't already cached.
+    Prefetches are dropped rather than queued beyond TEXTS_API_PREFETCH_MAX_PENDING, and when they have waited longer
+    than TEXTS_API_PREFETCH_MAX_DELAY seconds to start, as by then the reader has likely moved on.
+    :param oref: Ref
+    :param dict params: as passed to :func:`get_cache_key`
+    :param compute: function with no arguments that returns the payload
+    """
+    if not (ENABLE_TEXTS_API_CACHE and TEXTS_API_PREFETCH) or _section_refs(oref) is None:
+        return
+    tref = oref.normal()
+    pending_key = (tref, json.dumps(params, sort_keys=True))
+    with _prefetch_lock:
+        executor = _get_prefetch_executor()
+        if pending_key in _prefetch_pending:
+            return
+        if len(_prefetch_pending) >= TEXTS_API_PREFETCH_MAX_PENDING:
+            _record("prefetches_dropped")
+            return
+        _prefetch_pending.add(pending_key)
+    queued = time.monotonic()
+
+    def _prefetch():
+        try:
+            if time.monotonic() - queued > TEXTS_API_PREFETCH_MAX_DELAY:
+                _record("prefetches_dropped")
+                return
+            cache_key = get_cache_key(oref, params)
+            if cache_key is None or scache.get_shared_cache_elem(cache_key) is not None:
+                return
+            payload = compute()
+            if payload and "error" not in payload:
+                set_payload(cache_key, payload)
+                _record("prefetched")
+        except Exception:
+            logger.exception("Failed to prefetch texts api payload", ref=tref)
+        finally:
+            with _prefetch_lock:
+                _prefetch_pending.discard(pending_key)
+
+    executor.submit(_prefetch)
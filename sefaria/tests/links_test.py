@@ -3,6 +3,7 @@ import pytest
 
 from sefaria.client.wrapper import get_links
 from sefaria.model import *
+from sefaria.model.link import ref_client_data, ref_position_data
 
 def setup_module(module): 
     pass
@@ -22,6 +23,24 @@ class Test_get_links():
         # No links in range absent from segments
         assert all(r in r3 or r in r4 for r in r34)
 
+    def test_ref_client_data(self):
+        data = ref_client_data("Rashi on Genesis 1:2:3")
+        assert data["indexTitle"] == "Rashi on Genesis"
+        assert data["collectiveTitle"] == "Rashi"
+        assert data["category"] == "Commentary"
+        assert data["depth"] == data["nodeDepth"] == 3
+        assert data["verse"] == 3
+        assert data["commentaryNum"] == 2.0003
+
+        data = ref_client_data("Genesis 1")
+        assert data["depth"] + 1 == data["nodeDepth"]
+        assert data["commentaryNum"] == 1.0
+        assert "collectiveTitle" not in data
+
+    def test_ref_position_data(self):
+        data = ref_client_data("Rashi on Genesis 1:2:3")
+        assert ref_position_data("Rashi on Genesis 1:2:3") == {k: data[k] for k in ("depth", "nodeDepth", "verse")}
+
 
 class Test_links_from_get_text():
 
@@ -39,7 +39,7 @@ from sefaria.helper.crm.crm_mediator import CrmMediator
 from sefaria.system.cache import in_memory_cache
 from sefaria.client.util import jsonResponse, send_email, read_webpack_bundle
 from sefaria.forms import SefariaNewUserForm, SefariaNewUserFormAPI, SefariaDeleteUserForm
-from sefaria.settings import MAINTENANCE_MESSAGE, USE_VARNISH, MULTISERVER_ENABLED
+from sefaria.settings import MAINTENANCE_MESSAGE, USE_VARNISH, MULTISERVER_ENABLED, METRICS_TOKEN
 from sefaria.model.user_profile import UserProfile, user_link
 from sefaria.model.collection import CollectionSet
 from sefaria.export import export_all as start_export_all
@@ -714,12 +714,20 @@ def cache_stats(request):
     import resource
     from sefaria.utils.util import get_size
     from sefaria.model.user_profile import public_user_data_cache
+    from sefaria.system import texts_api_cache, node_renderer, caches, startup, instrumentation
     # from sefaria.sheets import last_updated
     resp = {
         'ref_cache_size': f'{model.Ref.cache_size():,}',
         # 'ref_cache_bytes': model.Ref.cache_size_bytes(), # This pretty expensive, not sure if it should run on prod.
         'public_user_data_size': f'{len(public_user_data_cache):,}',
         'public_user_data_bytes': f'{get_size(public_user_data_cache):,}',
+        'public_user_data_stats': public_user_data_cache.stats(),
+        'texts_api_cache_stats': texts_api_cache.stats(),
+        'node_renderer_stats': node_renderer.stats(),
+        'two_tier_cache_stats': caches.stats(),
+        'multiserver_event_stats': server_coordinator.event_stats() if server_coordinator else None,
+        'startup_stages': startup.stages(),
+        'request_instrumentation': instrumentation.totals(),
         # 'sheets_last_updated_size': len(last_updated),
         # 'sheets_last_updated_bytes': get_size(last_updated),
         'memory usage': f'{resource.getrusage(resource.RUSAGE_SELF).ru_maxrss:,}'
@@ -727,6 +735,20 @@ def cache_stats(request):
     return jsonResponse(resp)
 
 
+def metrics(request):
+    """
+    Totals of the work done by requests to each view in every process, in the Prometheus text format.
+    Served to staff, or to a scraper that sends "Authorization: Bearer <METRICS_TOKEN>".
+    """
+    import hmac
+    from sefaria.system import instrumentation
+    token = request.META.get("HTTP_AUTHORIZATION", "")
+    authorized = request.user.is_staff or (METRICS_TOKEN and hmac.compare_digest(token, "Bearer {}".format(METRICS_TOKEN)))
+    if not authorized:
+        return HttpResponse("Unauthorized", status=401)
+    return HttpResponse(instrumentation.prometheus_text(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 @staff_member_required
 def cache_dump(request):
     resp = {
@@ -1019,8 +1019,16 @@ def sheets_by_tag_api(request, tag):
 def sheets_by_ref_api(request, ref):
     """
     API to get public sheets by ref.
+    Optional `limit` and `skip` URL params page through the sheets, sorted by views.
     """
-    return jsonResponse(get_sheets_for_ref(ref))
+    try:
+        limit = int(request.GET.get("limit", 0))
+        skip = int(request.GET.get("skip", 0))
+    except ValueError:
+        return jsonResponse({"error": "'limit' and 'skip' must be whole numbers."}, status=400)
+    if limit < 0 or skip < 0:
+        return jsonResponse({"error": "'limit' and 'skip' can't be negative."}, status=400)
+    return jsonResponse(get_sheets_for_ref(ref, limit=limit, skip=skip))
 
 
 def get_aliyot_by_parasha_api(request, parasha):